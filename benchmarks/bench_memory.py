@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional
+
+from liberty_core import Parser
+
+from .synthetic import synthetic_library
+
+PARSER_MODES = {
+    "buffered": {},
+    "streaming": {"streaming": True},
+    "compact": {"compact": True},
+}
+
+
+def measure(text: str, mode: str) -> tuple[float, float]:
+    """Return (retained, peak) traced memory in MB for parsing ``text``."""
+    gc.collect()
+    tracemalloc.start()
+    result = Parser(**PARSER_MODES[mode]).parse(text)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return retained / 1e6, peak / 1e6
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure CST memory retained after parsing.")
+    parser.add_argument("--input", help="Liberty file to parse instead of a synthetic library.")
+    parser.add_argument("--cells", type=int, default=50000, help="Synthetic cell count.")
+    parser.add_argument("--pins", type=int, default=1, help="Synthetic output pins per cell.")
+    parser.add_argument("--rows", type=int, default=2, help="Synthetic table rows.")
+    parser.add_argument("--cols", type=int, default=2, help="Synthetic table columns.")
+    parser.add_argument("--mode", choices=sorted(PARSER_MODES), action="append", help="Parser mode(s) to measure.")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        text = Path(args.input).read_text(encoding="utf-8")
+        label = args.input
+    else:
+        text = synthetic_library(cells=args.cells, pins=args.pins, rows=args.rows, cols=args.cols)
+        label = f"synthetic {args.cells} cells, {args.rows}x{args.cols} tables"
+    print(f"{label}: {len(text) / 1e6:.1f} MB")
+    for mode in args.mode or ["buffered", "compact"]:
+        retained, peak = measure(text, mode)
+        print(f"{mode:<10}: retained {retained:.1f} MB, peak {peak:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List, Optional
+from unittest import mock
+
+from liberty_core import Lexer, Parser
+from liberty_core import parser as parser_module
+
+from .synthetic import synthetic_library
+
+
+class _ScanningCursor(parser_module._TokenCursor):
+    """Token cursor that locates the matching paren with a forward scan."""
+
+    def __init__(self, tokens: List[parser_module.Token]) -> None:
+        self.tokens = tokens
+        self.index = 0
+
+    def take_group_args(self) -> Optional[List[parser_module.Token]]:
+        return None
+
+    def find_group_end(self, offset: int) -> Optional[int]:
+        depth = 0
+        for index in range(self.index + offset, len(self.tokens)):
+            token_type = self.tokens[index].type
+            if token_type == parser_module.TokenType.GROUP_START:
+                depth += 1
+            elif token_type == parser_module.TokenType.GROUP_END:
+                depth -= 1
+                if depth == 0:
+                    return index - self.index
+        return None
+
+
+def _best_of(repeat: int, func: Callable[[], object]) -> float:
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def _parse_with_scan(text: str) -> None:
+    with mock.patch.object(parser_module, "_TokenCursor", _ScanningCursor):
+        Parser().parse(text)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare paren matching strategies in Parser.")
+    parser.add_argument("--input", help="Liberty file to parse instead of a synthetic library.")
+    parser.add_argument("--cells", type=int, default=200, help="Synthetic cell count.")
+    parser.add_argument("--rows", type=int, default=20, help="Synthetic table rows.")
+    parser.add_argument("--cols", type=int, default=20, help="Synthetic table columns.")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported).")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        text = Path(args.input).read_text(encoding="utf-8")
+        label = args.input
+    else:
+        text = synthetic_library(cells=args.cells, rows=args.rows, cols=args.cols)
+        label = f"synthetic {args.cells} cells, {args.rows}x{args.cols} tables"
+    tokens = Lexer(text).tokenize()
+    print(f"{label}: {len(text) / 1e6:.1f} MB, {len(tokens)} tokens")
+
+    # Lexing is shared by both strategies, so time only the parser stage.
+    with mock.patch.object(parser_module.Lexer, "tokenize", lambda self: tokens):
+        scan_time = _best_of(args.repeat, lambda: _parse_with_scan(text))
+        table_time = _best_of(args.repeat, lambda: Parser().parse(text))
+    print(f"forward scan : {scan_time:.3f}s")
+    print(f"match table  : {table_time:.3f}s ({scan_time / table_time:.2f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
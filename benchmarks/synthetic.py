@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from typing import List
+
+
+def synthetic_library(cells: int = 200, pins: int = 2, rows: int = 7, cols: int = 7) -> str:
+    """Build a table-heavy Liberty library shaped like the ASAP7 example."""
+    lines: List[str] = [
+        "library (synthetic) {",
+        '  time_unit : "1ps";',
+        '  voltage_unit : "1V";',
+        '  leakage_power_unit : "1pW";',
+        "  capacitive_load_unit (1,ff);",
+    ]
+    index_1 = ", ".join(str(5 * 2**step) for step in range(rows))
+    index_2 = ", ".join(f"{1.44 * 2**step:g}" for step in range(cols))
+    for cell_index in range(cells):
+        lines.append(f"  cell (CELL{cell_index}_SYN) {{")
+        lines.append(f"    area : {0.1 + cell_index % 7:g};")
+        for pin_index in range(pins):
+            lines.append(f"    pin (P{pin_index}) {{")
+            lines.append("      direction : output;")
+            lines.append("      timing () {")
+            lines.append(f'        related_pin : "A{pin_index}";')
+            for table in ("cell_rise", "rise_transition", "cell_fall", "fall_transition"):
+                lines.append(f"        {table} (delay_template_{rows}x{cols}) {{")
+                lines.append(f'          index_1 ("{index_1}");')
+                lines.append(f'          index_2 ("{index_2}");')
+                lines.append("          values ( \\")
+                for row in range(rows):
+                    values = ", ".join(f"{(cell_index + row * cols + col) * 0.731 + 1:g}" for col in range(cols))
+                    separator = "," if row < rows - 1 else ""
+                    lines.append(f'            "{values}"{separator} \\')
+                lines.append("          );")
+                lines.append("        }")
+            lines.append("      }")
+            lines.append("    }")
+        lines.append("  }")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
@@ -1,21 +1,150 @@
 from __future__ import annotations
 
 import argparse
+import glob
+import hashlib
 import json
+import mmap
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Union
 
 import config_compiler
-from liberty_core import Formatter, Parser, dump_parse_result
-from patch_engine import PatchRunner
-from provenance import ProvenanceDB
+from liberty_core import (
+    DiffError,
+    FloatRenderer,
+    Formatter,
+    ParseCache,
+    ParseResult,
+    Parser,
+    RootNode,
+    SourceDiff,
+    apply_diff,
+    compression_suffix,
+    diff_modified,
+    dump_parse_result,
+    open_binary,
+    read_decompressed,
+)
+from patch_engine import PatchPlan, PatchRunner
+from provenance import ProvenanceDB, ThroughputRecord, read_recent_throughput
 
 
 def _read_text(path: str) -> str:
     return Path(path).read_text(encoding="utf-8")
 
 
-def _write_text(path: str, text: str) -> None:
-    Path(path).write_text(text, encoding="utf-8")
+class _HashingWriter:
+    """Text sink that UTF-8 encodes into a binary file and hashes everything written."""
+
+    def __init__(self, handle: BinaryIO) -> None:
+        self.handle = handle
+        self.digest = hashlib.sha256()
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8")
+        self.digest.update(data)
+        self.handle.write(data)
+        return len(text)
+
+
+@contextmanager
+def _replacing(path: str) -> Iterator[BinaryIO]:
+    """Write to a temporary file next to ``path`` and move it over ``path`` once the block succeeds.
+
+    The parsed input is still read through its memory map while the output is
+    written, so truncating ``path`` in place would destroy an input that is
+    also the output.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as temp_file:
+            yield temp_file
+        # mkstemp creates the file owner-only; give it the mode open() would have.
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(temp_path, 0o666 & ~umask)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def _write_output(path: str, formatter: Formatter, root: RootNode) -> str:
+    """Stream the formatted CST to ``path`` and return the SHA-256 of the text written.
+
+    Paths with a compression suffix are compressed on the fly; the hash is of
+    the uncompressed text.
+    """
+    with _replacing(path) as temp_file, open_binary(path, "wb", fileobj=temp_file) as handle:
+        writer = _HashingWriter(handle)
+        formatter.dump_to(root, writer)
+    return writer.digest.hexdigest()
+
+
+def _write_diff(path: str, diff: SourceDiff) -> str:
+    """Write ``diff`` as JSON to ``path`` and return the SHA-256 of what was written."""
+    with _replacing(path) as handle:
+        writer = _HashingWriter(handle)
+        diff.dump(writer)
+    return writer.digest.hexdigest()
+
+
+def _hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _default_parse_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return os.environ.get("LIBERTY_PARSE_CACHE") or str(Path(cache_home) / "liberty_patcher" / "parse")
+
+
+def _add_parse_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--parse-cache",
+        default=_default_parse_cache_dir(),
+        help="Directory caching parsed inputs by content hash.",
+    )
+    parser.add_argument(
+        "--no-parse-cache",
+        dest="parse_cache",
+        action="store_const",
+        const=None,
+        help="Always parse the input instead of using the parse cache.",
+    )
+
+
+def _significant_digits(value: str) -> int:
+    try:
+        digits = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {value!r}") from None
+    if digits < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {digits}")
+    return digits
+
+
+def _add_significant_digits_argument(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--significant-digits",
+        type=_significant_digits,
+        help="Render table values with this many significant digits (default: 6).",
+    )
+
+
+def _float_format(args: argparse.Namespace) -> str:
+    if args.significant_digits is None:
+        return "g"
+    return FloatRenderer.significant_digits(args.significant_digits).float_format
 
 
 def _build_parser() -> argparse.ArgumentParser:
@@ -27,15 +156,64 @@ def _build_parser() -> argparse.ArgumentParser:
     format_parser.add_argument("--output", required=True, help="Output Liberty file.")
     format_parser.add_argument("--indent-size", type=int, default=2, help="Formatter indentation size.")
     format_parser.add_argument("--dump-parse", help="Optional JSON path to dump parsed CST data.")
+    format_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for parsing and formatting cells.",
+    )
+    _add_significant_digits_argument(format_parser)
+    _add_parse_cache_arguments(format_parser)
 
     patch_parser = subparsers.add_parser("patch", help="Apply a patch configuration.")
-    patch_parser.add_argument("--input", required=True, help="Input Liberty file.")
+    inputs = patch_parser.add_mutually_exclusive_group(required=True)
+    inputs.add_argument("--input", help="Input Liberty file.")
+    inputs.add_argument("--inputs", help="Glob of Liberty files (e.g. PVT corners) to patch with the same config.")
     patch_parser.add_argument("--config", required=True, help="Patch config JSON file.")
-    patch_parser.add_argument("--output", required=True, help="Output Liberty file.")
+    outputs = patch_parser.add_mutually_exclusive_group()
+    outputs.add_argument("--output", help="Output Liberty file.")
+    outputs.add_argument("--output-dir", help="Directory for the patched --inputs, written under their own names.")
     patch_parser.add_argument("--description", default="", help="Patch description.")
     patch_parser.add_argument("--indent-size", type=int, default=2, help="Formatter indentation size.")
     patch_parser.add_argument("--db", default="provenance.db", help="Provenance SQLite DB path.")
     patch_parser.add_argument("--dump-parse", help="Optional JSON path to dump parsed CST data.")
+    patch_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help=(
+            "Worker processes for parsing (not with --lazy) and formatting cells; "
+            "with --inputs, the number of files patched at once."
+        ),
+    )
+    patch_parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help=(
+            "Only parse cells and values tables the config touches; everything else is copied through verbatim."
+        ),
+    )
+    patch_parser.add_argument(
+        "--emit",
+        choices=("library", "diff"),
+        default="library",
+        help="Write the full patched library, or a JSON diff of the modified attributes for apply-diff.",
+    )
+    patch_parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help=(
+            "Report the groups, tables and values each modification would touch, overlaps between "
+            "modifications, and an estimated run time; no table is rewritten and nothing is written."
+        ),
+    )
+    _add_significant_digits_argument(patch_parser)
+    _add_parse_cache_arguments(patch_parser)
+
+    apply_diff_parser = subparsers.add_parser("apply-diff", help="Rebuild a patched library from a diff.")
+    apply_diff_parser.add_argument("--input", required=True, help="Liberty file the diff was made from.")
+    apply_diff_parser.add_argument("--diff", required=True, help="Diff written by patch --emit diff.")
+    apply_diff_parser.add_argument("--output", required=True, help="Output Liberty file.")
 
     compile_parser = subparsers.add_parser("compile-config", help="Compile YAML config to JSON.")
     compile_parser.add_argument("--input", required=True, help="Input YAML config file.")
@@ -44,28 +222,245 @@ def _build_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def _parse_input(args: argparse.Namespace, input_hash: Optional[str] = None, lazy: bool = False) -> ParseResult:
+    """Parse ``args.input``, through the parse cache when one is set.
+
+    ``input_hash`` is the input's SHA-256 if the caller already has it; it is
+    only computed here when the cache needs it.
+    """
+    if lazy:
+        # Lazy parses are cheap and hold open references to the input, so they are never cached.
+        return Parser(compact=True, lazy=True, defer_tables=True).parse_file(args.input)
+    cache = ParseCache(args.parse_cache) if args.parse_cache else None
+    parser = Parser(compact=True, jobs=args.jobs)
+    if cache is not None:
+        input_hash = input_hash or _hash_file(args.input)
+        cached = cache.load(input_hash, parser)
+        if cached is not None:
+            return cached
+    parse_result = parser.parse_file(args.input)
+    if cache is not None:
+        cache.store(input_hash, parse_result, parser)
+    return parse_result
+
+
 def _handle_format(args: argparse.Namespace) -> int:
-    text = _read_text(args.input)
-    parse_result = Parser().parse(text)
+    parse_result = _parse_input(args)
     if args.dump_parse:
         dump_parse_result(parse_result, args.dump_parse)
-    output_text = Formatter(indent_size=args.indent_size).dump(parse_result.root)
-    _write_text(args.output, output_text)
+    formatter = Formatter(indent_size=args.indent_size, float_format=_float_format(args), jobs=args.jobs)
+    _write_output(args.output, formatter, parse_result.root)
     return 0
 
 
 def _handle_patch(args: argparse.Namespace) -> int:
-    text = _read_text(args.input)
-    parse_result = Parser().parse(text)
+    if args.dry_run:
+        return _handle_patch_dry_run(args)
+    if args.inputs is not None:
+        return _handle_patch_batch(args)
+    config = _load_config(args.config)
+    provenance_db = ProvenanceDB(args.db) if args.db else None
+    runner = PatchRunner(provenance_db=provenance_db, float_format=_float_format(args))
+    result = _patch_file(args, config, runner)
+    if provenance_db is not None:
+        runner.log_run_hashes(config, args.description, result.input_hash, result.output_hash, args.output)
+        provenance_db.log_throughput([result.throughput(runner.batch_id)])
+    return 0
+
+
+@dataclass
+class _PatchedFile:
+    input_path: str
+    output_path: str
+    input_hash: str
+    output_hash: str
+    input_bytes: int
+    values: int
+    parse_seconds: float
+    patch_seconds: float
+    write_seconds: float
+
+    @property
+    def seconds(self) -> float:
+        return self.parse_seconds + self.patch_seconds + self.write_seconds
+
+    def throughput(self, batch_id: str) -> ThroughputRecord:
+        return ThroughputRecord(
+            batch_id=batch_id,
+            input_bytes=self.input_bytes,
+            values=self.values,
+            parse_seconds=self.parse_seconds,
+            patch_seconds=self.patch_seconds,
+            write_seconds=self.write_seconds,
+        )
+
+
+def _patch_file(args: argparse.Namespace, config: Union[dict, PatchPlan], runner: PatchRunner) -> _PatchedFile:
+    """Parse, patch and write ``args.input``, timing each step."""
+    start = time.perf_counter()
+    input_hash = _hash_file(args.input)
+    parse_result = _parse_input(args, input_hash, lazy=args.lazy)
     if args.dump_parse:
         dump_parse_result(parse_result, args.dump_parse)
+    parsed = time.perf_counter()
+    summary = runner.run(parse_result, config)
+    patched = time.perf_counter()
+    formatter = Formatter(
+        indent_size=args.indent_size, float_format=_float_format(args), passthrough=True, jobs=args.jobs
+    )
+    if args.emit == "diff":
+        output_hash = _write_diff(args.output, diff_modified(parse_result.root, formatter, input_hash))
+    else:
+        output_hash = _write_output(args.output, formatter, parse_result.root)
+    return _PatchedFile(
+        input_path=args.input,
+        output_path=args.output,
+        input_hash=input_hash,
+        output_hash=output_hash,
+        input_bytes=os.path.getsize(args.input),
+        values=summary.values,
+        parse_seconds=parsed - start,
+        patch_seconds=patched - parsed,
+        write_seconds=time.perf_counter() - patched,
+    )
+
+
+# Patch plan sent once to each batch worker by _init_batch_worker.
+_batch_plan: Optional[PatchPlan] = None
+
+
+def _init_batch_worker(plan: PatchPlan) -> None:
+    global _batch_plan
+    _batch_plan = plan
+
+
+def _patch_batch_file(args: argparse.Namespace, plan: Optional[PatchPlan] = None) -> _PatchedFile:
+    return _patch_file(args, plan or _batch_plan, PatchRunner(float_format=_float_format(args)))
+
+
+def _input_paths(pattern: str) -> List[str]:
+    input_paths = sorted(glob.glob(pattern, recursive=True))
+    if not input_paths:
+        raise FileNotFoundError(f"No files match {pattern}")
+    return input_paths
+
+
+def _batch_file_args(args: argparse.Namespace) -> List[argparse.Namespace]:
+    suffix = ".diff.json" if args.emit == "diff" else ""
+    file_args: List[argparse.Namespace] = []
+    outputs = {}
+    for input_path in _input_paths(args.inputs):
+        output_path = str(Path(args.output_dir) / (Path(input_path).name + suffix))
+        if output_path in outputs:
+            raise ValueError(f"{input_path} and {outputs[output_path]} would both be written to {output_path}")
+        outputs[output_path] = input_path
+        # Files are spread over the workers, so each one is parsed and formatted in a single process.
+        fields = dict(vars(args), input=input_path, inputs=None, output=output_path, output_dir=None, jobs=1)
+        file_args.append(argparse.Namespace(**fields))
+    return file_args
+
+
+def _handle_patch_batch(args: argparse.Namespace) -> int:
+    """Patch every file matching ``--inputs`` with one compiled config and one provenance batch."""
+    if args.dump_parse:
+        raise ValueError("--dump-parse takes a single --input")
+    file_args = _batch_file_args(args)
     config = _load_config(args.config)
-    provenance_db = ProvenanceDB(args.db) if args.db else None
-    runner = PatchRunner(provenance_db=provenance_db)
-    runner.run(parse_result, config)
-    output_text = Formatter(indent_size=args.indent_size).dump(parse_result.root)
-    _write_text(args.output, output_text)
-    runner.log_run(config, args.description, text, output_text, args.output)
+    plan = PatchPlan.compile(config)
+    Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+    jobs = min(args.jobs, len(file_args))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker, initargs=(plan,)) as pool:
+            results = list(pool.map(_patch_batch_file, file_args))
+    else:
+        results = [_patch_batch_file(file_arg, plan) for file_arg in file_args]
+    elapsed = time.perf_counter() - start
+    if args.db:
+        provenance_db = ProvenanceDB(args.db)
+        runner = PatchRunner(provenance_db=provenance_db)
+        runner.log_artifact_hashes(
+            config,
+            args.description,
+            [(result.input_hash, result.output_hash, result.output_path) for result in results],
+        )
+        provenance_db.log_throughput([result.throughput(runner.batch_id) for result in results])
+    for result in results:
+        print(
+            f"{result.input_path}: {_megabytes(result.input_bytes):.1f} MB in {result.seconds:.2f}s "
+            f"({_megabytes(result.input_bytes) / max(result.seconds, 1e-9):.1f} MB/s)"
+        )
+    total = _megabytes(sum(result.input_bytes for result in results))
+    print(f"{len(results)} files, {total:.1f} MB in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.1f} MB/s)")
+    return 0
+
+
+def _handle_patch_dry_run(args: argparse.Namespace) -> int:
+    """Report what the config would touch in each input and estimate the run time; write nothing."""
+    input_paths = [args.input] if args.input is not None else _input_paths(args.inputs)
+    plan = PatchPlan.compile(_load_config(args.config))
+    # Read-only: a dry run must not create the DB or add its tables.
+    history = read_recent_throughput(args.db) if args.db else []
+    estimates: List[float] = []
+    for input_path in input_paths:
+        # A lazy parse only expands the groups the scopes walk into and leaves tables unread.
+        parse_result = Parser(compact=True, lazy=True, defer_tables=True).parse_file(input_path)
+        counts = PatchRunner().dry_run(parse_result, plan)
+        print(f"{input_path}:")
+        for index, count in enumerate(counts, start=1):
+            print(
+                f"  #{index} {count.operation} [{count.scope}]: "
+                f"{count.groups} groups, {count.tables} tables, {count.values} values"
+            )
+            if count.groups == 0:
+                print("    matches nothing; a real run stops here with a scope error")
+            if count.repeated_tables:
+                print(f"    {count.repeated_tables} tables are reached through several groups, patched once per match")
+            for earlier, shared in sorted(count.overlaps.items()):
+                print(f"    overlaps #{earlier + 1} on {shared} tables")
+        values = sum(count.values for count in counts)
+        estimate = _estimate_seconds(history, os.path.getsize(input_path), values)
+        if estimate is None:
+            print("  estimated time: unknown until a patch run records throughput in --db")
+            continue
+        estimates.append(estimate)
+        print(f"  estimated time: {estimate:.2f}s (from {len(history)} recorded runs)")
+    if len(input_paths) > 1 and len(estimates) == len(input_paths):
+        jobs = min(args.jobs, len(input_paths))
+        print(f"{len(input_paths)} files: estimated {sum(estimates) / jobs:.2f}s with --jobs {jobs}")
+    return 0
+
+
+def _estimate_seconds(history: List[ThroughputRecord], input_bytes: int, values: int) -> Optional[float]:
+    """Parse and write time per input byte, and patch time per value, at the recorded rates."""
+    recorded_bytes = sum(record.input_bytes for record in history)
+    recorded_values = sum(record.values for record in history)
+    patch_seconds = sum(record.patch_seconds for record in history)
+    if recorded_bytes == 0 or recorded_values == 0:
+        return None
+    io_seconds = sum(record.parse_seconds + record.write_seconds for record in history)
+    return input_bytes * io_seconds / recorded_bytes + values * patch_seconds / recorded_values
+
+
+def _megabytes(size: int) -> float:
+    return size / 1e6
+
+
+def _handle_apply_diff(args: argparse.Namespace) -> int:
+    with open(args.diff, encoding="utf-8") as handle:
+        diff = SourceDiff.load(handle)
+    if _hash_file(args.input) != diff.input_sha256:
+        raise DiffError(f"{args.input} is not the file {args.diff} was made from")
+    with _replacing(args.output) as temp_file, open_binary(args.output, "wb", fileobj=temp_file) as output:
+        if compression_suffix(args.input) is not None:
+            apply_diff(diff, read_decompressed(args.input), output)
+            return 0
+        with open(args.input, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                apply_diff(diff, b"", output)
+                return 0
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as source:
+                apply_diff(diff, source, output)
     return 0
 
 
@@ -89,7 +484,13 @@ def main() -> int:
     if args.command == "format":
         return _handle_format(args)
     if args.command == "patch":
+        mismatched = args.output_dir is not None if args.input is not None else args.output is not None
+        missing = args.output is None and args.output_dir is None and not args.dry_run
+        if mismatched or missing:
+            parser.error("patch takes --input with --output, or --inputs with --output-dir")
         return _handle_patch(args)
+    if args.command == "apply-diff":
+        return _handle_apply_diff(args)
     if args.command == "compile-config":
         return _handle_compile_config(args)
     parser.error("Unknown command")
@@ -22,6 +22,9 @@ def main(
         output=output_path,
         indent_size=indent_size,
         dump_parse=None,
+        jobs=1,
+        significant_digits=None,
+        parse_cache=None,
     )
 
     print("Formatting with CLI...")
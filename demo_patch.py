@@ -21,12 +21,20 @@ def main(
 
     args = argparse.Namespace(
         input=input_path,
+        inputs=None,
         config=config_path,
         output=output_path,
+        output_dir=None,
         description="demo patch",
         indent_size=indent_size,
         db="",
         dump_parse=None,
+        lazy=False,
+        emit="library",
+        dry_run=False,
+        jobs=1,
+        significant_digits=None,
+        parse_cache=None,
     )
 
     print("Patching with CLI...")
@@ -1,35 +1,61 @@
+from .cache import ParseCache
+from .compressed import CompressionError, compression_suffix, open_binary, read_decompressed
 from .cst import (
     AttributeNode,
     CommentNode,
     CSTNode,
     GroupNode,
+    LazyGroupNode,
     LibraryContext,
     QuoteStyle,
     RootNode,
+    TableAttributeNode,
     Token,
     TokenType,
 )
+from .diff import DiffEdit, DiffError, SourceDiff, apply_diff, diff_modified
 from .formatter import Formatter
 from .lexer import Lexer, LexerError
 from .parser import ParseResult, Parser, ParserError
 from .serialize import dump_parse_result, serialize_parse_result
+from .token_buffer import TokenBuffer, TokenSlice
+from .values import ArrayRow, AttributeKind, DecodedAttribute, FloatRenderer, decode_tokens
 
 __all__ = [
+    "ArrayRow",
+    "AttributeKind",
     "AttributeNode",
     "CommentNode",
+    "CompressionError",
     "CSTNode",
+    "DecodedAttribute",
+    "DiffEdit",
+    "DiffError",
+    "FloatRenderer",
     "Formatter",
     "GroupNode",
+    "LazyGroupNode",
     "Lexer",
     "LexerError",
     "LibraryContext",
+    "ParseCache",
     "ParseResult",
     "Parser",
     "ParserError",
     "QuoteStyle",
     "RootNode",
+    "SourceDiff",
+    "TableAttributeNode",
     "Token",
+    "TokenBuffer",
+    "TokenSlice",
     "TokenType",
+    "apply_diff",
+    "compression_suffix",
+    "decode_tokens",
+    "diff_modified",
     "dump_parse_result",
+    "open_binary",
+    "read_decompressed",
     "serialize_parse_result",
 ]
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import mmap
+import os
+import pickle
+import tempfile
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .parser import ParseResult, Parser
+
+# Bump whenever the CST classes or parser output change shape, so results
+# pickled by an older parser are never loaded.
+PARSE_CACHE_VERSION = "4"
+DEFAULT_MAX_BYTES = 1 << 30
+
+_SUFFIX = ".parse"
+# Parser options that change the tree built from the same input.
+_MODE_OPTIONS = ("streaming", "lazy", "compact", "defer_tables")
+
+
+class _ResultPickler(pickle.Pickler):
+    def reducer_override(self, obj: object) -> object:
+        if isinstance(obj, mmap.mmap):
+            # Store a memory-mapped input as the bytes it maps. The pickle memo
+            # keeps a single copy for the root and every token buffer sharing it.
+            return bytes, (obj[:],)
+        return NotImplemented
+
+
+class ParseCache:
+    """Directory of pickled ``ParseResult``s keyed by input SHA-256 and parser version.
+
+    Callers that parse the same input in more than one mode pass the
+    ``Parser`` they use, so each mode gets its own entry and a result is only
+    ever loaded in place of one built with the same tree-shaping options.
+
+    Loading an entry refreshes its modification time; storing one evicts the
+    least recently used entries until the directory fits in ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def path_for(self, digest: str, parser: Optional[Parser] = None) -> Path:
+        return self.directory / f"{digest}-v{PARSE_CACHE_VERSION}{_parse_mode(parser)}{_SUFFIX}"
+
+    def load(self, digest: str, parser: Optional[Parser] = None) -> Optional[ParseResult]:
+        path = self.path_for(digest, parser)
+        try:
+            with open(path, "rb") as handle:
+                result = pickle.load(handle)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Truncated or stale entry: drop it and parse again.
+            path.unlink(missing_ok=True)
+            return None
+        return result
+
+    def store(self, digest: str, result: ParseResult, parser: Optional[Parser] = None) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                _ResultPickler(temp_file, protocol=pickle.HIGHEST_PROTOCOL).dump(result)
+            os.replace(temp_path, self.path_for(digest, parser))
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    def evict(self) -> None:
+        entries: List[Tuple[float, int, Path]] = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def _parse_mode(parser: Optional[Parser]) -> str:
+    if parser is None:
+        return ""
+    flags = [name for name in _MODE_OPTIONS if getattr(parser, name)]
+    if parser.jobs > 1 and not parser.lazy:
+        # Cells parsed in workers hold their own token buffers.
+        flags.append("parallel")
+    return "".join(f"-{flag}" for flag in flags)
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import bz2
+import gzip
+import lzma
+from pathlib import Path
+from typing import BinaryIO, Optional
+
+try:
+    from compression import zstd
+except ImportError:  # pragma: no cover - zstd joined the stdlib in Python 3.14
+    zstd = None
+
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+
+class CompressionError(ValueError):
+    pass
+
+
+def compression_suffix(path: str) -> Optional[str]:
+    """Return the compression suffix of ``path`` (``".gz"``, ...), or ``None`` for plain files."""
+    suffix = Path(path).suffix.lower()
+    return suffix if suffix in COMPRESSED_SUFFIXES else None
+
+
+def open_binary(path: str, mode: str = "rb", fileobj: Optional[BinaryIO] = None) -> BinaryIO:
+    """Open ``path`` for binary ``"rb"``/``"wb"``, (de)compressing on the fly by suffix.
+
+    Compressed streams are read and written in chunks, so nothing is ever
+    fully decompressed to disk. Gzip output is written with a zero mtime so
+    writing the same text to the same path always produces the same bytes.
+
+    With ``fileobj``, the stream goes through that open file instead and
+    ``path`` only picks the format; closing the result leaves ``fileobj`` open.
+    """
+    suffix = compression_suffix(path)
+    if suffix is None:
+        return open(path, mode) if fileobj is None else fileobj
+    target = path if fileobj is None else fileobj
+    if suffix == ".gz":
+        return gzip.GzipFile(path, mode, mtime=0, fileobj=fileobj)
+    if suffix == ".bz2":
+        return bz2.open(target, mode)
+    if suffix == ".xz":
+        return lzma.open(target, mode)
+    if zstd is None:
+        raise CompressionError(f"Reading and writing {path} needs Python 3.14 or newer for zstd support.")
+    return zstd.open(target, mode)
+
+
+def read_decompressed(path: str, chunk_size: int = 1 << 20) -> bytes:
+    """Stream-decompress ``path`` into memory."""
+    chunks = []
+    with open_binary(path) as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            chunks.append(chunk)
+    return b"".join(chunks)
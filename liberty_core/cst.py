@@ -2,7 +2,10 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import List, Optional
+from typing import TYPE_CHECKING, Callable, List, Optional, Sequence, Union
+
+if TYPE_CHECKING:
+    from .values import DecodedAttribute
 
 
 class QuoteStyle(Enum):
@@ -10,38 +13,197 @@ class QuoteStyle(Enum):
     DOUBLE = 1
 
 
-@dataclass
+# Shared by every leaf node so attributes and comments do not each carry an
+# empty list; add_child() swaps in a real list on first use.
+NO_CHILDREN: Sequence["CSTNode"] = ()
+
+
+@dataclass(slots=True)
 class CSTNode:
+    """Base CST node.
+
+    Nodes parsed from a token buffer or a token stream record
+    ``source[span_start:span_end]``, the text from their first token through
+    their terminator, in the source held by ``RootNode.source``; nodes parsed
+    from a plain token list leave both at -1. ``dirty`` is set by
+    ``mark_dirty`` on an edited node and its ancestors so the formatter knows
+    which spans it may no longer copy.
+    """
+
     parent: Optional["CSTNode"] = None
     children: List["CSTNode"] = field(default_factory=list)
+    span_start: int = field(default=-1, repr=False, compare=False, kw_only=True)
+    span_end: int = field(default=-1, repr=False, compare=False, kw_only=True)
+    dirty: bool = field(default=False, repr=False, compare=False, kw_only=True)
 
     def add_child(self, child: "CSTNode") -> None:
         child.parent = self
+        if self.children is NO_CHILDREN:
+            self.children = []
         self.children.append(child)
 
+    def mark_dirty(self) -> None:
+        node: Optional[CSTNode] = self
+        while node is not None and not node.dirty:
+            node.dirty = True
+            node = node.parent
 
-@dataclass
+
+@dataclass(slots=True)
 class GroupNode(CSTNode):
     name: str = ""
     args_tokens: List["Token"] = field(default_factory=list)
 
 
-@dataclass
+class LazyGroupNode(GroupNode):
+    """Group whose children are parsed from its source span on first access.
+
+    ``source[body_start:body_end]`` is the text between the group's braces and
+    ``body_line`` the line number at ``body_start``. Until ``children`` is read,
+    the group has not been parsed past its header.
+    """
+
+    __slots__ = ("source", "body_start", "body_end", "body_line", "_loader", "_children")
+
+    def __init__(
+        self,
+        name: str,
+        args_tokens: List["Token"],
+        source: Union[str, bytes, object],
+        body_start: int,
+        body_end: int,
+        body_line: int,
+        loader: Callable[[], List[CSTNode]],
+    ) -> None:
+        self.source = source
+        self.body_start = body_start
+        self.body_end = body_end
+        self.body_line = body_line
+        self._loader: Optional[Callable[[], List[CSTNode]]] = loader
+        super().__init__(name=name, args_tokens=args_tokens)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loader is None
+
+    @property
+    def children(self) -> List[CSTNode]:
+        if self._loader is not None:
+            nodes = self._loader()
+            self._loader = None
+            for node in nodes:
+                self.add_child(node)
+        return self._children
+
+    @children.setter
+    def children(self, value: List[CSTNode]) -> None:
+        self._children = value
+
+    def body_text(self) -> str:
+        body = self.source[self.body_start : self.body_end]
+        if isinstance(body, bytes):
+            return body.decode("utf-8")
+        return body
+
+
+@dataclass(slots=True)
 class AttributeNode(CSTNode):
+    children: Sequence[CSTNode] = NO_CHILDREN
     key: str = ""
     raw_tokens: List["Token"] = field(default_factory=list)
     quote_style: QuoteStyle = QuoteStyle.NONE
     use_parens: bool = False
-
-
-@dataclass
+    # (raw_tokens, DecodedAttribute) from the last decoded() call.
+    _decoded: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def decoded(self) -> "DecodedAttribute":
+        """Classify ``raw_tokens`` and decode numeric rows, once per token list.
+
+        The result is cached until ``raw_tokens`` is assigned a new list;
+        editing the current list in place does not invalidate it.
+        """
+        tokens = self.raw_tokens
+        cached = self._decoded
+        if cached is not None and cached[0] is tokens:
+            return cached[1]
+        # Imported here because the values module depends on this one.
+        from .values import decode_tokens
+
+        result = decode_tokens(tokens)
+        self._decoded = (tokens, result)
+        return result
+
+
+class TableAttributeNode(AttributeNode):
+    """Parenthesized table attribute kept as a source span until its tokens are read.
+
+    ``source[body_start:body_end]`` is the text between the parentheses and
+    ``body_line`` the line number at ``body_start``. ``raw_tokens`` lexes the
+    body on first access; until then the formatter copies it as written.
+    """
+
+    __slots__ = ("source", "body_start", "body_end", "body_line", "_raw_tokens")
+
+    def __init__(
+        self,
+        key: str,
+        source: Union[str, bytes, object],
+        body_start: int,
+        body_end: int,
+        body_line: int,
+        quote_style: QuoteStyle = QuoteStyle.NONE,
+    ) -> None:
+        super().__init__(key=key, quote_style=quote_style, use_parens=True)
+        self.source = source
+        self.body_start = body_start
+        self.body_end = body_end
+        self.body_line = body_line
+        self._raw_tokens: Optional[Sequence["Token"]] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._raw_tokens is not None
+
+    @property
+    def raw_tokens(self) -> Sequence["Token"]:
+        if self._raw_tokens is None:
+            # Imported here because the lexer module depends on this one.
+            from .lexer import Lexer
+
+            lexer = Lexer(self.source, start=self.body_start, end=self.body_end, line=self.body_line)
+            self._raw_tokens = lexer.tokenize()
+        return self._raw_tokens
+
+    @raw_tokens.setter
+    def raw_tokens(self, value: Sequence["Token"]) -> None:
+        self._raw_tokens = value
+
+    def __getstate__(self) -> tuple:
+        # The default slot state reads ``raw_tokens`` through the property
+        # above, which would lex a deferred table just to pickle it.
+        state = {}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if name != "raw_tokens" and name not in state and hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return None, state
+
+    def body_text(self) -> str:
+        text = self.source[self.body_start : self.body_end]
+        if isinstance(text, bytes):
+            return text.decode("utf-8")
+        return text
+
+
+@dataclass(slots=True)
 class CommentNode(CSTNode):
+    children: Sequence[CSTNode] = NO_CHILDREN
     text: str = ""
 
 
-@dataclass
+@dataclass(slots=True)
 class RootNode(CSTNode):
-    pass
+    source: Optional[Union[str, bytes, object]] = field(default=None, repr=False, compare=False, kw_only=True)
 
 
 @dataclass
@@ -72,7 +234,7 @@ class TokenType(Enum):
     ESCAPED_NEWLINE = "ESCAPED_NEWLINE"
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     type: TokenType
     value: str
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from typing import IO, Any, Dict, Iterator, List, Tuple, Union
+
+from .cst import CSTNode, GroupNode, RootNode, TokenType
+from .formatter import Formatter
+
+DIFF_FORMAT = "liberty-patch-diff"
+DIFF_VERSION = 1
+
+_VALUE_TYPES = (TokenType.STRING, TokenType.IDENTIFIER)
+
+
+class DiffError(ValueError):
+    pass
+
+
+@dataclass
+class DiffEdit:
+    """Replace ``source[start:end]`` (the statement ``old``) with ``new``."""
+
+    path: List[str]
+    start: int
+    end: int
+    old: str
+    new: str
+
+
+@dataclass
+class SourceDiff:
+    """Edits to a parsed input, identified by its SHA-256, in source order.
+
+    Offsets index ``RootNode.source`` as parsed: bytes for ``Parser.parse_file``.
+    """
+
+    input_sha256: str
+    edits: List[DiffEdit] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "format": DIFF_FORMAT,
+            "version": DIFF_VERSION,
+            "input_sha256": self.input_sha256,
+            "edits": [
+                {"path": edit.path, "start": edit.start, "end": edit.end, "old": edit.old, "new": edit.new}
+                for edit in self.edits
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "SourceDiff":
+        if payload.get("format") != DIFF_FORMAT or payload.get("version") != DIFF_VERSION:
+            raise DiffError(f"Not a version {DIFF_VERSION} {DIFF_FORMAT} file")
+        edits = [
+            DiffEdit(path=list(edit["path"]), start=edit["start"], end=edit["end"], old=edit["old"], new=edit["new"])
+            for edit in payload["edits"]
+        ]
+        return cls(input_sha256=payload["input_sha256"], edits=edits)
+
+    def dump(self, fileobj: IO[str]) -> None:
+        json.dump(self.to_dict(), fileobj, indent=2, ensure_ascii=False)
+        fileobj.write("\n")
+
+    @classmethod
+    def load(cls, fileobj: IO[str]) -> "SourceDiff":
+        return cls.from_dict(json.load(fileobj))
+
+
+def diff_modified(root: RootNode, formatter: Formatter, input_sha256: str) -> SourceDiff:
+    """Collect the re-rendered text of every modified statement under ``root``.
+
+    Only dirty nodes are visited, so the cost follows the number of edits and
+    the size of the groups enclosing them, not the size of the input. Each
+    deepest dirty node becomes one edit rendered by ``formatter``.
+    """
+    if root.source is None:
+        raise DiffError("Diffs need a compact parse that keeps the source")
+    edits: List[DiffEdit] = []
+    for node, path, indent in _deepest_dirty(root):
+        if node.span_start < 0:
+            raise DiffError(f"No source span for modified node at {'/'.join(path)}")
+        lines = list(formatter.iter_node_lines(node, indent, root.source))
+        new = "\n".join(lines)[indent * formatter.indent_size :]
+        old = _text(root.source[node.span_start : node.span_end])
+        edits.append(DiffEdit(path=path, start=node.span_start, end=node.span_end, old=old, new=new))
+    edits.sort(key=lambda edit: edit.start)
+    return SourceDiff(input_sha256=input_sha256, edits=edits)
+
+
+def apply_diff(
+    diff: SourceDiff,
+    source: Union[str, bytes, object],
+    output: IO[Any],
+    chunk_size: int = 1 << 20,
+) -> None:
+    """Write ``source`` with every edit in ``diff`` spliced in to ``output``.
+
+    ``output`` takes the same type as ``source`` slices (bytes for a mapped file).
+    Raises ``DiffError`` if an edit's span no longer holds its ``old`` text.
+    """
+    binary = not isinstance(source, str)
+    position = 0
+    for edit in diff.edits:
+        if edit.start < position or _text(source[edit.start : edit.end]) != edit.old:
+            raise DiffError(f"Input does not match the diff at {'/'.join(edit.path)}")
+        _copy(source, position, edit.start, output, chunk_size)
+        output.write(edit.new.encode("utf-8") if binary else edit.new)
+        position = edit.end
+    _copy(source, position, len(source), output, chunk_size)
+
+
+def _deepest_dirty(root: RootNode) -> Iterator[Tuple[CSTNode, List[str], int]]:
+    stack: List[Tuple[CSTNode, List[str], int]] = [(root, [], -1)]
+    while stack:
+        node, path, indent = stack.pop()
+        dirty_children = [child for child in node.children if child.dirty]
+        if not dirty_children and node is not root:
+            yield node, path, indent
+        for child in reversed(dirty_children):
+            stack.append((child, path + [_label(child)], indent + 1))
+
+
+def _label(node: CSTNode) -> str:
+    if isinstance(node, GroupNode):
+        args = ",".join(token.value for token in node.args_tokens if token.type in _VALUE_TYPES)
+        return f"{node.name}({args})"
+    return getattr(node, "key", type(node).__name__)
+
+
+def _copy(source: Union[str, bytes, object], start: int, end: int, output: IO[Any], chunk_size: int) -> None:
+    for offset in range(start, end, chunk_size):
+        output.write(source[offset : min(offset + chunk_size, end)])
+
+
+def _text(value: Union[str, bytes]) -> str:
+    if isinstance(value, str):
+        return value
+    return value.decode("utf-8")
@@ -1,43 +1,203 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Iterable, List
+import io
+import mmap
+import multiprocessing
+import pickle
+import textwrap
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import IO, Deque, Dict, Iterable, Iterator, List, Optional, Union
 
-from .cst import AttributeNode, CommentNode, GroupNode, QuoteStyle, RootNode, Token, TokenType
+from .cst import (
+    AttributeNode,
+    CommentNode,
+    CSTNode,
+    GroupNode,
+    LazyGroupNode,
+    QuoteStyle,
+    RootNode,
+    TableAttributeNode,
+    Token,
+    TokenType,
+)
+from .token_buffer import TokenSlice
+from .values import ArrayRow, AttributeKind, DecodedAttribute, FloatRenderer
 
 
 class Formatter:
-    def __init__(self, indent_size: int = 2, float_format: str = "g") -> None:
+    """Render a CST as Liberty text.
+
+    With ``passthrough=True``, nodes that carry a source span and were never
+    marked dirty are copied from ``RootNode.source`` as written (after the
+    indentation of their first line) instead of being re-rendered.
+
+    With ``jobs > 1``, ``dump`` and ``dump_to`` render the subgroups of each
+    top-level group (the cells of a library) in batches on that many worker
+    processes and join the chunks in order; the text is the same as with one job.
+    """
+
+    def __init__(
+        self,
+        indent_size: int = 2,
+        float_format: str = "g",
+        passthrough: bool = False,
+        jobs: int = 1,
+    ) -> None:
         self.indent_size = indent_size
         self.float_format = float_format
+        self._floats = FloatRenderer(float_format)
+        self.passthrough = passthrough
+        self.jobs = jobs
+        self._source: Optional[object] = None
 
     def dump(self, root: RootNode) -> str:
-        lines: List[str] = []
+        return "\n".join(self._iter_chunks(root)) + "\n"
+
+    def dump_to(self, root: RootNode, fileobj: IO[str], chunk_size: int = 1 << 16) -> None:
+        """Write the same text as ``dump`` to ``fileobj`` in chunks of about ``chunk_size`` characters."""
+        chunk: List[str] = []
+        pending = 0
+        written = False
+        for line in self._iter_chunks(root):
+            chunk.append(line)
+            pending += len(line) + 1
+            if pending >= chunk_size:
+                fileobj.write("\n".join(chunk) + "\n")
+                chunk = []
+                pending = 0
+                written = True
+        if chunk or not written:
+            fileobj.write("\n".join(chunk) + "\n")
+
+    def iter_lines(self, root: RootNode) -> Iterator[str]:
+        if self.jobs <= 1:
+            yield from self._iter_chunks(root)
+            return
+        for chunk in self._iter_chunks(root):
+            yield from chunk.split("\n")
+
+    def iter_node_lines(self, node: CSTNode, indent: int = 0, source: Optional[object] = None) -> Iterator[str]:
+        """Render one node ``indent`` levels deep; ``source`` is the ``RootNode.source`` its spans index."""
+        self._source = source if self.passthrough else None
+        yield from self._format_node(node, indent)
+
+    def _iter_chunks(self, root: RootNode) -> Iterator[str]:
+        # Yields single lines, or with jobs > 1 also runs of lines already joined by newlines.
+        self._source = root.source if self.passthrough else None
+        if self.jobs > 1:
+            yield from self._iter_parallel(root)
+            return
         for child in root.children:
-            lines.extend(self._format_node(child, 0))
-        return "\n".join(lines) + "\n"
-
-    def _format_node(self, node: object, indent: int) -> List[str]:
-        if isinstance(node, CommentNode):
-            return [self._indent(indent) + node.text]
-        if isinstance(node, GroupNode):
-            return self._format_group(node, indent)
-        if isinstance(node, AttributeNode):
-            return self._format_attribute(node, indent)
-        return []
-
-    def _format_group(self, node: GroupNode, indent: int) -> List[str]:
-        lines: List[str] = []
+            yield from self._format_node(child, 0)
+
+    def _iter_parallel(self, root: RootNode) -> Iterator[str]:
+        pool: Optional[ProcessPoolExecutor] = None
+        try:
+            for child in root.children:
+                if not self._splits(child):
+                    yield from self._format_node(child, 0)
+                    continue
+                if pool is None:
+                    options = {
+                        "indent_size": self.indent_size,
+                        "float_format": self.float_format,
+                        "passthrough": self.passthrough,
+                    }
+                    pool = ProcessPoolExecutor(
+                        max_workers=self.jobs,
+                        initializer=_init_worker,
+                        initargs=(options, _shareable(root.source)),
+                    )
+                yield from self._format_group_in_parallel(child, 0, pool, root.source)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+    def _format_group_in_parallel(
+        self, node: GroupNode, indent: int, pool: ProcessPoolExecutor, source: Optional[object]
+    ) -> Iterator[str]:
         args = self._tokens_to_value(node.args_tokens)
-        lines.append(f"{self._indent(indent)}{node.name} ({args}) {{")
+        yield f"{self._indent(indent)}{node.name} ({args}) {{"
+        offloaded = sum(1 for child in node.children if self._offloads(child))
+        batch_size = max(1, -(-offloaded // (self.jobs * 4)))
+        # Lines rendered here and futures for batches rendered by workers, in
+        # output order. At most ``2 * jobs`` batches are in flight; the next
+        # one is only submitted once the oldest has been yielded.
+        pending: Deque[Union[str, "Future[str]"]] = deque()
+        in_flight = 0
+        batch: List[CSTNode] = []
         for child in node.children:
-            lines.extend(self._format_node(child, indent + 1))
-        lines.append(f"{self._indent(indent)}}}")
-        return lines
+            offloads = self._offloads(child)
+            if offloads:
+                batch.append(child)
+                if len(batch) < batch_size:
+                    continue
+            if batch:
+                pending.append(pool.submit(_format_batch, _pickle_subtrees(batch, node, source), indent + 1))
+                in_flight += 1
+                batch = []
+            if not offloads:
+                pending.extend(self._format_node(child, indent + 1))
+            while pending and (isinstance(pending[0], str) or in_flight >= 2 * self.jobs):
+                item = pending.popleft()
+                if isinstance(item, str):
+                    yield item
+                else:
+                    in_flight -= 1
+                    yield item.result()
+        if batch:
+            pending.append(pool.submit(_format_batch, _pickle_subtrees(batch, node, source), indent + 1))
+        for item in pending:
+            yield item if isinstance(item, str) else item.result()
+        yield f"{self._indent(indent)}}}"
+
+    def _splits(self, node: CSTNode) -> bool:
+        if not self._offloads(node):
+            return False
+        return sum(1 for child in node.children if self._offloads(child)) >= 2
+
+    def _offloads(self, node: CSTNode) -> bool:
+        # Only groups that have to be rendered are worth sending to a worker.
+        if not isinstance(node, GroupNode) or self._copies_verbatim(node):
+            return False
+        return not (isinstance(node, LazyGroupNode) and not node.is_loaded)
+
+    def _copies_verbatim(self, node: CSTNode) -> bool:
+        return self._source is not None and not node.dirty and node.span_start >= 0
+
+    def _format_node(self, node: object, indent: int) -> Iterator[str]:
+        if self._copies_verbatim(node):
+            yield self._indent(indent) + self._source_text(node.span_start, node.span_end)
+        elif isinstance(node, CommentNode):
+            yield self._indent(indent) + node.text
+        elif isinstance(node, GroupNode):
+            yield from self._format_group(node, indent)
+        elif isinstance(node, AttributeNode):
+            yield from self._format_attribute(node, indent)
+
+    def _format_group(self, node: GroupNode, indent: int) -> Iterator[str]:
+        args = self._tokens_to_value(node.args_tokens)
+        yield f"{self._indent(indent)}{node.name} ({args}) {{"
+        if isinstance(node, LazyGroupNode) and not node.is_loaded:
+            # Never expanded, so nothing in it changed: copy the body as
+            # written, shifted to this depth.
+            body = textwrap.dedent(node.body_text().strip("\r\n")).rstrip()
+            if body:
+                yield from textwrap.indent(body, self._indent(indent + 1)).splitlines()
+        else:
+            for child in node.children:
+                yield from self._format_node(child, indent + 1)
+        yield f"{self._indent(indent)}}}"
 
     def _format_attribute(self, node: AttributeNode, indent: int) -> List[str]:
-        if node.use_parens and self._is_array_tokens(node.raw_tokens):
-            return self._format_array_attribute(node, indent)
+        if isinstance(node, TableAttributeNode) and not node.is_loaded:
+            # Never decoded, so never patched: copy the table as written.
+            return [f"{self._indent(indent)}{node.key} ({node.body_text()});"]
+        if node.use_parens:
+            decoded = node.decoded()
+            if decoded.kind == AttributeKind.NUMERIC_ARRAY:
+                return self._format_array_attribute(node.key, decoded, indent)
         value = self._tokens_to_value(node.raw_tokens)
         if node.quote_style == QuoteStyle.DOUBLE:
             value = f"\"{value}\""
@@ -45,63 +205,22 @@ class Formatter:
             return [f"{self._indent(indent)}{node.key} ({value});"]
         return [f"{self._indent(indent)}{node.key} : {value};"]
 
-    def _format_array_attribute(self, node: AttributeNode, indent: int) -> List[str]:
-        rows = self._parse_array_matrix(node.raw_tokens)
-        formatted_rows = self._format_matrix_rows(rows)
-        if self._should_inline_array(formatted_rows, node.raw_tokens):
-            return self._format_inline_array(node.key, formatted_rows[0], indent)
-        return self._format_multiline_array(node.key, formatted_rows, indent)
+    def _format_array_attribute(self, key: str, decoded: DecodedAttribute, indent: int) -> List[str]:
+        formatted_rows = self._format_matrix_rows(decoded.rows)
+        if len(formatted_rows) == 1 and not decoded.has_escaped_newline:
+            return self._format_inline_array(key, formatted_rows[0], indent)
+        return self._format_multiline_array(key, formatted_rows, indent)
 
-    def _parse_array_matrix(self, tokens: List[Token]) -> List["ArrayRow"]:
-        rows: List[ArrayRow] = []
-        current_row: List[Token] = []
-        for token in tokens:
-            if token.type == TokenType.ESCAPED_NEWLINE:
-                if current_row:
-                    rows.append(self._parse_array_row(current_row))
-                    current_row = []
-                continue
-            if token.type == TokenType.COMMENT:
-                continue
-            current_row.append(token)
-        if current_row:
-            rows.append(self._parse_array_row(current_row))
-        return rows
-
-    def _parse_array_row(self, tokens: List[Token]) -> "ArrayRow":
-        values: List[float] = []
-        has_string = False
-        for token in tokens:
-            if token.type in {TokenType.COMMENT, TokenType.ESCAPED_NEWLINE, TokenType.COMMA}:
-                continue
-            if token.type in {TokenType.STRING, TokenType.IDENTIFIER}:
-                if token.type == TokenType.STRING:
-                    has_string = True
-                for part in token.value.split(","):
-                    stripped = part.strip()
-                    if stripped:
-                        values.append(float(stripped))
-        return ArrayRow(values=values, quoted=has_string)
-
-    def _format_matrix_rows(self, rows: List["ArrayRow"]) -> List[str]:
+    def _format_matrix_rows(self, rows: Iterable[ArrayRow]) -> List[str]:
         lines: List[str] = []
         for row in rows:
-            formatted = [format(value, self.float_format) for value in row.values]
-            line = ", ".join(formatted)
+            line = self._floats.join(row.values)
             if row.quoted:
                 lines.append(f"\"{line}\"")
             else:
                 lines.append(line)
         return lines
 
-    def _should_inline_array(self, formatted_rows: List[str], tokens: List[Token]) -> bool:
-        if len(formatted_rows) != 1:
-            return False
-        return not self._has_escaped_newline(tokens)
-
-    def _has_escaped_newline(self, tokens: Iterable[Token]) -> bool:
-        return any(token.type == TokenType.ESCAPED_NEWLINE for token in tokens)
-
     def _format_inline_array(self, key: str, row: str, indent: int) -> List[str]:
         line = f"{self._indent(indent)}{key} ({row});"
         return [line]
@@ -117,35 +236,6 @@ class Formatter:
         lines.append(f"{self._indent(indent)});")
         return lines
 
-    def _is_array_tokens(self, tokens: Iterable[Token]) -> bool:
-        has_separator = False
-        for token in tokens:
-            if token.type in {TokenType.COMMENT, TokenType.ESCAPED_NEWLINE}:
-                if token.type == TokenType.ESCAPED_NEWLINE:
-                    has_separator = True
-                continue
-            if token.type == TokenType.COMMA:
-                has_separator = True
-                continue
-            if token.type not in {TokenType.STRING, TokenType.IDENTIFIER}:
-                return False
-            if not self._token_is_numeric(token.value):
-                return False
-        return has_separator
-
-    def _token_is_numeric(self, value: str) -> bool:
-        has_value = False
-        for part in value.split(","):
-            stripped = part.strip()
-            if not stripped:
-                continue
-            has_value = True
-            try:
-                float(stripped)
-            except ValueError:
-                return False
-        return has_value
-
     def _tokens_to_value(self, tokens: Iterable[Token]) -> str:
         pieces: List[str] = []
         for token in tokens:
@@ -165,11 +255,74 @@ class Formatter:
                 value = f"{value} {part}".strip()
         return value
 
+    def _source_text(self, start: int, end: int) -> str:
+        text = self._source[start:end]
+        if isinstance(text, bytes):
+            return text.decode("utf-8")
+        return text
+
     def _indent(self, indent: int) -> str:
         return " " * (indent * self.indent_size)
 
 
-@dataclass(frozen=True)
-class ArrayRow:
-    values: List[float]
-    quoted: bool
+class _SubtreePickler(pickle.Pickler):
+    """Pickle a batch of sibling subtrees without their parent or the shared source.
+
+    The parent group and ``source`` are written as persistent IDs, and token
+    slices over ``source`` are copied into buffers holding only their own
+    tokens, so a batch never drags the rest of the tree or its token arrays along.
+    """
+
+    def __init__(self, handle: IO[bytes], parent: CSTNode, source: Optional[object]) -> None:
+        super().__init__(handle, protocol=pickle.HIGHEST_PROTOCOL)
+        self._parent = parent
+        self._source = source
+
+    def persistent_id(self, obj: object) -> Optional[str]:
+        if obj is self._parent:
+            return "parent"
+        if self._source is not None and obj is self._source:
+            return "source"
+        return None
+
+    def reducer_override(self, obj: object) -> object:
+        if isinstance(obj, TokenSlice):
+            return TokenSlice, (obj.buffer.copy_range(obj.start, obj.stop), 0, len(obj))
+        return NotImplemented
+
+
+class _SubtreeUnpickler(pickle.Unpickler):
+    def persistent_load(self, pid: str) -> object:
+        return _worker_source if pid == "source" else None
+
+
+def _pickle_subtrees(nodes: List[CSTNode], parent: CSTNode, source: Optional[object]) -> bytes:
+    handle = io.BytesIO()
+    _SubtreePickler(handle, parent, source).dump(nodes)
+    return handle.getvalue()
+
+
+def _shareable(source: Optional[object]) -> Optional[object]:
+    # Forked workers inherit a memory map; other start methods need a copy they can pickle.
+    if isinstance(source, mmap.mmap) and multiprocessing.get_start_method() != "fork":
+        return source[:]
+    return source
+
+
+_worker_formatter: Optional[Formatter] = None
+_worker_source: Optional[object] = None
+
+
+def _init_worker(options: Dict[str, object], source: Optional[object]) -> None:
+    global _worker_formatter, _worker_source
+    _worker_source = source
+    _worker_formatter = Formatter(**options)
+    _worker_formatter._source = source if _worker_formatter.passthrough else None
+
+
+def _format_batch(data: bytes, indent: int) -> str:
+    nodes = _SubtreeUnpickler(io.BytesIO(data)).load()
+    lines: List[str] = []
+    for node in nodes:
+        lines.extend(_worker_formatter._format_node(node, indent))
+    return "\n".join(lines)
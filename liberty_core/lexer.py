@@ -1,8 +1,58 @@
 from __future__ import annotations
 
-from typing import List
+import mmap
+import re
+from typing import Iterator, List, Optional, Tuple, Union
 
 from .cst import Token, TokenType
+from .token_buffer import TOKEN_TYPE_CODES, TokenBuffer
+
+LEXER_ENGINES = ("scanner", "reference")
+
+Source = Union[str, bytes, bytearray, mmap.mmap]
+
+_SCANNER_RULES = "|".join(
+    [
+        r"(?P<whitespace>\s+)",
+        r"(?P<escaped_newline>\\\n)",
+        r"(?P<comment>//[^\n]*|/\*.*?\*/)",
+        r'(?P<string>"[^"\\]*(?:\\.[^"\\]*)*")',
+        r"(?P<symbol>[(){}:;,])",
+        r'(?P<identifier>[^\s(){}:;,"/]+)',
+        r'(?P<unterminated>/\*|")',
+        r"(?P<unexpected>.)",
+    ]
+)
+_SCANNER_PATTERN = re.compile(_SCANNER_RULES, re.DOTALL)
+_BYTES_SCANNER_PATTERN = re.compile(_SCANNER_RULES.encode("ascii"), re.DOTALL)
+_BLOCK_RULES = "|".join(
+    [
+        r"(?P<open>\{)",
+        r"(?P<close>\})",
+        r'(?P<skip>"[^"\\]*(?:\\.[^"\\]*)*"|//[^\n]*|/\*.*?\*/)',
+        r'(?P<unterminated>/\*|")',
+    ]
+)
+_BLOCK_PATTERN = re.compile(_BLOCK_RULES, re.DOTALL)
+_BYTES_BLOCK_PATTERN = re.compile(_BLOCK_RULES.encode("ascii"), re.DOTALL)
+_STRING_ESCAPE = re.compile(r'\\(["\\])')
+_SYMBOL_TYPES = {
+    "(": TokenType.GROUP_START,
+    ")": TokenType.GROUP_END,
+    "{": TokenType.BLOCK_START,
+    "}": TokenType.BLOCK_END,
+    ":": TokenType.COLON,
+    ";": TokenType.SEMI,
+    ",": TokenType.COMMA,
+}
+_KIND_CODES = {
+    "identifier": TOKEN_TYPE_CODES[TokenType.IDENTIFIER],
+    "string": TOKEN_TYPE_CODES[TokenType.STRING],
+    "comment": TOKEN_TYPE_CODES[TokenType.COMMENT],
+    "escaped_newline": TOKEN_TYPE_CODES[TokenType.ESCAPED_NEWLINE],
+}
+_SYMBOL_CODES = {symbol: TOKEN_TYPE_CODES[token_type] for symbol, token_type in _SYMBOL_TYPES.items()}
+_SYMBOL_CODES.update({symbol.encode("ascii"): code for symbol, code in list(_SYMBOL_CODES.items())})
 
 
 class LexerError(ValueError):
@@ -10,44 +60,212 @@ class LexerError(ValueError):
 
 
 class Lexer:
-    def __init__(self, text: str) -> None:
+    """Split Liberty source into tokens.
+
+    The default ``scanner`` engine drives a single compiled master pattern over
+    the text and derives line/column numbers from newline offsets. It also
+    accepts ``bytes`` or an ``mmap`` directly, decoding each token value as it
+    is emitted; columns are then byte offsets. The ``reference`` engine is the
+    original character-by-character lexer, kept for cross-checking the scanner.
+
+    ``start``/``end`` restrict lexing to a slice of ``text`` without copying it;
+    ``line`` is the line number at ``start``.
+    """
+
+    def __init__(
+        self,
+        text: Source,
+        engine: str = "scanner",
+        start: int = 0,
+        end: Optional[int] = None,
+        line: int = 1,
+    ) -> None:
+        if engine not in LEXER_ENGINES:
+            raise LexerError(f"Unknown lexer engine: {engine}")
+        if engine == "reference" and not isinstance(text, str):
+            text = bytes(text).decode("utf-8")
         self.text = text
-        self.length = len(text)
-        self.index = 0
-        self.line = 1
-        self.column = 1
+        self.engine = engine
+        self.length = len(text) if end is None else end
+        self.index = start
+        # Offset of the last token the scanner yielded; ``index`` is then its end.
+        self.token_start = start
+        self.line = line
+        self._line_start = text.rfind(_newline_for(text), 0, start) + 1
+        self.column = start - self._line_start + 1
 
     def tokenize(self) -> List[Token]:
-        tokens: List[Token] = []
+        return list(self.iter_tokens())
+
+    def iter_tokens(self) -> Iterator[Token]:
+        if self.engine == "reference":
+            return self._iter_reference_tokens()
+        return self._iter_scanner_tokens()
+
+    def tokenize_to_buffer(self) -> TokenBuffer:
+        """Lex the whole input into a ``TokenBuffer`` without creating ``Token`` objects."""
+        if self.engine != "scanner":
+            raise LexerError("Token buffers require the scanner engine")
+        text = self.text
+        binary = not isinstance(text, str)
+        pattern = _BYTES_SCANNER_PATTERN if binary else _SCANNER_PATTERN
+        newline = _newline_for(text)
+        buffer = TokenBuffer(text)
+        append_type = buffer.types.append
+        append_start = buffer.starts.append
+        append_end = buffer.ends.append
+        append_line = buffer.lines.append
+        line = self.line
+        for match in pattern.finditer(text, self.index, self.length):
+            kind = match.lastgroup
+            if kind == "whitespace":
+                line += match.group().count(newline)
+                continue
+            start, end = match.span()
+            if kind == "symbol":
+                code = _SYMBOL_CODES[match.group()]
+            elif kind in _KIND_CODES:
+                code = _KIND_CODES[kind]
+            else:
+                self._skip_to(start)
+                value = match.group()
+                if binary:
+                    value = value.decode("utf-8")
+                if kind == "unterminated":
+                    label = "string" if value == "\"" else "comment"
+                    raise LexerError(f"Unterminated {label} starting at {self.line}:{self.column}")
+                raise LexerError(f"Unexpected character {value!r} at {self.line}:{self.column}")
+            append_type(code)
+            append_start(start)
+            append_end(end)
+            append_line(line)
+            if kind != "identifier" and kind != "symbol":
+                line += match.group().count(newline)
+        self._skip_to(self.length)
+        return buffer
+
+    def skip_block(self) -> Tuple[int, int, int]:
+        """Skip the body of a ``{ ... }`` block whose ``{`` was the last token read.
+
+        Only braces, strings and comments are recognised, so this is much
+        cheaper than lexing the body. Returns ``(start, end, line)`` where
+        ``end`` is the offset of the closing brace and ``line`` is the line
+        number at ``start``.
+        """
+        text = self.text
+        pattern = _BLOCK_PATTERN if isinstance(text, str) else _BYTES_BLOCK_PATTERN
+        start = self.index
+        line = self.line
+        depth = 1
+        for match in pattern.finditer(text, start, self.length):
+            kind = match.lastgroup
+            if kind == "open":
+                depth += 1
+            elif kind == "close":
+                depth -= 1
+                if depth == 0:
+                    end = match.start()
+                    self._skip_to(end + 1)
+                    return start, end, line
+            elif kind == "unterminated":
+                self._skip_to(match.start())
+                label = "string" if match.group() in {"\"", b"\""} else "comment"
+                raise LexerError(f"Unterminated {label} starting at {self.line}:{self.column}")
+        raise LexerError(f"Unterminated block starting at {line}:{start - self._line_start + 1}")
+
+    def _skip_to(self, position: int) -> None:
+        newline = _newline_for(self.text)
+        newlines = _count(self.text, newline, self.index, position)
+        if newlines:
+            self.line += newlines
+            self._line_start = self.text.rfind(newline, self.index, position) + 1
+        self.index = position
+        self.column = position - self._line_start + 1
+
+    def _iter_scanner_tokens(self) -> Iterator[Token]:
+        text = self.text
+        binary = not isinstance(text, str)
+        pattern = _BYTES_SCANNER_PATTERN if binary else _SCANNER_PATTERN
+        newline = _newline_for(text)
+        while self.index < self.length:
+            line = self.line
+            line_start = self._line_start
+            for match in pattern.finditer(text, self.index, self.length):
+                kind = match.lastgroup
+                start, end = match.span()
+                token = None
+                if kind == "whitespace":
+                    newlines = match.group().count(newline)
+                else:
+                    value = match.group()
+                    if binary:
+                        value = value.decode("utf-8")
+                    column = start - line_start + 1
+                    newlines = 0
+                    if kind == "symbol":
+                        token = Token(_SYMBOL_TYPES[value], value, line, column)
+                    elif kind == "identifier":
+                        token = Token(TokenType.IDENTIFIER, value, line, column)
+                    else:
+                        newlines = value.count("\n")
+                        if kind == "string":
+                            value = value[1:-1]
+                            if "\\" in value:
+                                value = _STRING_ESCAPE.sub(r"\1", value)
+                            token = Token(TokenType.STRING, value, line, column)
+                        elif kind == "escaped_newline":
+                            token = Token(TokenType.ESCAPED_NEWLINE, value, line, column)
+                        elif kind == "comment":
+                            token = Token(TokenType.COMMENT, value, line, column)
+                        elif kind == "unterminated":
+                            label = "string" if value == "\"" else "comment"
+                            raise LexerError(f"Unterminated {label} starting at {line}:{column}")
+                        else:
+                            raise LexerError(f"Unexpected character {value!r} at {line}:{column}")
+                if newlines:
+                    line += newlines
+                    line_start = text.rfind(newline, start, end) + 1
+                    self.line = line
+                    self._line_start = line_start
+                self.index = end
+                if token is not None:
+                    self.token_start = start
+                    yield token
+                    if self.index != end:
+                        # skip_block() moved the cursor; restart the scan there.
+                        break
+        self.column = self.index - self._line_start + 1
+
+    def _iter_reference_tokens(self) -> Iterator[Token]:
         while self.index < self.length:
             char = self.text[self.index]
             if char == "\\" and self._peek(1) == "\n":
-                tokens.append(self._make_token(TokenType.ESCAPED_NEWLINE, "\\\n"))
+                token = self._make_token(TokenType.ESCAPED_NEWLINE, "\\\n")
                 self._advance(2)
                 self._newline()
+                yield token
                 continue
             if char.isspace():
                 self._advance_whitespace(char)
                 continue
             if char == "/" and self._peek(1) == "/":
-                tokens.append(self._read_line_comment())
+                yield self._read_line_comment()
                 continue
             if char == "/" and self._peek(1) == "*":
-                tokens.append(self._read_block_comment())
+                yield self._read_block_comment()
                 continue
             if char == "\"":
-                tokens.append(self._read_string())
+                yield self._read_string()
                 continue
             token = self._match_symbol(char)
             if token:
-                tokens.append(token)
                 self._advance(1)
+                yield token
                 continue
             if self._is_identifier_start(char):
-                tokens.append(self._read_identifier())
+                yield self._read_identifier()
                 continue
             raise LexerError(f"Unexpected character {char!r} at {self.line}:{self.column}")
-        return tokens
 
     def _match_symbol(self, char: str) -> Token | None:
         mapping = {
@@ -84,9 +302,9 @@ class Lexer:
                 self._advance(1)
                 return Token(TokenType.STRING, "".join(value_chars), start_line, start_column)
             if char == "\n":
-                self._newline()
                 value_chars.append("\n")
                 self._advance(1)
+                self._newline()
                 continue
             value_chars.append(char)
             self._advance(1)
@@ -117,9 +335,9 @@ class Lexer:
                 self._advance(2)
                 return Token(TokenType.COMMENT, "".join(value_chars), start_line, start_column)
             if char == "\n":
-                self._newline()
                 value_chars.append("\n")
                 self._advance(1)
+                self._newline()
                 continue
             value_chars.append(char)
             self._advance(1)
@@ -145,9 +363,9 @@ class Lexer:
         return self._is_identifier_start(char)
 
     def _advance_whitespace(self, char: str) -> None:
+        self._advance(1)
         if char == "\n":
             self._newline()
-        self._advance(1)
 
     def _advance(self, count: int) -> None:
         self.index += count
@@ -156,6 +374,7 @@ class Lexer:
     def _newline(self) -> None:
         self.line += 1
         self.column = 1
+        self._line_start = self.index
 
     def _peek(self, offset: int) -> str:
         position = self.index + offset
@@ -165,3 +384,13 @@ class Lexer:
 
     def _make_token(self, token_type: TokenType, value: str) -> Token:
         return Token(token_type, value, self.line, self.column)
+
+
+def _newline_for(text: Source) -> Union[str, bytes]:
+    return "\n" if isinstance(text, str) else b"\n"
+
+
+def _count(text: Source, sub: Union[str, bytes], start: int, end: int) -> int:
+    if isinstance(text, mmap.mmap):
+        return text[start:end].count(sub)
+    return text.count(sub, start, end)
@@ -1,19 +1,31 @@
 from __future__ import annotations
 
+import mmap
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import List, Optional
+from functools import partial
+from operator import attrgetter
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
+from .compressed import compression_suffix, read_decompressed
 from .cst import (
     AttributeNode,
     CommentNode,
+    CSTNode,
     GroupNode,
+    LazyGroupNode,
     LibraryContext,
     QuoteStyle,
     RootNode,
+    TableAttributeNode,
     Token,
     TokenType,
 )
-from .lexer import Lexer
+from .lexer import Lexer, Source
+from .token_buffer import TOKEN_TYPE_CODES, TOKEN_TYPES, TokenBuffer, TokenSlice
 
 
 class ParserError(ValueError):
@@ -26,23 +38,333 @@ class ParseResult:
     context: LibraryContext
 
 
-class Parser:
-    def __init__(self) -> None:
-        self.tokens: List[Token] = []
+class _TokenCursor:
+    """Random-access cursor over a fully materialized token list.
+
+    Matching parentheses are paired once up front so group/attribute
+    disambiguation is a dictionary lookup rather than a forward scan, and
+    flat argument lists can be sliced out in one step.
+    """
+
+    def __init__(self, tokens: List[Token]) -> None:
+        self.tokens = tokens
         self.index = 0
+        self.group_ends, self.nested_groups = _match_group_ends(
+            list(map(attrgetter("type"), tokens)), TokenType.GROUP_START, TokenType.GROUP_END
+        )
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        position = self.index + offset
+        if position >= len(self.tokens):
+            return None
+        return self.tokens[position]
+
+    def peek_type(self, offset: int = 0) -> Optional[TokenType]:
+        position = self.index + offset
+        if position >= len(self.tokens):
+            return None
+        return self.tokens[position].type
+
+    def advance(self) -> None:
+        self.index += 1
+
+    def mark(self) -> int:
+        return self.index
+
+    def since(self, mark: int) -> List[Token]:
+        return self.tokens[mark : self.index]
 
-    def parse(self, text: str) -> ParseResult:
-        self.tokens = Lexer(text).tokenize()
+    def at_end(self) -> bool:
+        return self.index >= len(self.tokens)
+
+    def find_group_end(self, offset: int) -> Optional[int]:
+        group_end = self.group_ends.get(self.index + offset)
+        if group_end is None:
+            return None
+        return group_end - self.index
+
+    def take_group_args(self) -> Optional[List[Token]]:
+        group_start = self.index - 1
+        group_end = self.group_ends.get(group_start)
+        if group_end is None or group_start in self.nested_groups:
+            return None
+        args = self.tokens[self.index : group_end]
+        self.index = group_end
+        return args
+
+
+class _BufferCursor(_TokenCursor):
+    """Cursor over a ``TokenBuffer``.
+
+    ``Token`` objects are only built for tokens the parser actually inspects;
+    argument and value runs are handed out as ``TokenSlice`` views.
+    """
+
+    def __init__(self, buffer: TokenBuffer) -> None:
+        self.buffer = buffer
         self.index = 0
-        root = RootNode()
+        self.group_ends, self.nested_groups = _match_group_ends(
+            buffer.types, TOKEN_TYPE_CODES[TokenType.GROUP_START], TOKEN_TYPE_CODES[TokenType.GROUP_END]
+        )
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        position = self.index + offset
+        if position >= len(self.buffer):
+            return None
+        return self.buffer.token(position)
+
+    def peek_type(self, offset: int = 0) -> Optional[TokenType]:
+        position = self.index + offset
+        if position >= len(self.buffer):
+            return None
+        return TOKEN_TYPES[self.buffer.types[position]]
+
+    def at_end(self) -> bool:
+        return self.index >= len(self.buffer)
+
+    def since(self, mark: int) -> TokenSlice:
+        return TokenSlice(self.buffer, mark, self.index)
+
+    def span_mark(self) -> int:
+        return self.index
+
+    def source_span(self, mark: int) -> Tuple[int, int]:
+        return self.buffer.starts[mark], self.buffer.ends[self.index - 1]
+
+    def take_group_args(self) -> Optional[TokenSlice]:
+        group_start = self.index - 1
+        group_end = self.group_ends.get(group_start)
+        if group_end is None or group_start in self.nested_groups:
+            return None
+        args = TokenSlice(self.buffer, self.index, group_end)
+        self.index = group_end
+        return args
+
+
+def _match_group_ends(types: Sequence, group_start: object, group_end: object) -> Tuple[Dict[int, int], Set[int]]:
+    positions: List[int] = []
+    for token_type in (group_start, group_end):
+        position = -1
+        try:
+            while True:
+                position = types.index(token_type, position + 1)
+                positions.append(position)
+        except ValueError:
+            pass
+    positions.sort()
+    group_ends: Dict[int, int] = {}
+    nested_groups: Set[int] = set()
+    open_indices: List[int] = []
+    for position in positions:
+        if types[position] == group_start:
+            if open_indices:
+                nested_groups.add(open_indices[-1])
+            open_indices.append(position)
+        elif open_indices:
+            group_ends[open_indices.pop()] = position
+    return group_ends, nested_groups
+
+
+class _TokenWindow:
+    """Lookahead buffer over the tokens of a scanner ``Lexer``.
+
+    Only the tokens the parser has peeked at but not consumed are kept, so the
+    window never grows past the longest parenthesized argument list. The
+    source offsets of each buffered token are kept alongside it so nodes can
+    record their spans as they do over a token buffer.
+    """
+
+    def __init__(self, lexer: Lexer) -> None:
+        self._lexer = lexer
+        self._tokens = lexer.iter_tokens()
+        self._buffer: Deque[Token] = deque()
+        self._spans: Deque[Tuple[int, int]] = deque()
+        self._exhausted = False
+        self._recorded: Optional[List[Token]] = None
+        self._last_end = -1
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        if not self._fill(offset + 1):
+            return None
+        return self._buffer[offset]
+
+    def peek_type(self, offset: int = 0) -> Optional[TokenType]:
+        if not self._fill(offset + 1):
+            return None
+        return self._buffer[offset].type
+
+    def advance(self) -> None:
+        if self._fill(1):
+            token = self._buffer.popleft()
+            self._last_end = self._spans.popleft()[1]
+            if self._recorded is not None:
+                self._recorded.append(token)
+
+    def mark(self) -> int:
+        self._recorded = []
+        return 0
+
+    def since(self, mark: int) -> List[Token]:
+        recorded = self._recorded or []
+        self._recorded = None
+        return recorded
+
+    def span_mark(self) -> int:
+        return self._spans[0][0] if self._fill(1) else -1
+
+    def source_span(self, mark: int) -> Tuple[int, int]:
+        return mark, self._last_end
+
+    def skipped_to(self, position: int) -> None:
+        """Note that the lexer consumed everything before ``position`` behind the window's back."""
+        self._last_end = position
+
+    def take_group_args(self) -> Optional[List[Token]]:
+        return None
+
+    def is_drained(self) -> bool:
+        return not self._buffer
+
+    def at_end(self) -> bool:
+        return not self._fill(1)
+
+    def find_group_end(self, offset: int) -> Optional[int]:
+        depth = 0
+        position = offset
+        while self._fill(position + 1):
+            token_type = self._buffer[position].type
+            if token_type == TokenType.GROUP_START:
+                depth += 1
+            elif token_type == TokenType.GROUP_END:
+                depth -= 1
+                if depth == 0:
+                    return position
+            position += 1
+        return None
+
+    def _fill(self, count: int) -> bool:
+        while len(self._buffer) < count and not self._exhausted:
+            token = next(self._tokens, None)
+            if token is None:
+                self._exhausted = True
+                break
+            self._buffer.append(token)
+            self._spans.append((self._lexer.token_start, self._lexer.index))
+        return len(self._buffer) >= count
+
+
+class Parser:
+    """Build a CST from Liberty text.
+
+    With ``streaming=True`` tokens are pulled from ``Lexer.iter_tokens`` through
+    a small lookahead window instead of materializing the whole token list.
+
+    With ``lazy=True`` the bodies of groups named in ``lazy_group_names`` are
+    skipped with a brace-depth scan and returned as ``LazyGroupNode``s that
+    parse themselves the first time their children are read.
+
+    With ``compact=True`` the source is lexed into a ``TokenBuffer`` and
+    attribute values and group arguments hold ``TokenSlice`` views into it
+    instead of lists of ``Token`` objects. The buffer references the source,
+    so ``parse_file`` keeps its memory map open in this mode.
+
+    With ``defer_tables=True`` parenthesized attributes named in
+    ``table_attribute_names`` become ``TableAttributeNode``s that only record
+    their source span; they are lexed when their tokens are first read. This
+    needs the token buffer, so it implies ``compact`` and has no effect on
+    tokens read with ``streaming=True``.
+
+    With ``jobs > 1`` the top level is parsed as with ``lazy=True`` and the
+    skipped group bodies are then parsed in batches by a pool of ``jobs``
+    worker processes. Each is stitched back in as a plain ``GroupNode`` with
+    its original line numbers and source span. Workers parse with the same
+    ``streaming`` and ``defer_tables`` options, and always use ``compact``
+    token storage over a copy of their span. ``jobs`` has no effect together
+    with ``lazy``.
+    """
+
+    lazy_group_names = frozenset({"cell"})
+    table_attribute_names = frozenset({"values"})
+
+    def __init__(
+        self,
+        streaming: bool = False,
+        lazy: bool = False,
+        compact: bool = False,
+        defer_tables: bool = False,
+        jobs: int = 1,
+    ) -> None:
+        self.streaming = streaming
+        self.lazy = lazy
+        self.compact = compact or defer_tables
+        self.defer_tables = defer_tables
+        self.jobs = jobs
+        self._lexer: Optional[Lexer] = None
+        self._cursor: _TokenCursor | _TokenWindow = _TokenCursor([])
+
+    def parse_file(self, path: str) -> ParseResult:
+        """Parse a Liberty file by lexing a read-only memory map of its bytes.
+
+        Files ending in ``.gz``, ``.bz2``, ``.xz`` or ``.zst`` are decompressed
+        into memory instead.
+        """
+        if compression_suffix(path) is not None:
+            # Workers cannot map a compressed file, so they are handed the bytes.
+            return self._parse(read_decompressed(path), None)
+        with open(path, "rb") as handle:
+            if os.fstat(handle.fileno()).st_size == 0:
+                return self.parse(b"")
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.lazy or self.compact:
+            # Lazy groups and token slices read from the mapping later, so it stays open.
+            return self._parse(mapped, path)
+        with mapped:
+            return self._parse(mapped, path)
+
+    def parse(self, text: Source) -> ParseResult:
+        return self._parse(text, None)
+
+    def _parse(self, text: Source, path: Optional[str]) -> ParseResult:
+        root = RootNode(source=text if self.compact else None)
+        for node in self._parse_nodes(Lexer(text)):
+            root.add_child(node)
+        if self._parallel:
+            # Workers map the file themselves when there is one to map.
+            # Worker results keep compact token storage over a copy of their span.
+            options = {"streaming": self.streaming, "compact": True, "defer_tables": self.defer_tables}
+            _load_groups_in_parallel(root, path if path is not None else text, path is not None, self.jobs, options)
+        context = self._extract_context(root)
+        return ParseResult(root=root, context=context)
+
+    @property
+    def _parallel(self) -> bool:
+        return self.jobs > 1 and not self.lazy
+
+    def _parse_nodes(self, lexer: Lexer) -> List[CSTNode]:
+        self._lexer = lexer
+        if self.streaming or self.lazy or self._parallel:
+            self._cursor = _TokenWindow(lexer)
+        elif self.compact:
+            self._cursor = _BufferCursor(lexer.tokenize_to_buffer())
+        else:
+            self._cursor = _TokenCursor(lexer.tokenize())
+        nodes: List[CSTNode] = []
         while not self._is_at_end():
             node = self._parse_node()
             if node is not None:
-                root.add_child(node)
-        context = self._extract_context(root)
-        return ParseResult(root=root, context=context)
+                nodes.append(node)
+        return nodes
+
+    def _parse_node(self) -> Optional[CSTNode]:
+        if not isinstance(self._cursor, (_BufferCursor, _TokenWindow)):
+            return self._parse_statement()
+        start = self._cursor.span_mark()
+        node = self._parse_statement()
+        if node is not None:
+            node.span_start, node.span_end = self._cursor.source_span(start)
+        return node
 
-    def _parse_node(self) -> Optional[object]:
+    def _parse_statement(self) -> Optional[CSTNode]:
         token = self._peek()
         if token is None:
             return None
@@ -64,17 +386,38 @@ class Parser:
     def _parse_group(self) -> GroupNode:
         name_token = self._expect(TokenType.IDENTIFIER)
         self._expect(TokenType.GROUP_START)
-        args_tokens = self._collect_until(TokenType.GROUP_END)
+        args_tokens = self._collect_group_args()
         self._expect(TokenType.GROUP_END)
         self._expect(TokenType.BLOCK_START)
-        group = GroupNode(name=name_token.value, args_tokens=args_tokens)
+        name = sys.intern(name_token.value)
+        if (self.lazy or self._parallel) and name in self.lazy_group_names and self._cursor.is_drained():
+            return self._skip_lazy_group(name, args_tokens)
+        group = GroupNode(name=name, args_tokens=args_tokens)
         while not self._check(TokenType.BLOCK_END):
+            if self._is_at_end():
+                raise ParserError(f"Unexpected end of input, expected {TokenType.BLOCK_END}")
             node = self._parse_node()
             if node is not None:
                 group.add_child(node)
         self._expect(TokenType.BLOCK_END)
         return group
 
+    def _skip_lazy_group(self, name: str, args_tokens: Sequence[Token]) -> LazyGroupNode:
+        source = self._lexer.text
+        body_start, body_end, line = self._lexer.skip_block()
+        self._cursor.skipped_to(body_end + 1)
+        options = {"streaming": self.streaming, "compact": self.compact, "defer_tables": self.defer_tables}
+        loader = partial(_parse_group_body, options, source, body_start, body_end, line)
+        return LazyGroupNode(
+            name=name,
+            args_tokens=args_tokens,
+            source=source,
+            body_start=body_start,
+            body_end=body_end,
+            body_line=line,
+            loader=loader,
+        )
+
     def _parse_attribute(self) -> AttributeNode:
         key_token = self._expect(TokenType.IDENTIFIER)
         self._expect(TokenType.COLON)
@@ -85,32 +428,40 @@ class Parser:
     def _parse_parenthesized_attribute(self) -> AttributeNode:
         key_token = self._expect(TokenType.IDENTIFIER)
         self._expect(TokenType.GROUP_START)
-        raw_tokens = self._collect_until(TokenType.GROUP_END)
+        raw_tokens = self._collect_group_args()
         group_end_token = self._expect(TokenType.GROUP_END)
         self._consume_optional_semicolon(last_token=group_end_token)
+        if self.defer_tables and key_token.value in self.table_attribute_names and isinstance(raw_tokens, TokenSlice):
+            return self._build_table_node(key_token.value, raw_tokens)
         return self._build_attribute_node(key_token.value, raw_tokens, use_parens=True)
 
-    def _collect_attribute_tokens(self) -> List[Token]:
-        collected: List[Token] = []
+    def _collect_attribute_tokens(self) -> Sequence[Token]:
+        mark = self._cursor.mark()
+        last_token: Optional[Token] = None
         while not self._check(TokenType.SEMI):
             token = self._peek()
             if token is None:
-                return collected
-            if collected and self._is_line_terminated(collected[-1], token):
-                return collected
-            collected.append(token)
+                break
+            if last_token is not None and self._is_line_terminated(last_token, token):
+                break
+            last_token = token
             self._advance()
-        return collected
+        return self._cursor.since(mark)
 
-    def _collect_until(self, token_type: TokenType) -> List[Token]:
-        collected: List[Token] = []
+    def _collect_group_args(self) -> Sequence[Token]:
+        args = self._cursor.take_group_args()
+        if args is None:
+            args = self._collect_until(TokenType.GROUP_END)
+        return args
+
+    def _collect_until(self, token_type: TokenType) -> Sequence[Token]:
+        mark = self._cursor.mark()
         while not self._check(token_type):
-            token = self._peek()
-            if token is None:
+            if self._is_at_end():
+                self._cursor.since(mark)
                 raise ParserError(f"Unexpected end of input, expected {token_type}")
-            collected.append(token)
             self._advance()
-        return collected
+        return self._cursor.since(mark)
 
     def _extract_context(self, root: RootNode) -> LibraryContext:
         context = LibraryContext()
@@ -131,7 +482,7 @@ class Parser:
                 context.leakage_power_unit = self._tokens_to_value(child.raw_tokens)
         return context
 
-    def _tokens_to_value(self, tokens: List[Token]) -> str:
+    def _tokens_to_value(self, tokens: Sequence[Token]) -> str:
         parts = []
         for token in tokens:
             if token.type == TokenType.STRING:
@@ -152,20 +503,19 @@ class Parser:
     def _is_parenthesized_attribute(self) -> bool:
         if self._peek_type(1) != TokenType.GROUP_START:
             return False
-        group_end_index = self._find_group_end_index(self.index + 1)
-        if group_end_index is None:
+        group_end_offset = self._cursor.find_group_end(1)
+        if group_end_offset is None:
             return False
-        next_index = group_end_index + 1
-        if next_index >= len(self.tokens):
+        next_token = self._cursor.peek(group_end_offset + 1)
+        if next_token is None:
             return True
-        next_token = self.tokens[next_index]
         if next_token.type == TokenType.SEMI:
             return True
         if next_token.type == TokenType.BLOCK_START:
             return False
         if next_token.type == TokenType.BLOCK_END:
             return True
-        group_end_token = self.tokens[group_end_index]
+        group_end_token = self._cursor.peek(group_end_offset)
         return next_token.line > group_end_token.line
 
     def _is_line_terminated(self, last_token: Token, next_token: Token) -> bool:
@@ -193,44 +543,118 @@ class Parser:
         return token
 
     def _check(self, token_type: TokenType) -> bool:
-        token = self._peek()
-        return token is not None and token.type == token_type
+        return self._cursor.peek_type() == token_type
 
     def _peek(self) -> Optional[Token]:
-        if self.index >= len(self.tokens):
-            return None
-        return self.tokens[self.index]
+        return self._cursor.peek()
 
     def _peek_type(self, offset: int) -> Optional[TokenType]:
-        position = self.index + offset
-        if position >= len(self.tokens):
-            return None
-        return self.tokens[position].type
+        return self._cursor.peek_type(offset)
 
-    def _find_group_end_index(self, start_index: int) -> Optional[int]:
-        depth = 0
-        for index in range(start_index, len(self.tokens)):
-            token_type = self.tokens[index].type
-            if token_type == TokenType.GROUP_START:
-                depth += 1
-            elif token_type == TokenType.GROUP_END:
-                depth -= 1
-                if depth == 0:
-                    return index
-        return None
+    def _build_attribute_node(self, key: str, raw_tokens: Sequence[Token], use_parens: bool) -> AttributeNode:
+        quote_style = self._quote_style(raw_tokens)
+        return AttributeNode(key=sys.intern(key), raw_tokens=raw_tokens, quote_style=quote_style, use_parens=use_parens)
+
+    def _build_table_node(self, key: str, raw_tokens: TokenSlice) -> TableAttributeNode:
+        quote_style = self._quote_style(raw_tokens)
+        buffer = raw_tokens.buffer
+        group_start = raw_tokens.start - 1
+        return TableAttributeNode(
+            key=sys.intern(key),
+            source=buffer.source,
+            body_start=buffer.ends[group_start],
+            body_end=buffer.starts[raw_tokens.stop],
+            body_line=buffer.lines[group_start],
+            quote_style=quote_style,
+        )
 
-    def _build_attribute_node(self, key: str, raw_tokens: List[Token], use_parens: bool) -> AttributeNode:
-        quote_style = QuoteStyle.NONE
+    def _quote_style(self, raw_tokens: Sequence[Token]) -> QuoteStyle:
         for token in raw_tokens:
             if token.type == TokenType.STRING:
-                quote_style = QuoteStyle.DOUBLE
-                break
+                return QuoteStyle.DOUBLE
             if token.type in {TokenType.IDENTIFIER, TokenType.COMMA}:
                 break
-        return AttributeNode(key=key, raw_tokens=raw_tokens, quote_style=quote_style, use_parens=use_parens)
+        return QuoteStyle.NONE
 
     def _advance(self) -> None:
-        self.index += 1
+        self._cursor.advance()
 
     def _is_at_end(self) -> bool:
-        return self.index >= len(self.tokens)
+        return self._cursor.at_end()
+
+
+def _parse_group_body(options: Dict[str, bool], source: Source, start: int, end: int, line: int) -> List[CSTNode]:
+    parser = Parser(**options)
+    return parser._parse_nodes(Lexer(source, start=start, end=end, line=line))
+
+
+_worker_source: Optional[Source] = None
+_worker_options: Dict[str, bool] = {}
+
+
+def _load_groups_in_parallel(
+    root: RootNode, source: Source | str, is_path: bool, jobs: int, options: Dict[str, bool]
+) -> None:
+    pending: List[Tuple[GroupNode, int, LazyGroupNode]] = []
+    stack: List[CSTNode] = [root]
+    while stack:
+        parent = stack.pop()
+        for index, child in enumerate(parent.children):
+            if isinstance(child, LazyGroupNode):
+                pending.append((parent, index, child))
+            elif isinstance(child, GroupNode):
+                stack.append(child)
+    if len(pending) < 2:
+        for _, _, group in pending:
+            group.children
+        return
+    batch_size = max(1, -(-len(pending) // (jobs * 4)))
+    batches = [pending[start : start + batch_size] for start in range(0, len(pending), batch_size)]
+    spans = [[(group.body_start, group.body_end, group.body_line) for _, _, group in batch] for batch in batches]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(source, is_path, options)) as pool:
+        for batch, bodies in zip(batches, pool.map(_parse_group_bodies, spans)):
+            for (parent, index, lazy_group), nodes in zip(batch, bodies):
+                group = GroupNode(
+                    name=lazy_group.name,
+                    args_tokens=lazy_group.args_tokens,
+                    span_start=lazy_group.span_start,
+                    span_end=lazy_group.span_end,
+                )
+                group.parent = parent
+                parent.children[index] = group
+                for node in nodes:
+                    group.add_child(node)
+
+
+def _init_worker(source: Source | str, is_path: bool, options: Dict[str, bool]) -> None:
+    global _worker_source, _worker_options
+    if is_path:
+        with open(source, "rb") as handle:
+            source = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    _worker_source = source
+    _worker_options = options
+
+
+def _parse_group_bodies(spans: List[Tuple[int, int, int]]) -> List[List[CSTNode]]:
+    # Each body is parsed from its own copy of the span, starting at the line
+    # start so columns stay right, so the token buffers the results point into
+    # are small and cheap to send back.
+    source = _worker_source
+    newline = "\n" if isinstance(source, str) else b"\n"
+    bodies: List[List[CSTNode]] = []
+    for start, end, line in spans:
+        line_start = source.rfind(newline, 0, start) + 1
+        span = source[line_start:end]
+        nodes = _parse_group_body(_worker_options, span, start - line_start, len(span), line)
+        _shift_spans(nodes, line_start)
+        bodies.append(nodes)
+    return bodies
+
+
+def _shift_spans(nodes: List[CSTNode], offset: int) -> None:
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        node.span_start += offset
+        node.span_end += offset
+        stack.extend(node.children)
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import re
+from array import array
+from collections.abc import Sequence
+from typing import Iterator, List, Tuple, Union, overload
+
+from .cst import Token, TokenType
+
+TOKEN_TYPES = tuple(TokenType)
+TOKEN_TYPE_CODES = {token_type: code for code, token_type in enumerate(TOKEN_TYPES)}
+
+_FIXED_VALUES = {
+    TokenType.GROUP_START: "(",
+    TokenType.GROUP_END: ")",
+    TokenType.BLOCK_START: "{",
+    TokenType.BLOCK_END: "}",
+    TokenType.COLON: ":",
+    TokenType.SEMI: ";",
+    TokenType.COMMA: ",",
+    TokenType.ESCAPED_NEWLINE: "\\\n",
+}
+_STRING_ESCAPE = re.compile(r'\\(["\\])')
+
+
+class TokenBuffer:
+    """Struct-of-arrays token storage over the original source.
+
+    Each token costs one type code byte plus its start/end offsets and line
+    number; values are sliced out of ``source`` only when a token is read.
+    """
+
+    def __init__(self, source: Union[str, bytes, object]) -> None:
+        self.source = source
+        offset_code = "I" if len(source) < 2**32 else "Q"
+        self.types = bytearray()
+        self.starts = array(offset_code)
+        self.ends = array(offset_code)
+        self.lines = array("I")
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def type_at(self, index: int) -> TokenType:
+        return TOKEN_TYPES[self.types[index]]
+
+    def value_at(self, index: int) -> str:
+        token_type = TOKEN_TYPES[self.types[index]]
+        fixed = _FIXED_VALUES.get(token_type)
+        if fixed is not None:
+            return fixed
+        start = self.starts[index]
+        end = self.ends[index]
+        if token_type == TokenType.STRING:
+            value = self._decode(self.source[start + 1 : end - 1])
+            if "\\" in value:
+                value = _STRING_ESCAPE.sub(r"\1", value)
+            return value
+        return self._decode(self.source[start:end])
+
+    def column_at(self, index: int) -> int:
+        start = self.starts[index]
+        newline = "\n" if isinstance(self.source, str) else b"\n"
+        return start - self.source.rfind(newline, 0, start)
+
+    def token(self, index: int) -> Token:
+        return Token(self.type_at(index), self.value_at(index), self.lines[index], self.column_at(index))
+
+    def slice(self, start: int, stop: int) -> "TokenSlice":
+        return TokenSlice(self, start, stop)
+
+    def copy_range(self, start: int, stop: int) -> "TokenBuffer":
+        """Return a buffer holding only tokens ``start:stop``, over the same source."""
+        copy = TokenBuffer.__new__(TokenBuffer)
+        copy.source = self.source
+        copy.types = self.types[start:stop]
+        copy.starts = self.starts[start:stop]
+        copy.ends = self.ends[start:stop]
+        copy.lines = self.lines[start:stop]
+        return copy
+
+    def _decode(self, value: Union[str, bytes]) -> str:
+        if isinstance(value, str):
+            return value
+        return value.decode("utf-8")
+
+
+class TokenSlice(Sequence):
+    """Read-only view of a contiguous run of tokens in a ``TokenBuffer``.
+
+    Indexing and iteration produce ordinary ``Token`` objects on demand, so a
+    slice can stand in for a token list on ``AttributeNode.raw_tokens`` and
+    ``GroupNode.args_tokens``.
+    """
+
+    __slots__ = ("buffer", "start", "stop")
+
+    def __init__(self, buffer: TokenBuffer, start: int, stop: int) -> None:
+        self.buffer = buffer
+        self.start = start
+        self.stop = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    @overload
+    def __getitem__(self, index: int) -> Token: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Token]: ...
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.buffer.token(position) for position in range(self.start, self.stop)[index]]
+        length = self.stop - self.start
+        if index < 0:
+            index += length
+        if not 0 <= index < length:
+            raise IndexError("token slice index out of range")
+        return self.buffer.token(self.start + index)
+
+    def __iter__(self) -> Iterator[Token]:
+        token = self.buffer.token
+        for position in range(self.start, self.stop):
+            yield token(position)
+
+    def type_values(self) -> Iterator[Tuple[TokenType, str]]:
+        """Yield ``(type, value)`` pairs without building ``Token`` objects or columns."""
+        buffer = self.buffer
+        types = buffer.types
+        value_at = buffer.value_at
+        for position in range(self.start, self.stop):
+            yield TOKEN_TYPES[types[position]], value_at(position)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"TokenSlice({list(self)!r})"
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cst import Token, TokenType
+
+
+# Format specs that mean the same thing as a printf-style conversion.
+_PERCENT_SPEC = re.compile(r"(?:\.\d+)?[eEfFgG]")
+_FIELD_SEPARATOR = "\0"
+
+
+class AttributeKind(Enum):
+    SCALAR = "scalar"
+    STRING = "string"
+    NUMERIC_ARRAY = "numeric_array"
+    MIXED = "mixed"
+
+
+@dataclass(frozen=True)
+class ArrayRow:
+    values: List[float]
+    quoted: bool
+
+
+@dataclass(frozen=True)
+class DecodedAttribute:
+    """Classification of an attribute's tokens.
+
+    ``rows`` holds the decoded values, one entry per escaped-newline separated
+    row, and is only filled for ``NUMERIC_ARRAY``.
+    """
+
+    kind: AttributeKind
+    rows: Tuple[ArrayRow, ...] = ()
+    has_escaped_newline: bool = False
+
+
+def decode_tokens(tokens: Sequence[Token]) -> DecodedAttribute:
+    """Classify ``tokens`` and decode their numeric rows in a single pass."""
+    rows: List[ArrayRow] = []
+    values: List[float] = []
+    row_open = False
+    quoted = False
+    numeric = True
+    has_separator = False
+    has_escaped_newline = False
+    has_string = False
+    for token in tokens:
+        token_type = token.type
+        if token_type == TokenType.COMMENT:
+            continue
+        if token_type == TokenType.ESCAPED_NEWLINE:
+            has_separator = has_escaped_newline = True
+            if row_open:
+                rows.append(ArrayRow(values=values, quoted=quoted))
+                values, row_open, quoted = [], False, False
+            continue
+        row_open = True
+        if token_type == TokenType.COMMA:
+            has_separator = True
+            continue
+        if token_type == TokenType.STRING:
+            has_string = quoted = True
+        elif token_type != TokenType.IDENTIFIER:
+            numeric = False
+            continue
+        if not numeric:
+            continue
+        has_value = False
+        for part in token.value.split(","):
+            stripped = part.strip()
+            if not stripped:
+                continue
+            has_value = True
+            try:
+                values.append(float(stripped))
+            except ValueError:
+                numeric = False
+                break
+        if not has_value:
+            numeric = False
+    if has_separator:
+        if not numeric:
+            return DecodedAttribute(AttributeKind.MIXED, has_escaped_newline=has_escaped_newline)
+        if row_open:
+            rows.append(ArrayRow(values=values, quoted=quoted))
+        return DecodedAttribute(AttributeKind.NUMERIC_ARRAY, tuple(rows), has_escaped_newline)
+    return DecodedAttribute(AttributeKind.STRING if has_string else AttributeKind.SCALAR)
+
+
+class FloatRenderer:
+    """Render runs of floats with ``float_format``, one formatting call per run.
+
+    Specs with a printf-style equivalent (``"g"``, ``".8g"``, ``".3e"``, ...)
+    are rendered through a cached ``%`` template sized to the run, which does
+    the whole row in C; other specs fall back to ``format`` per value.
+    """
+
+    def __init__(self, float_format: str = "g") -> None:
+        format(0.0, float_format)  # Reject invalid specs up front.
+        self.float_format = float_format
+        self._conversion: Optional[str] = "%" + float_format if _PERCENT_SPEC.fullmatch(float_format) else None
+        self._templates: Dict[Tuple[int, str], str] = {}
+
+    @classmethod
+    def significant_digits(cls, digits: int) -> "FloatRenderer":
+        if digits < 1:
+            raise ValueError(f"Significant digits must be at least 1, got {digits}")
+        return cls(f".{digits}g")
+
+    def render(self, value: float) -> str:
+        return format(value, self.float_format)
+
+    def join(self, values: Sequence[float], separator: str = ", ") -> str:
+        if self._conversion is None:
+            return separator.join([format(value, self.float_format) for value in values])
+        key = (len(values), separator)
+        template = self._templates.get(key)
+        if template is None:
+            template = self._templates[key] = separator.join([self._conversion] * len(values))
+        return template % tuple(values)
+
+    def split(self, values: Sequence[float]) -> List[str]:
+        """Render each value separately, still in one formatting call."""
+        if not values:
+            return []
+        return self.join(values, _FIELD_SEPARATOR).split(_FIELD_SEPARATOR)
@@ -1,16 +1,59 @@
-from .matrix import MatrixShapeError, add_matrices, extract_array_format, multiply_matrix, parse_array_tokens, parse_values_tokens
-from .runner import PatchActionError, PatchRunner, PatchSummary
-from .scope import ScopeMatchError, find_groups_by_name, find_nodes_by_scope, group_has_attribute
+from .expression import Expression, ExpressionError, GridExpression
+from .matrix import (
+    MATRIX_BACKENDS,
+    DeltaGrid,
+    MatrixBackendError,
+    MatrixShapeError,
+    TableBatch,
+    add_matrices,
+    add_scalar,
+    apply_expression,
+    count_text_values,
+    count_values,
+    default_matrix_backend,
+    extract_array_format,
+    multiply_matrix,
+    parse_array_tokens,
+    parse_values_tokens,
+)
+from .plan import AffineTransform, PatchActionError, PatchOperation, PatchPlan, PlannedModification, compile_operation
+from .runner import PatchRunner, PatchSummary, TargetCount
+from .scope import (
+    PatternMatcher,
+    ScopeMatchError,
+    ScopeMatcher,
+    SelectorMatcher,
+    find_groups_by_name,
+    find_nodes_by_scope,
+    group_has_attribute,
+)
 from .units import UnitExpectations, UnitMismatchError, validate_units
 
 __all__ = [
+    "AffineTransform",
+    "DeltaGrid",
+    "Expression",
+    "ExpressionError",
+    "GridExpression",
+    "MATRIX_BACKENDS",
+    "MatrixBackendError",
     "MatrixShapeError",
     "PatchActionError",
+    "PatchOperation",
+    "PatchPlan",
     "PatchRunner",
     "PatchSummary",
+    "PatternMatcher",
+    "PlannedModification",
     "UnitExpectations",
     "UnitMismatchError",
     "add_matrices",
+    "add_scalar",
+    "apply_expression",
+    "compile_operation",
+    "count_text_values",
+    "count_values",
+    "default_matrix_backend",
     "extract_array_format",
     "find_groups_by_name",
     "find_nodes_by_scope",
@@ -19,5 +62,9 @@ __all__ = [
     "parse_array_tokens",
     "parse_values_tokens",
     "ScopeMatchError",
+    "ScopeMatcher",
+    "SelectorMatcher",
+    "TableBatch",
+    "TargetCount",
     "validate_units",
 ]
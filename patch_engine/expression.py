@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import ast
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is not installed
+    np = None
+
+VARIABLES = ("x", "index_1", "index_2")
+
+# name -> (number of arguments, list implementation, NumPy implementation name)
+_FUNCTIONS = {
+    "abs": (1, abs, "abs"),
+    "min": (2, min, "minimum"),
+    "max": (2, max, "maximum"),
+    "sqrt": (1, math.sqrt, "sqrt"),
+    "exp": (1, math.exp, "exp"),
+    "log": (1, math.log, "log"),
+    "pow": (2, math.pow, "power"),
+}
+_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.UAdd, ast.USub)
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+class Expression:
+    """An element-wise arithmetic expression over table values, compiled once.
+
+    ``x`` is the table value, ``index_1`` and ``index_2`` the grid point it
+    sits at. Only numbers, ``+ - * / **``, and the functions in ``_FUNCTIONS``
+    are accepted, so configs cannot run arbitrary code. Lists are evaluated
+    by one compiled comprehension, NumPy arrays by one array expression.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        try:
+            tree = ast.parse(source.strip(), mode="eval")
+        except SyntaxError as error:
+            raise ExpressionError(f"Invalid expression {source!r}: {error.msg}") from None
+        names = _validate(tree.body, source)
+        tree = ast.fix_missing_locations(_FloatConstants().visit(tree))
+        self.names: FrozenSet[str] = frozenset(names)
+        self.uses_indices = bool(self.names & {"index_1", "index_2"})
+        body = ast.unparse(tree.body)
+        self._array_code = compile(tree, "<expression>", "eval")
+        self._list_code = compile(f"[{body} for x, index_1, index_2 in _elements]", "<expression>", "eval")
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"source": self.source}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["source"])
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Expression) and other.source == self.source
+
+    def __hash__(self) -> int:
+        return hash(self.source)
+
+    def __repr__(self) -> str:
+        return f"Expression({self.source!r})"
+
+    def evaluate(
+        self,
+        values: Sequence[float],
+        index_1: Optional[Sequence[float]] = None,
+        index_2: Optional[Sequence[float]] = None,
+    ) -> List[float]:
+        """Evaluate over flat ``values``; ``index_1``/``index_2`` give each value's grid point."""
+        self._check_indices(index_1, index_2)
+        columns = [values, index_1 or _none(values), index_2 or _none(values)]
+        # The comprehension body resolves function names through globals, so they go there.
+        scope = {name: implementation for name, (_, implementation, _) in _FUNCTIONS.items()}
+        scope.update(__builtins__={}, _elements=zip(*columns))
+        try:
+            result = eval(self._list_code, scope)
+        except (ArithmeticError, ValueError) as error:
+            raise ExpressionError(f"Evaluating {self.source!r} failed: {error}") from None
+        if not all(isinstance(value, float) and math.isfinite(value) for value in result):
+            raise ExpressionError(f"Evaluating {self.source!r} produced a complex or non-finite value")
+        return result
+
+    def evaluate_array(
+        self,
+        values: "np.ndarray",
+        index_1: Optional["np.ndarray"] = None,
+        index_2: Optional["np.ndarray"] = None,
+    ) -> "np.ndarray":
+        self._check_indices(index_1, index_2)
+        scope = {name: getattr(np, implementation) for name, (_, _, implementation) in _FUNCTIONS.items()}
+        scope.update(__builtins__={}, x=values, index_1=index_1, index_2=index_2)
+        with np.errstate(all="ignore"):
+            result = np.broadcast_to(eval(self._array_code, scope), values.shape)
+        if not np.isfinite(result).all():
+            raise ExpressionError(f"Evaluating {self.source!r} produced a non-finite value")
+        return result.astype(np.float64)
+
+    def _check_indices(self, index_1: Optional[Sequence[float]], index_2: Optional[Sequence[float]]) -> None:
+        for name, value in (("index_1", index_1), ("index_2", index_2)):
+            if name in self.names and value is None:
+                raise ExpressionError(f"{self.source!r} uses {name}, which the table does not have")
+
+
+@dataclass(frozen=True)
+class GridExpression:
+    """An expression with the ``index_1``/``index_2`` of the tables it is applied to, once known."""
+
+    expression: Expression
+    index_1: Optional[Tuple[float, ...]] = None
+    index_2: Optional[Tuple[float, ...]] = None
+
+
+def _validate(node: ast.AST, source: str) -> List[str]:
+    """Check ``node`` against the whitelist and return the variables it reads."""
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+            raise ExpressionError(f"Only numeric constants are allowed in {source!r}")
+        return []
+    if isinstance(node, ast.Name):
+        if node.id not in VARIABLES:
+            raise ExpressionError(f"Unknown name {node.id!r} in {source!r}; use {', '.join(VARIABLES)}")
+        return [node.id]
+    if isinstance(node, ast.BinOp) and isinstance(node.op, _OPERATORS):
+        return _validate(node.left, source) + _validate(node.right, source)
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, _OPERATORS):
+        return _validate(node.operand, source)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS:
+        arity = _FUNCTIONS[node.func.id][0]
+        if node.keywords or len(node.args) != arity:
+            raise ExpressionError(f"{node.func.id}() takes {arity} positional argument(s) in {source!r}")
+        return [name for argument in node.args for name in _validate(argument, source)]
+    raise ExpressionError(f"Unsupported syntax {ast.unparse(node)!r} in {source!r}")
+
+
+class _FloatConstants(ast.NodeTransformer):
+    """Make integer literals floats, so results are floats on both backends."""
+
+    def visit_Constant(self, node: ast.Constant) -> ast.Constant:
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+def _none(values: Sequence[float]) -> List[None]:
+    return [None] * len(values)
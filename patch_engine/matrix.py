@@ -1,15 +1,49 @@
 from __future__ import annotations
 
+import re
+from bisect import bisect_right
 from dataclasses import dataclass
-from typing import Iterable, List
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
 from liberty_core.cst import Token, TokenType
+from liberty_core.token_buffer import TokenSlice
+
+from .expression import GridExpression
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - exercised when NumPy is not installed
+    np = None
+
+MATRIX_BACKENDS = ("list", "numpy")
+
+# Strings (capturing their contents), comments, escaped newlines and bare
+# values, in the order the lexer tries them.
+_TABLE_TEXT_PATTERN = re.compile(r'"([^"\\]*(?:\\.[^"\\]*)*)"|//[^\n]*|/\*.*?\*/|\\\n|([^\s(){}:;,"/]+)', re.DOTALL)
+
+# A table of floats: nested lists, or a 2-D float64 array with the numpy backend.
+Matrix = Union[List[List[float]], "np.ndarray"]
 
 
 class MatrixShapeError(ValueError):
     pass
 
 
+class MatrixBackendError(ValueError):
+    pass
+
+
+def default_matrix_backend() -> str:
+    return "numpy" if np is not None else "list"
+
+
+def check_matrix_backend(backend: str) -> None:
+    if backend not in MATRIX_BACKENDS:
+        raise MatrixBackendError(f"Unknown matrix backend: {backend}")
+    if backend == "numpy" and np is None:
+        raise MatrixBackendError("NumPy is required for the numpy matrix backend.")
+
+
 @dataclass(frozen=True)
 class ArrayFormat:
     layout: List[List[int]]
@@ -35,23 +69,68 @@ def parse_values_tokens(tokens: Iterable[Token], rows: int, cols: int) -> List[L
     return [flat[row * cols : (row + 1) * cols] for row in range(rows)]
 
 
-def parse_array_tokens(tokens: Iterable[Token]) -> List[List[float]]:
-    rows: List[List[float]] = []
-    current: List[Token] = []
+def parse_array_tokens(tokens: Iterable[Token], backend: str = "list") -> Matrix:
+    """Decode a table into one row per escaped-newline separated line.
+
+    The ``list`` backend returns ``List[List[float]]``; the ``numpy`` backend
+    returns a 2-D float64 array and raises ``MatrixShapeError`` for ragged rows.
+    """
+    rows = _row_segments(tokens)
+    if backend == "list":
+        return [[float(segment) for segment in row] for row in rows]
+    check_matrix_backend(backend)
+    if not rows:
+        return np.empty((0, 0))
+    if len({len(row) for row in rows}) > 1:
+        raise MatrixShapeError("Rows have different lengths")
+    return np.array(rows, dtype=np.float64)
+
+
+def _row_segments(tokens: Iterable[Token]) -> List[List[str]]:
+    rows: List[List[str]] = []
+    current: List[str] = []
+    row_open = False
     for token in tokens:
         if token.type == TokenType.ESCAPED_NEWLINE:
-            if current:
-                rows.append(_parse_numeric_tokens(current))
+            if row_open:
+                rows.append(current)
                 current = []
+                row_open = False
             continue
         if token.type == TokenType.COMMENT:
             continue
-        current.append(token)
-    if current:
-        rows.append(_parse_numeric_tokens(current))
+        row_open = True
+        if token.type in {TokenType.STRING, TokenType.IDENTIFIER}:
+            for segment in token.value.split(","):
+                stripped = segment.strip()
+                if stripped:
+                    current.append(stripped)
+    if row_open:
+        rows.append(current)
     return rows
 
 
+def count_values(tokens: Sequence[Token]) -> int:
+    """Count a table's values without converting them."""
+    pairs = tokens.type_values() if isinstance(tokens, TokenSlice) else ((token.type, token.value) for token in tokens)
+    count = 0
+    for token_type, value in pairs:
+        if token_type == TokenType.STRING or token_type == TokenType.IDENTIFIER:
+            count += sum(1 for segment in value.split(",") if segment.strip())
+    return count
+
+
+def count_text_values(text: str) -> int:
+    """Count the values in a table's source text, as ``count_values`` would, without lexing it."""
+    count = 0
+    for string, value in _TABLE_TEXT_PATTERN.findall(text):
+        if value:
+            count += 1
+        elif string:
+            count += sum(1 for segment in string.split(",") if segment.strip())
+    return count
+
+
 def extract_array_format(tokens: Iterable[Token]) -> ArrayFormat:
     layout = _extract_array_layout(tokens)
     has_escaped_newline = any(token.type == TokenType.ESCAPED_NEWLINE for token in tokens)
@@ -80,24 +159,27 @@ def _extract_array_layout(tokens: Iterable[Token]) -> List[List[int]]:
     return rows
 
 
-def _parse_numeric_tokens(tokens: Iterable[Token]) -> List[float]:
-    values: List[float] = []
-    for token in tokens:
-        if token.type in {TokenType.ESCAPED_NEWLINE, TokenType.COMMENT, TokenType.COMMA}:
-            continue
-        if token.type in {TokenType.STRING, TokenType.IDENTIFIER}:
-            for segment in token.value.split(","):
-                stripped = segment.strip()
-                if stripped:
-                    values.append(float(stripped))
-    return values
+def multiply_matrix(matrix: Matrix, scalar: float) -> Matrix:
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix * scalar
+    return [[value * scalar for value in row] for row in matrix]
 
 
-def multiply_matrix(matrix: List[List[float]], scalar: float) -> List[List[float]]:
-    return [[value * scalar for value in row] for row in matrix]
+def add_scalar(matrix: Matrix, scalar: float) -> Matrix:
+    if np is not None and isinstance(matrix, np.ndarray):
+        return matrix + scalar
+    return [[value + scalar for value in row] for row in matrix]
 
 
-def add_matrices(left: List[List[float]], right: List[List[float]]) -> List[List[float]]:
+def add_matrices(left: Matrix, right: Matrix) -> Matrix:
+    if np is not None and (isinstance(left, np.ndarray) or isinstance(right, np.ndarray)):
+        left_array = _as_matrix(left)
+        right_array = _as_matrix(right)
+        if left_array.shape[0] != right_array.shape[0]:
+            raise MatrixShapeError("Row count mismatch")
+        if left_array.shape[1] != right_array.shape[1]:
+            raise MatrixShapeError("Column count mismatch")
+        return left_array + right_array
     if len(left) != len(right):
         raise MatrixShapeError("Row count mismatch")
     result: List[List[float]] = []
@@ -106,3 +188,251 @@ def add_matrices(left: List[List[float]], right: List[List[float]]) -> List[List
             raise MatrixShapeError("Column count mismatch")
         result.append([left_value + right_value for left_value, right_value in zip(left_row, right_row)])
     return result
+
+
+def apply_expression(matrix: Matrix, operand: GridExpression) -> Matrix:
+    if np is not None and isinstance(matrix, np.ndarray):
+        index_1, index_2 = _grid_coordinates(operand, [matrix.shape[1]] * matrix.shape[0])
+        flat = operand.expression.evaluate_array(
+            matrix.ravel(), *(None if index is None else np.asarray(index) for index in (index_1, index_2))
+        )
+        return flat.reshape(matrix.shape)
+    row_lengths = [len(row) for row in matrix]
+    flat = operand.expression.evaluate(
+        [value for row in matrix for value in row], *_grid_coordinates(operand, row_lengths)
+    )
+    return _split_rows(flat, row_lengths)
+
+
+def _grid_coordinates(
+    operand: GridExpression, row_lengths: List[int]
+) -> Tuple[Optional[List[float]], Optional[List[float]]]:
+    """The ``index_1``/``index_2`` value of every element of a table with ``row_lengths``."""
+    index_1, index_2 = operand.index_1, operand.index_2
+    if index_1 is None or not operand.expression.uses_indices:
+        return None, None
+    if index_2 is None:
+        # 1-D tables hold one value per index_1 point in each row.
+        if any(length != len(index_1) for length in row_lengths):
+            raise MatrixShapeError("Table rows do not match its index_1")
+        return list(index_1) * len(row_lengths), None
+    if len(row_lengths) != len(index_1) or any(length != len(index_2) for length in row_lengths):
+        raise MatrixShapeError("Table shape does not match its index_1/index_2")
+    return [value for value in index_1 for _ in index_2], list(index_2) * len(index_1)
+
+
+def _split_rows(values: Sequence[float], row_lengths: List[int], start: int = 0) -> List[List[float]]:
+    rows: List[List[float]] = []
+    position = start
+    for length in row_lengths:
+        rows.append(list(values[position : position + length]))
+        position += length
+    return rows
+
+
+def _as_matrix(value: Sequence) -> "np.ndarray":
+    try:
+        array = np.asarray(value, dtype=np.float64)
+    except ValueError:
+        raise MatrixShapeError("Rows have different lengths") from None
+    if array.size == 0:
+        return array.reshape(0, 0)
+    if array.ndim != 2:
+        raise MatrixShapeError(f"Expected a 2-D matrix, got {array.ndim} dimension(s)")
+    return array
+
+
+@dataclass(frozen=True)
+class DeltaGrid:
+    """A table of values sampled on its own ``index_1`` x ``index_2`` grid.
+
+    One-dimensional grids have no ``index_2`` and a single row of values.
+    """
+
+    index_1: Tuple[float, ...]
+    index_2: Optional[Tuple[float, ...]]
+    values: Tuple[Tuple[float, ...], ...]
+
+    def __post_init__(self) -> None:
+        for axis in (self.index_1, self.index_2):
+            if axis is None:
+                continue
+            if not axis:
+                raise MatrixShapeError("Grid indices must not be empty")
+            if any(right <= left for left, right in zip(axis, axis[1:])):
+                raise MatrixShapeError("Grid indices must be strictly increasing")
+        if self.index_2 is None:
+            shape = (1, len(self.index_1))
+        else:
+            shape = (len(self.index_1), len(self.index_2))
+        if len(self.values) != shape[0] or any(len(row) != shape[1] for row in self.values):
+            raise MatrixShapeError(f"Grid values must be {shape[0]}x{shape[1]} to match its indices")
+
+    def resample(self, index_1: Sequence[float], index_2: Optional[Sequence[float]] = None) -> List[List[float]]:
+        """Bilinearly (linearly, for 1-D grids) interpolate onto another grid.
+
+        Points outside this grid take the value at its nearest edge. The
+        result has one row per ``index_1`` point, or a single row for 1-D.
+        """
+        if (index_2 is None) != (self.index_2 is None):
+            raise MatrixShapeError(
+                f"Cannot resample a {self._dimensions()}-D grid onto a {1 if index_2 is None else 2}-D table"
+            )
+        if self.index_2 is None:
+            row = self.values[0]
+            return [[_lerp(row, position, weight) for position, weight in _weights(self.index_1, index_1)]]
+        columns = _weights(self.index_2, index_2)
+        resampled: List[List[float]] = []
+        for position, weight in _weights(self.index_1, index_1):
+            low = [_lerp(self.values[position], column, u) for column, u in columns]
+            if weight == 0.0:
+                resampled.append(low)
+                continue
+            high = [_lerp(self.values[position + 1], column, u) for column, u in columns]
+            resampled.append([(1.0 - weight) * left + weight * right for left, right in zip(low, high)])
+        return resampled
+
+    def _dimensions(self) -> int:
+        return 1 if self.index_2 is None else 2
+
+
+def _weights(axis: Sequence[float], points: Sequence[float]) -> List[Tuple[int, float]]:
+    """For each point, the grid cell ``i`` it falls in and its fraction of the way to ``i + 1``."""
+    last = len(axis) - 1
+    weights: List[Tuple[int, float]] = []
+    for point in points:
+        if point <= axis[0] or last == 0:
+            weights.append((0, 0.0))
+        elif point >= axis[last]:
+            weights.append((last, 0.0))
+        else:
+            position = bisect_right(axis, point) - 1
+            weights.append((position, (point - axis[position]) / (axis[position + 1] - axis[position])))
+    return weights
+
+
+def _lerp(row: Sequence[float], position: int, weight: float) -> float:
+    if weight == 0.0:
+        return row[position]
+    return (1.0 - weight) * row[position] + weight * row[position + 1]
+
+
+class TableBatch:
+    """Many tables gathered into one flat value buffer.
+
+    Table ``i`` owns ``values[offsets[i]:offsets[i + 1]]``, split into rows of
+    ``row_lengths[i]``. Every table is scanned once; its values are converted,
+    updated and read back together with the others, so an operation costs one
+    call over the buffer instead of one per table.
+    """
+
+    def __init__(self, tables: Iterable[Sequence[Token]], backend: str = "list") -> None:
+        check_matrix_backend(backend)
+        self.backend = backend
+        self.offsets: List[int] = [0]
+        self.row_lengths: List[List[int]] = []
+        self.formats: List[ArrayFormat] = []
+        self.quoted: List[bool] = []
+        segments: List[str] = []
+        for tokens in tables:
+            rows, array_format, quoted = _scan_table(tokens)
+            for row in rows:
+                segments.extend(row)
+            self.offsets.append(len(segments))
+            self.row_lengths.append([len(row) for row in rows])
+            self.formats.append(array_format)
+            self.quoted.append(quoted)
+        if backend == "numpy":
+            self.values = np.array(segments, dtype=np.float64)
+        else:
+            self.values = [float(segment) for segment in segments]
+
+    def __len__(self) -> int:
+        return len(self.row_lengths)
+
+    def multiply(self, scalar: float) -> None:
+        if self.backend == "numpy":
+            self.values = self.values * scalar
+        else:
+            self.values = [value * scalar for value in self.values]
+
+    def add_scalar(self, scalar: float) -> None:
+        if self.backend == "numpy":
+            self.values = self.values + scalar
+        else:
+            self.values = [value + scalar for value in self.values]
+
+    def add_matrix(self, matrix: List[List[float]]) -> None:
+        """Add ``matrix`` to every table, which must all have its shape."""
+        lengths = [len(row) for row in matrix]
+        for row_lengths in self.row_lengths:
+            if len(row_lengths) != len(lengths):
+                raise MatrixShapeError("Row count mismatch")
+            if row_lengths != lengths:
+                raise MatrixShapeError("Column count mismatch")
+        flat = [value for row in matrix for value in row]
+        if self.backend == "numpy":
+            self.values = self.values + np.tile(np.asarray(flat, dtype=np.float64), len(self))
+        else:
+            self.values = [value + addend for value, addend in zip(self.values, flat * len(self))]
+
+    def apply_expression(self, operand: GridExpression) -> None:
+        """Evaluate ``operand`` over every value; all tables share its index grid."""
+        index_1: List[float] = []
+        index_2: List[float] = []
+        for row_lengths in self.row_lengths:
+            table_index_1, table_index_2 = _grid_coordinates(operand, row_lengths)
+            index_1.extend(table_index_1 or ())
+            index_2.extend(table_index_2 or ())
+        coordinates = [index or None for index in (index_1, index_2)]
+        if self.backend == "numpy":
+            arrays = [None if index is None else np.asarray(index, dtype=np.float64) for index in coordinates]
+            self.values = operand.expression.evaluate_array(self.values, *arrays)
+        else:
+            self.values = operand.expression.evaluate(self.values, *coordinates)
+
+    def tables(self) -> Iterator[List[List[float]]]:
+        """Yield each table's rows, in gather order."""
+        values = self.values.tolist() if self.backend == "numpy" else self.values
+        for index, row_lengths in enumerate(self.row_lengths):
+            yield _split_rows(values, row_lengths, self.offsets[index])
+
+
+def _scan_table(tokens: Sequence[Token]) -> Tuple[List[List[str]], ArrayFormat, bool]:
+    """One pass giving ``_row_segments``, ``extract_array_format`` and whether any value is quoted."""
+    pairs = tokens.type_values() if isinstance(tokens, TokenSlice) else ((token.type, token.value) for token in tokens)
+    rows: List[List[str]] = []
+    layout: List[List[int]] = []
+    current: List[str] = []
+    current_layout: List[int] = []
+    row_open = False
+    has_escaped_newline = False
+    quoted = False
+    for token_type, value in pairs:
+        if token_type == TokenType.ESCAPED_NEWLINE:
+            has_escaped_newline = True
+            if row_open:
+                rows.append(current)
+                current = []
+                row_open = False
+            if current_layout:
+                layout.append(current_layout)
+                current_layout = []
+            continue
+        if token_type == TokenType.COMMENT:
+            continue
+        row_open = True
+        if token_type == TokenType.STRING or token_type == TokenType.IDENTIFIER:
+            quoted = quoted or token_type == TokenType.STRING
+            count = 0
+            for segment in value.split(","):
+                stripped = segment.strip()
+                if stripped:
+                    current.append(stripped)
+                    count += 1
+            current_layout.append(count)
+    if row_open:
+        rows.append(current)
+    if current_layout:
+        layout.append(current_layout)
+    return rows, ArrayFormat(layout=layout, has_escaped_newline=has_escaped_newline), quoted
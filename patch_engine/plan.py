@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from typing import Any, Callable, List, Optional, Sequence, Set, Tuple, Union
+
+from .expression import Expression, ExpressionError, GridExpression
+from .matrix import (
+    DeltaGrid,
+    Matrix,
+    MatrixShapeError,
+    TableBatch,
+    add_matrices,
+    add_scalar,
+    apply_expression,
+    multiply_matrix,
+)
+from .scope import ScopeMatchError, ScopeMatcher
+from .units import UnitExpectations
+
+
+# Operation kinds that fold into an AffineTransform.
+_AFFINE_KINDS = frozenset({"multiply", "add_scalar", "add_matrix"})
+
+
+class PatchActionError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class PatchOperation:
+    """An action resolved to the functions that apply it and its normalized operand.
+
+    ``operand`` is a float, a list of float rows for ``add_matrix``, a
+    ``DeltaGrid`` for ``add_interpolated`` or a ``GridExpression`` for
+    ``expression``. Operations that depend on each table's indices
+    (``needs_grid``) are applied through ``on_grid``.
+    """
+
+    kind: str
+    operand: Union[float, List[List[float]], DeltaGrid, GridExpression]
+    apply_matrix: Callable[[Matrix, Any], Matrix]
+    apply_batch: Callable[[TableBatch, Any], None]
+
+    @property
+    def needs_grid(self) -> bool:
+        if self.kind == "expression":
+            return self.operand.expression.uses_indices
+        return self.kind == "add_interpolated"
+
+    def apply(self, matrix: Matrix) -> Matrix:
+        return self.apply_matrix(matrix, self.operand)
+
+    def apply_to_batch(self, batch: TableBatch) -> None:
+        self.apply_batch(batch, self.operand)
+
+    def on_grid(self, index_1: Sequence[float], index_2: Optional[Sequence[float]]) -> "PatchOperation":
+        """This operation as applied to a table indexed by ``index_1`` x ``index_2``."""
+        if self.kind == "expression":
+            indices = (tuple(index_1), None if index_2 is None else tuple(index_2))
+            return replace(self, operand=GridExpression(self.operand.expression, *indices))
+        delta = self.operand.resample(index_1, index_2)
+        return PatchOperation("add_matrix", delta, add_matrices, TableBatch.add_matrix)
+
+
+@dataclass(frozen=True)
+class AffineTransform:
+    """``value * scale + offset + matrix[row][col]``: stacked multiplies and adds folded together.
+
+    Applying the fold is exact for a multiply followed by adds; other orders
+    can differ from step-by-step application by float rounding.
+    """
+
+    scale: float = 1.0
+    offset: float = 0.0
+    matrix: Optional[Tuple[Tuple[float, ...], ...]] = None
+
+    def then(self, operation: PatchOperation) -> "AffineTransform":
+        """The transform that applies ``self`` and then ``operation``."""
+        if operation.kind == "multiply":
+            factor = operation.operand
+            matrix = self.matrix
+            if matrix is not None:
+                matrix = tuple(tuple(value * factor for value in row) for row in matrix)
+            return AffineTransform(self.scale * factor, self.offset * factor, matrix)
+        if operation.kind == "add_scalar":
+            return AffineTransform(self.scale, self.offset + operation.operand, self.matrix)
+        if operation.kind == "add_matrix":
+            matrix = operation.operand if self.matrix is None else add_matrices(_rows(self.matrix), operation.operand)
+            return AffineTransform(self.scale, self.offset, tuple(tuple(row) for row in matrix))
+        raise PatchActionError(f"Cannot fold {operation.kind} into an affine transform.")
+
+    def apply(self, matrix: Matrix) -> Matrix:
+        if self.scale != 1.0:
+            matrix = multiply_matrix(matrix, self.scale)
+        if self.offset != 0.0:
+            matrix = add_scalar(matrix, self.offset)
+        if self.matrix is not None:
+            matrix = add_matrices(matrix, _rows(self.matrix))
+        return matrix
+
+    def apply_to_batch(self, batch: TableBatch) -> None:
+        if self.scale != 1.0:
+            batch.multiply(self.scale)
+        if self.offset != 0.0:
+            batch.add_scalar(self.offset)
+        if self.matrix is not None:
+            batch.add_matrix(_rows(self.matrix))
+
+
+@dataclass(frozen=True)
+class PlannedModification:
+    scope: ScopeMatcher
+    attribute: str
+    operation: PatchOperation
+
+
+@dataclass(frozen=True)
+class PatchPlan:
+    """A patch config validated and compiled once.
+
+    Plans hold no references to a parsed library, so one plan can be applied
+    to any number of ``ParseResult``s and pickled to worker processes.
+    ``stages`` groups consecutive modifications whose targets can be resolved
+    up front and whose operations fold into one ``AffineTransform`` per table.
+    """
+
+    expectations: UnitExpectations
+    modifications: Tuple[PlannedModification, ...]
+    stages: Tuple[Tuple[PlannedModification, ...], ...] = ()
+
+    @classmethod
+    def compile(cls, config: dict) -> "PatchPlan":
+        modifications: List[PlannedModification] = []
+        for modification in config.get("modifications", []):
+            scope = ScopeMatcher.compile(modification.get("scope", {}))
+            if not scope.path:
+                raise ScopeMatchError([], "Scope path is empty.")
+            action = modification.get("action", {})
+            modifications.append(
+                PlannedModification(
+                    scope=scope,
+                    attribute=action.get("attribute", "values"),
+                    operation=compile_operation(action),
+                )
+            )
+        return cls(
+            expectations=UnitExpectations.from_config(config),
+            modifications=tuple(modifications),
+            stages=_fusion_stages(modifications),
+        )
+
+
+def compile_operation(action: dict) -> PatchOperation:
+    operation = action.get("operation")
+    mode = action.get("mode", "broadcast")
+    value = action.get("value")
+    if operation is None:
+        raise PatchActionError("Missing operation in action.")
+    if value is None:
+        raise PatchActionError("Missing value in action.")
+    if operation == "multiply":
+        if mode != "broadcast":
+            raise PatchActionError(f"Unsupported mode for multiply: {mode}")
+        return PatchOperation("multiply", float(value), multiply_matrix, TableBatch.multiply)
+    if operation == "add":
+        if mode == "broadcast":
+            return PatchOperation("add_scalar", float(value), add_scalar, TableBatch.add_scalar)
+        if mode == "matrix":
+            return PatchOperation("add_matrix", _normalize_matrix(value), add_matrices, TableBatch.add_matrix)
+        if mode == "interpolate":
+            return PatchOperation("add_interpolated", _normalize_grid(value), _requires_grid, _requires_grid)
+        raise PatchActionError(f"Unsupported mode for add: {mode}")
+    if operation == "expression":
+        if mode != "broadcast":
+            raise PatchActionError(f"Unsupported mode for expression: {mode}")
+        if not isinstance(value, str):
+            raise PatchActionError("Expression value must be a string.")
+        try:
+            expression = Expression(value)
+        except ExpressionError as error:
+            raise PatchActionError(str(error)) from None
+        return PatchOperation("expression", GridExpression(expression), apply_expression, TableBatch.apply_expression)
+    raise PatchActionError(f"Unsupported operation: {operation}")
+
+
+def _fusion_stages(modifications: List[PlannedModification]) -> Tuple[Tuple[PlannedModification, ...], ...]:
+    """Split ``modifications`` into runs that can be applied as one affine pass.
+
+    A run ends before a non-affine operation, and before a scope that filters
+    on an attribute the run modifies, since that scope has to see the result.
+    """
+    stages: List[List[PlannedModification]] = []
+    modified: Set[str] = set()
+    fusable = False
+    for modification in modifications:
+        filtered = {key for selector in modification.scope.path for key, _ in selector.attributes}
+        affine = modification.operation.kind in _AFFINE_KINDS
+        if stages and fusable and affine and not filtered & modified:
+            stages[-1].append(modification)
+        else:
+            stages.append([modification])
+            modified = set()
+        modified.add(modification.attribute)
+        fusable = affine
+    return tuple(tuple(stage) for stage in stages)
+
+
+def _rows(matrix: Tuple[Tuple[float, ...], ...]) -> List[List[float]]:
+    return [list(row) for row in matrix]
+
+
+def _normalize_grid(value: object) -> DeltaGrid:
+    if not isinstance(value, dict) or "index_1" not in value or "values" not in value:
+        raise PatchActionError("Interpolate value must be a mapping with index_1, values and optionally index_2.")
+    values = value["values"]
+    if isinstance(values, list) and values and not isinstance(values[0], list):
+        values = [values]
+    try:
+        return DeltaGrid(
+            index_1=tuple(float(item) for item in value["index_1"]),
+            index_2=None if value.get("index_2") is None else tuple(float(item) for item in value["index_2"]),
+            values=tuple(tuple(row) for row in _normalize_matrix(values)),
+        )
+    except MatrixShapeError as error:
+        raise PatchActionError(f"Invalid interpolation grid: {error}") from None
+
+
+def _requires_grid(target: object, operand: object) -> None:
+    raise PatchActionError("Interpolated operations are resolved per table with on_grid.")
+
+
+def _normalize_matrix(value: object) -> List[List[float]]:
+    if not isinstance(value, list):
+        raise PatchActionError("Matrix value must be a list.")
+    matrix: List[List[float]] = []
+    for row in value:
+        if not isinstance(row, list):
+            raise PatchActionError("Matrix rows must be lists.")
+        matrix.append([float(item) for item in row])
+    return matrix
@@ -1,48 +1,150 @@
 from __future__ import annotations
 
 import hashlib
-from dataclasses import dataclass
-from typing import Iterable, List, Optional
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 from uuid import uuid4
 
-from liberty_core.cst import AttributeNode, GroupNode, Token, TokenType
+from liberty_core.cst import AttributeNode, GroupNode, RootNode, TableAttributeNode, Token, TokenType
 from liberty_core.parser import ParseResult
+from liberty_core.token_buffer import TokenSlice
+from liberty_core.values import FloatRenderer
 from provenance import ArtifactRecord, BatchOp, ProvenanceDB
 
-from .matrix import ArrayFormat, add_matrices, extract_array_format, multiply_matrix, parse_array_tokens
-from .scope import find_nodes_by_scope
-from .units import UnitExpectations, validate_units
+from .matrix import (
+    ArrayFormat,
+    Matrix,
+    MatrixShapeError,
+    TableBatch,
+    check_matrix_backend,
+    count_text_values,
+    count_values,
+    default_matrix_backend,
+    extract_array_format,
+    parse_array_tokens,
+)
+from .plan import AffineTransform, PatchActionError, PatchOperation, PatchPlan, PlannedModification
+from .units import validate_units
 
 
-class PatchActionError(ValueError):
-    pass
+_DEFAULT_FLOATS = FloatRenderer()
+_IDENTITY = AffineTransform()
+
+# A table's (index_1, index_2) values; index_2 is None for 1-D tables.
+TableGrid = Tuple[Tuple[float, ...], Optional[Tuple[float, ...]]]
 
 
 @dataclass
 class PatchSummary:
     batch_id: str
     modified_groups: int
+    # Table and value updates made; a table patched twice counts twice.
+    tables: int = 0
+    values: int = 0
+
+
+@dataclass
+class TargetCount:
+    """What one modification would touch, as reported by ``PatchRunner.dry_run``.
+
+    ``overlaps`` maps the index of each earlier modification that targets
+    some of the same tables to how many tables they share.
+    """
+
+    operation: str
+    scope: str
+    groups: int
+    tables: int
+    values: int
+    repeated_tables: int = 0
+    overlaps: Dict[int, int] = field(default_factory=dict)
 
 
 class PatchRunner:
-    def __init__(self, provenance_db: Optional[ProvenanceDB] = None, batch_id: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        provenance_db: Optional[ProvenanceDB] = None,
+        batch_id: Optional[str] = None,
+        float_format: str = "g",
+        matrix_backend: Optional[str] = None,
+        batched: bool = True,
+        fuse: bool = True,
+    ) -> None:
         self.provenance_db = provenance_db
         self.batch_id = batch_id or f"batch-{uuid4()}"
+        self.floats = FloatRenderer(float_format)
+        self.matrix_backend = matrix_backend or default_matrix_backend()
+        check_matrix_backend(self.matrix_backend)
+        self.batched = batched
+        self.fuse = fuse
+        self._tables = 0
+        self._values = 0
 
-    def run(self, parse_result: ParseResult, config: dict) -> PatchSummary:
-        expectations = UnitExpectations.from_config(config)
-        validate_units(parse_result.context.as_dict(), expectations)
-        modifications = config.get("modifications", [])
+    def run(self, parse_result: ParseResult, config: Union[dict, PatchPlan]) -> PatchSummary:
+        """Apply ``config`` to ``parse_result``; pass a compiled ``PatchPlan`` to reuse it across libraries."""
+        plan = config if isinstance(config, PatchPlan) else PatchPlan.compile(config)
+        validate_units(parse_result.context.as_dict(), plan.expectations)
+        self._tables = self._values = 0
         modified_groups = 0
-        for modification in modifications:
-            scope = modification.get("scope", {})
-            action = modification.get("action", {})
-            attribute = action.get("attribute", "values")
-            groups = find_nodes_by_scope(parse_result.root, scope, require_match=True)
+        if self.fuse:
+            stages = plan.stages
+        else:
+            stages = tuple((modification,) for modification in plan.modifications)
+        for stage in stages:
+            if len(stage) > 1:
+                modified_groups += self._apply_fused(parse_result.root, stage)
+                continue
+            modification = stage[0]
+            groups = modification.scope.find(parse_result.root, require_match=True)
+            if modification.operation.needs_grid:
+                self._apply_on_grids(parse_result.root, groups, modification.attribute, modification.operation)
+                modified_groups += len(groups)
+                continue
+            if self.batched:
+                self._apply_batched(groups, modification.attribute, modification.operation)
+                modified_groups += len(groups)
+                continue
             for group in groups:
-                self._apply_action(group, attribute, action)
+                self._apply_action(group, modification.attribute, modification.operation)
                 modified_groups += 1
-        return PatchSummary(batch_id=self.batch_id, modified_groups=modified_groups)
+        return PatchSummary(
+            batch_id=self.batch_id, modified_groups=modified_groups, tables=self._tables, values=self._values
+        )
+
+    def dry_run(self, parse_result: ParseResult, config: Union[dict, PatchPlan]) -> List[TargetCount]:
+        """Count what each modification would touch, without decoding or rewriting any table.
+
+        Every scope is resolved against the unmodified library, so a scope
+        filtering on an attribute an earlier modification changes can match
+        differently in a real run. Scopes that match nothing report zero
+        groups instead of raising.
+        """
+        plan = config if isinstance(config, PatchPlan) else PatchPlan.compile(config)
+        validate_units(parse_result.context.as_dict(), plan.expectations)
+        targeted_by: Dict[int, List[int]] = {}
+        counts: List[TargetCount] = []
+        for index, modification in enumerate(plan.modifications):
+            groups = modification.scope.find(parse_result.root)
+            count = TargetCount(modification.operation.kind, modification.scope.describe(), len(groups), 0, 0)
+            seen: Set[int] = set()
+            for group in groups:
+                for _, node in _iter_attribute_nodes(group, modification.attribute):
+                    count.tables += 1
+                    if isinstance(node, TableAttributeNode) and not node.is_loaded:
+                        # Reading raw_tokens would lex the deferred table.
+                        count.values += count_text_values(node.body_text())
+                    else:
+                        count.values += count_values(node.raw_tokens)
+                    if id(node) in seen:
+                        count.repeated_tables += 1
+                        continue
+                    seen.add(id(node))
+                    for earlier in targeted_by.get(id(node), ()):
+                        count.overlaps[earlier] = count.overlaps.get(earlier, 0) + 1
+            for key in seen:
+                targeted_by.setdefault(key, []).append(index)
+            counts.append(count)
+        return counts
 
     def log_run(
         self,
@@ -52,6 +154,27 @@ class PatchRunner:
         output_text: str,
         output_path: str,
     ) -> None:
+        input_hash = hashlib.sha256(input_text.encode("utf-8")).hexdigest()
+        output_hash = hashlib.sha256(output_text.encode("utf-8")).hexdigest()
+        self.log_run_hashes(config, description, input_hash, output_hash, output_path)
+
+    def log_run_hashes(
+        self,
+        config: dict,
+        description: str,
+        input_hash: str,
+        output_hash: str,
+        output_path: str,
+    ) -> None:
+        self.log_artifact_hashes(config, description, [(input_hash, output_hash, output_path)])
+
+    def log_artifact_hashes(
+        self,
+        config: dict,
+        description: str,
+        artifacts: Iterable[Tuple[str, str, str]],
+    ) -> None:
+        """Record one batch with an artifact per ``(input_hash, output_hash, output_path)``."""
         if self.provenance_db is None:
             return
         batch = BatchOp(
@@ -61,8 +184,6 @@ class PatchRunner:
             expected_units=config.get("expected_units", {}),
         )
         self.provenance_db.log_batch(batch)
-        input_hash = hashlib.sha256(input_text.encode("utf-8")).hexdigest()
-        output_hash = hashlib.sha256(output_text.encode("utf-8")).hexdigest()
         self.provenance_db.log_artifacts(
             [
                 ArtifactRecord(
@@ -72,58 +193,106 @@ class PatchRunner:
                     output_hash=output_hash,
                     status="ok",
                 )
+                for input_hash, output_hash, output_path in artifacts
             ]
         )
 
-    def _apply_action(self, group: GroupNode, attribute: str, action: dict) -> None:
+    def _apply_action(self, group: GroupNode, attribute: str, operation: PatchOperation) -> None:
         for _, node in _iter_attribute_nodes(group, attribute):
-            array_format = extract_array_format(node.raw_tokens)
-            matrix = parse_array_tokens(node.raw_tokens)
-            updated = _apply_operation(matrix, action)
-            node.raw_tokens = _matrix_to_tokens(updated, _array_uses_quotes(node.raw_tokens), array_format)
-
-
-def _apply_operation(matrix: List[List[float]], action: dict) -> List[List[float]]:
-    operation = action.get("operation")
-    mode = action.get("mode", "broadcast")
-    value = action.get("value")
-    if operation is None:
-        raise PatchActionError("Missing operation in action.")
-    if value is None:
-        raise PatchActionError("Missing value in action.")
-    if operation == "multiply":
-        if mode != "broadcast":
-            raise PatchActionError(f"Unsupported mode for multiply: {mode}")
-        return multiply_matrix(matrix, float(value))
-    if operation == "add":
-        if mode == "broadcast":
-            scalar = float(value)
-            scalar_matrix = [[scalar for _ in row] for row in matrix]
-            return add_matrices(matrix, scalar_matrix)
-        if mode == "matrix":
-            return add_matrices(matrix, _normalize_matrix(value))
-        raise PatchActionError(f"Unsupported mode for add: {mode}")
-    raise PatchActionError(f"Unsupported operation: {operation}")
-
-
-def _normalize_matrix(value: object) -> List[List[float]]:
-    if not isinstance(value, list):
-        raise PatchActionError("Matrix value must be a list.")
-    matrix: List[List[float]] = []
-    for row in value:
-        if not isinstance(row, list):
-            raise PatchActionError("Matrix rows must be lists.")
-        matrix.append([float(item) for item in row])
-    return matrix
+            self._update_table(node, operation)
+
+    def _apply_batched(self, groups: List[GroupNode], attribute: str, operation: PatchOperation) -> None:
+        """Apply ``operation`` to every targeted table at once: gather, one update, scatter.
+
+        A table reached through several groups is updated once per match, as
+        ``_apply_action`` would, by processing each repeat in a later round.
+        """
+        for matches in _rounds(groups, attribute):
+            self._update_batch([node for _, node in matches], operation)
+
+    def _apply_on_grids(
+        self, root: RootNode, groups: List[GroupNode], attribute: str, operation: PatchOperation
+    ) -> None:
+        """Resample ``operation``'s delta once per distinct table grid and add it to every table on that grid."""
+        templates = _table_templates(root)
+        parsed: Dict[Tuple[str, ...], Tuple[float, ...]] = {}
+        grid_operations: Dict[TableGrid, PatchOperation] = {}
+        for matches in _rounds(groups, attribute):
+            by_grid: Dict[TableGrid, List[AttributeNode]] = {}
+            for table, node in matches:
+                by_grid.setdefault(_table_grid(table, templates, parsed), []).append(node)
+            for grid, nodes in by_grid.items():
+                grid_operation = grid_operations.get(grid)
+                if grid_operation is None:
+                    grid_operation = grid_operations[grid] = operation.on_grid(*grid)
+                if self.batched:
+                    self._update_batch(nodes, grid_operation)
+                    continue
+                for node in nodes:
+                    self._update_table(node, grid_operation)
+
+    def _apply_fused(self, root: RootNode, stage: Tuple[PlannedModification, ...]) -> int:
+        """Fold a stage's modifications into one affine transform per table and apply each once.
+
+        Returns the number of groups the stage's scopes matched.
+        """
+        nodes: Dict[int, AttributeNode] = {}
+        transforms: Dict[int, AffineTransform] = {}
+        modified_groups = 0
+        for modification in stage:
+            groups = modification.scope.find(root, require_match=True)
+            modified_groups += len(groups)
+            for group in groups:
+                for _, node in _iter_attribute_nodes(group, modification.attribute):
+                    nodes[id(node)] = node
+                    transforms[id(node)] = transforms.get(id(node), _IDENTITY).then(modification.operation)
+        by_transform: Dict[AffineTransform, List[AttributeNode]] = {}
+        for key, node in nodes.items():
+            by_transform.setdefault(transforms[key], []).append(node)
+        for transform, targets in by_transform.items():
+            if self.batched:
+                self._update_batch(targets, transform)
+                continue
+            for node in targets:
+                self._update_table(node, transform)
+        return modified_groups
+
+    def _update_table(self, node: AttributeNode, update: Union[PatchOperation, AffineTransform]) -> None:
+        array_format = extract_array_format(node.raw_tokens)
+        matrix = self._parse_matrix(node.raw_tokens)
+        updated = update.apply(matrix)
+        node.raw_tokens = _matrix_to_tokens(updated, _array_uses_quotes(node.raw_tokens), array_format, self.floats)
+        node.mark_dirty()
+        self._tables += 1
+        self._values += updated.size if hasattr(updated, "size") else sum(len(row) for row in updated)
+
+    def _update_batch(self, nodes: List[AttributeNode], update: Union[PatchOperation, AffineTransform]) -> None:
+        batch = TableBatch([node.raw_tokens for node in nodes], self.matrix_backend)
+        update.apply_to_batch(batch)
+        for node, rows, array_format, quoted in zip(nodes, batch.tables(), batch.formats, batch.quoted):
+            node.raw_tokens = _matrix_to_tokens(rows, quoted, array_format, self.floats)
+            node.mark_dirty()
+        self._tables += len(nodes)
+        self._values += len(batch.values)
+
+    def _parse_matrix(self, tokens: Iterable[Token]) -> Matrix:
+        if self.matrix_backend == "list":
+            return parse_array_tokens(tokens)
+        try:
+            return parse_array_tokens(tokens, self.matrix_backend)
+        except MatrixShapeError:
+            # Ragged tables have no array shape; patch them row by row.
+            return parse_array_tokens(tokens)
 
 
 def _matrix_to_tokens(
-    matrix: Iterable[Iterable[float]],
+    matrix: Matrix,
     quoted: bool,
     array_format: Optional[ArrayFormat] = None,
+    floats: FloatRenderer = _DEFAULT_FLOATS,
 ) -> List[Token]:
     tokens: List[Token] = []
-    matrix_list = [list(row) for row in matrix]
+    matrix_list = matrix.tolist() if hasattr(matrix, "tolist") else [list(row) for row in matrix]
     has_escaped_newline = array_format.has_escaped_newline if array_format else False
     layout = array_format.layout if array_format else None
     for row_index, row in enumerate(matrix_list):
@@ -134,16 +303,15 @@ def _matrix_to_tokens(
             if row_layout and sum(row_layout) == len(row):
                 position = 0
                 for count in row_layout:
-                    segment_values = ",".join(format(value, "g") for value in row[position : position + count])
+                    segment_values = floats.join(row[position : position + count], ",")
                     tokens.append(Token(TokenType.STRING, segment_values, 0, 0))
                     position += count
             else:
-                row_values = ",".join(format(value, "g") for value in row)
-                tokens.append(Token(TokenType.STRING, row_values, 0, 0))
+                tokens.append(Token(TokenType.STRING, floats.join(row, ","), 0, 0))
         else:
             last_index = len(row) - 1
-            for value_index, value in enumerate(row):
-                tokens.append(Token(TokenType.IDENTIFIER, format(value, "g"), 0, 0))
+            for value_index, text in enumerate(floats.split(row)):
+                tokens.append(Token(TokenType.IDENTIFIER, text, 0, 0))
                 if value_index < last_index:
                     tokens.append(Token(TokenType.COMMA, ",", 0, 0))
         if row_index < len(matrix_list) - 1 or has_escaped_newline:
@@ -157,6 +325,67 @@ def _array_uses_quotes(tokens: Iterable[Token]) -> bool:
     return any(token.type == TokenType.STRING for token in tokens)
 
 
+def _rounds(groups: List[GroupNode], attribute: str) -> List[List[Tuple[GroupNode, AttributeNode]]]:
+    """Matched ``(parent, attribute)`` pairs, with each repeat of a node in a later round."""
+    rounds: List[List[Tuple[GroupNode, AttributeNode]]] = []
+    matches: Dict[int, int] = {}
+    for group in groups:
+        for parent, node in _iter_attribute_nodes(group, attribute):
+            repeat = matches.get(id(node), 0)
+            matches[id(node)] = repeat + 1
+            if repeat == len(rounds):
+                rounds.append([])
+            rounds[repeat].append((parent, node))
+    return rounds
+
+
+def _table_templates(root: RootNode) -> Dict[str, Dict[str, List[Token]]]:
+    """Index tokens of every library-level ``*_template`` group, by template name."""
+    templates: Dict[str, Dict[str, List[Token]]] = {}
+    for library in root.children:
+        if not isinstance(library, GroupNode):
+            continue
+        for group in library.children:
+            if isinstance(group, GroupNode) and group.name.endswith("_template") and group.args_tokens:
+                templates[group.args_tokens[0].value] = _index_tokens(group)
+    return templates
+
+
+def _table_grid(
+    table: GroupNode,
+    templates: Dict[str, Dict[str, List[Token]]],
+    parsed: Dict[Tuple[str, ...], Tuple[float, ...]],
+) -> TableGrid:
+    """The table's own ``index_1``/``index_2``, falling back to its template's.
+
+    ``parsed`` caches index values by token text, since most tables repeat a few grids.
+    """
+    indices = dict(templates.get(table.args_tokens[0].value, {})) if table.args_tokens else {}
+    indices.update(_index_tokens(table))
+    if "index_1" not in indices:
+        raise PatchActionError(f"Table {table.name} has no index_1 of its own or from a template.")
+    index_2 = indices.get("index_2")
+    index_1 = _index_values(indices["index_1"], parsed)
+    return index_1, None if index_2 is None else _index_values(index_2, parsed)
+
+
+def _index_tokens(group: GroupNode) -> Dict[str, List[Token]]:
+    return {
+        child.key: child.raw_tokens
+        for child in group.children
+        if isinstance(child, AttributeNode) and child.key in ("index_1", "index_2")
+    }
+
+
+def _index_values(tokens: List[Token], parsed: Dict[Tuple[str, ...], Tuple[float, ...]]) -> Tuple[float, ...]:
+    pairs = tokens.type_values() if isinstance(tokens, TokenSlice) else ((token.type, token.value) for token in tokens)
+    key = tuple(value for _, value in pairs)
+    values = parsed.get(key)
+    if values is None:
+        values = parsed[key] = tuple(value for row in parse_array_tokens(tokens) for value in row)
+    return values
+
+
 def _iter_attribute_nodes(group: GroupNode, key: str) -> Iterable[tuple[GroupNode, AttributeNode]]:
     stack = [group]
     while stack:
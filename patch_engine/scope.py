@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-from fnmatch import fnmatch
+from dataclasses import dataclass
+from fnmatch import translate
 import re
-from typing import Iterable, List, Sequence, Union
+from typing import Iterable, List, Optional, Pattern, Sequence, Tuple, Union
 
 from liberty_core.cst import AttributeNode, GroupNode, RootNode, Token, TokenType
 
@@ -32,90 +33,109 @@ def find_groups_by_name(root: GroupNode, group_name: str) -> List[GroupNode]:
 
 
 def find_nodes_by_scope(root: RootNode, scope: dict, *, require_match: bool = False) -> List[GroupNode]:
-    path = scope.get("path", [])
-    if not path:
-        if require_match:
-            raise ScopeMatchError([], "Scope path is empty.")
-        return []
-    current: List[Union[RootNode, GroupNode]] = [root]
-    for index, selector in enumerate(path):
-        current = _select_child_groups(current, selector)
-        if not current:
-            if require_match:
-                raise ScopeMatchError(path[: index + 1], _describe_selector_failure(selector))
-            return []
-    return [node for node in current if isinstance(node, GroupNode)]
+    return ScopeMatcher.compile(scope).find(root, require_match=require_match)
 
 
 def group_has_attribute(group: GroupNode, key: str, value_pattern: Union[str, List[str]]) -> bool:
-    for child in group.children:
-        if isinstance(child, AttributeNode) and child.key == key:
-            value = _tokens_to_value(child.raw_tokens)
-            if _match_pattern(value, value_pattern):
-                return True
-    return False
+    return _has_attribute(group, key, PatternMatcher.compile(value_pattern))
+
+
+@dataclass(frozen=True)
+class PatternMatcher:
+    """A scope pattern compiled once: a glob for strings, any-of regex search for lists."""
+
+    regexes: Tuple[Pattern[str], ...]
+    search: bool
+
+    @classmethod
+    def compile(cls, pattern: Union[str, List[str]]) -> "PatternMatcher":
+        if isinstance(pattern, list):
+            return cls(tuple(re.compile(item) for item in pattern), search=True)
+        return cls((re.compile(translate(pattern)),), search=False)
+
+    def __call__(self, value: str) -> bool:
+        if self.search:
+            return any(regex.search(value) for regex in self.regexes)
+        return self.regexes[0].match(value) is not None
+
+
+@dataclass(frozen=True)
+class SelectorMatcher:
+    selector: dict
+    group: Optional[PatternMatcher] = None
+    name: Optional[PatternMatcher] = None
+    args: Optional[PatternMatcher] = None
+    attributes: Tuple[Tuple[str, PatternMatcher], ...] = ()
+
+    @classmethod
+    def compile(cls, selector: dict) -> "SelectorMatcher":
+        group, name, args = (selector.get(field) for field in ("group", "name", "args"))
+        attributes = selector.get("attributes") or {}
+        return cls(
+            selector=selector,
+            group=PatternMatcher.compile(group) if group else None,
+            name=PatternMatcher.compile(name) if name else None,
+            args=PatternMatcher.compile(args) if args else None,
+            attributes=tuple((key, PatternMatcher.compile(value)) for key, value in attributes.items()),
+        )
+
+    def matches(self, node: GroupNode) -> bool:
+        if self.group is not None and not self.group(node.name):
+            return False
+        if self.name is not None and not (node.args_tokens and self.name(node.args_tokens[0].value)):
+            return False
+        if self.args is not None and not (node.args_tokens and self.args(_tokens_to_value(node.args_tokens))):
+            return False
+        return all(_has_attribute(node, key, matcher) for key, matcher in self.attributes)
+
+
+@dataclass(frozen=True)
+class ScopeMatcher:
+    """A scope's selector path, compiled once and reusable across libraries."""
+
+    path: Tuple[SelectorMatcher, ...]
+
+    @classmethod
+    def compile(cls, scope: dict) -> "ScopeMatcher":
+        return cls(tuple(SelectorMatcher.compile(selector) for selector in scope.get("path", [])))
+
+    def describe(self) -> str:
+        return " -> ".join(_format_selector(matcher.selector) for matcher in self.path)
+
+    def find(self, root: RootNode, *, require_match: bool = False) -> List[GroupNode]:
+        if not self.path:
+            if require_match:
+                raise ScopeMatchError([], "Scope path is empty.")
+            return []
+        current: List[Union[RootNode, GroupNode]] = [root]
+        for index, selector in enumerate(self.path):
+            current = _select_child_groups(current, selector)
+            if not current:
+                if require_match:
+                    selectors = [matcher.selector for matcher in self.path[: index + 1]]
+                    raise ScopeMatchError(selectors, _describe_selector_failure(selector.selector))
+                return []
+        return [node for node in current if isinstance(node, GroupNode)]
 
 
 def _select_child_groups(
     nodes: Sequence[Union[RootNode, GroupNode]],
-    selector: dict,
+    selector: SelectorMatcher,
 ) -> List[GroupNode]:
     matched: List[GroupNode] = []
     for node in nodes:
-        children = _iter_child_groups(node)
-        for child in children:
-            if _matches_selector(child, selector):
+        for child in node.children:
+            if isinstance(child, GroupNode) and selector.matches(child):
                 matched.append(child)
     return matched
 
 
-def _matches_selector(node: GroupNode, selector: dict) -> bool:
-    group_pattern = selector.get("group")
-    if group_pattern and not _match_pattern(node.name, group_pattern):
-        return False
-    name_pattern = selector.get("name")
-    if name_pattern and not _group_name_match(node, name_pattern):
-        return False
-    args_pattern = selector.get("args")
-    if args_pattern and not _group_args_match(node, args_pattern):
-        return False
-    attributes = selector.get("attributes")
-    if attributes and not _matches_attributes(node, attributes):
-        return False
-    return True
-
-
-def _group_name_match(node: GroupNode, pattern: Union[str, List[str]]) -> bool:
-    if not node.args_tokens:
-        return False
-    return _match_pattern(node.args_tokens[0].value, pattern)
-
-
-def _group_args_match(node: GroupNode, patterns: Union[str, List[str]]) -> bool:
-    if not node.args_tokens:
-        return False
-    value = _tokens_to_value(node.args_tokens)
-    return _match_pattern(value, patterns)
-
-
-def _matches_attributes(group: GroupNode, filters: dict) -> bool:
-    for key, value in filters.items():
-        if not group_has_attribute(group, key, value):
-            return False
-    return True
-
-
-def _iter_child_groups(node: Union[RootNode, GroupNode]) -> List[GroupNode]:
-    if isinstance(node, RootNode):
-        return [child for child in node.children if isinstance(child, GroupNode)]
-    return [child for child in node.children if isinstance(child, GroupNode)]
-
-
-def _match_pattern(value: str, pattern: Union[str, List[str]]) -> bool:
-    """Match values with fnmatch for single patterns or regex for lists."""
-    if isinstance(pattern, list):
-        return any(re.search(item, value) for item in pattern)
-    return fnmatch(value, pattern)
+def _has_attribute(group: GroupNode, key: str, matcher: PatternMatcher) -> bool:
+    for child in group.children:
+        if isinstance(child, AttributeNode) and child.key == key:
+            if matcher(_tokens_to_value(child.raw_tokens)):
+                return True
+    return False
 
 
 def _describe_selector_failure(selector: dict) -> str:
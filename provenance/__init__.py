@@ -1,3 +1,3 @@
-from .db import ArtifactRecord, BatchOp, ProvenanceDB
+from .db import ArtifactRecord, BatchOp, ProvenanceDB, ThroughputRecord, read_recent_throughput
 
-__all__ = ["ArtifactRecord", "BatchOp", "ProvenanceDB"]
+__all__ = ["ArtifactRecord", "BatchOp", "ProvenanceDB", "ThroughputRecord", "read_recent_throughput"]
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import json
 import sqlite3
+from contextlib import closing
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Iterable, Optional
+from pathlib import Path
+from typing import Iterable, List, Optional
 
 
 @dataclass
@@ -24,6 +26,24 @@ class ArtifactRecord:
     status: str
 
 
+@dataclass
+class ThroughputRecord:
+    """Time spent on each step of one patched file, for estimating future runs."""
+
+    batch_id: str
+    input_bytes: int
+    values: int
+    parse_seconds: float
+    patch_seconds: float
+    write_seconds: float
+
+
+_RECENT_THROUGHPUT_SQL = """
+    SELECT batch_id, input_bytes, "values", parse_seconds, patch_seconds, write_seconds
+    FROM throughput ORDER BY id DESC LIMIT ?
+"""
+
+
 class ProvenanceDB:
     def __init__(self, db_path: str) -> None:
         self.db_path = db_path
@@ -55,6 +75,19 @@ class ProvenanceDB:
                 );
                 """
             )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS throughput (
+                    id INTEGER PRIMARY KEY,
+                    batch_id TEXT,
+                    input_bytes INTEGER,
+                    "values" INTEGER,
+                    parse_seconds REAL,
+                    patch_seconds REAL,
+                    write_seconds REAL
+                );
+                """
+            )
 
     def log_batch(self, batch: BatchOp, timestamp: Optional[datetime] = None) -> None:
         timestamp = timestamp or datetime.utcnow()
@@ -91,3 +124,44 @@ class ProvenanceDB:
                     for artifact in artifacts
                 ],
             )
+
+    def log_throughput(self, records: Iterable[ThroughputRecord]) -> None:
+        with sqlite3.connect(self.db_path) as conn:
+            conn.executemany(
+                """
+                INSERT INTO throughput (batch_id, input_bytes, "values", parse_seconds, patch_seconds, write_seconds)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        record.batch_id,
+                        record.input_bytes,
+                        record.values,
+                        record.parse_seconds,
+                        record.patch_seconds,
+                        record.write_seconds,
+                    )
+                    for record in records
+                ],
+            )
+
+    def recent_throughput(self, limit: int = 20) -> List[ThroughputRecord]:
+        """The ``limit`` most recently logged records, newest first."""
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(_RECENT_THROUGHPUT_SQL, (limit,)).fetchall()
+        return [ThroughputRecord(*row) for row in rows]
+
+
+def read_recent_throughput(db_path: str, limit: int = 20) -> List[ThroughputRecord]:
+    """``ProvenanceDB.recent_throughput`` over a read-only connection.
+
+    The DB is never created or altered; a missing DB or ``throughput`` table
+    reads as no records.
+    """
+    uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+    try:
+        with closing(sqlite3.connect(uri, uri=True)) as conn:
+            rows = conn.execute(_RECENT_THROUGHPUT_SQL, (limit,)).fetchall()
+    except sqlite3.OperationalError:
+        return []
+    return [ThroughputRecord(*row) for row in rows]
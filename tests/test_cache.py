@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from liberty_core import ParseCache, Parser, serialize_parse_result
+
+EXAMPLE_PATH = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
+TEXT = 'library(foo) {\n  time_unit : "1ns";\n  cell(A) {\n    area : 1;\n  }\n}\n'
+
+
+class TestParseCache(unittest.TestCase):
+    def test_round_trips_memory_mapped_compact_parse(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(tmpdir)
+            result = Parser(compact=True).parse_file(str(EXAMPLE_PATH))
+            cache.store("digest", result)
+            loaded = cache.load("digest")
+        self.assertEqual(serialize_parse_result(loaded), serialize_parse_result(result))
+        library = loaded.root.children[-1]
+        self.assertIs(library.children[0].parent, library)
+
+    def test_missing_and_corrupt_entries_are_misses(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(tmpdir)
+            self.assertIsNone(cache.load("digest"))
+            cache.path_for("digest").write_bytes(b"not a pickle")
+            self.assertIsNone(cache.load("digest"))
+            self.assertFalse(cache.path_for("digest").exists())
+
+    def test_evicts_least_recently_used_entries(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = ParseCache(tmpdir)
+            result = Parser().parse(TEXT)
+            cache.store("old", result)
+            cache.store("new", result)
+            entry_size = cache.path_for("old").stat().st_size
+            os.utime(cache.path_for("old"), (1, 1))
+            os.utime(cache.path_for("new"), (2, 2))
+            self.assertIsNotNone(cache.load("old"))
+            cache.max_bytes = 2 * entry_size
+            cache.store("newest", result)
+            self.assertTrue(cache.path_for("newest").exists())
+            self.assertTrue(cache.path_for("old").exists())
+            self.assertFalse(cache.path_for("new").exists())
+
+    def test_key_includes_cache_version(self) -> None:
+        cache = ParseCache("unused")
+        self.assertNotEqual(cache.path_for("digest").stem, "digest")
+
+    def test_key_includes_tree_shaping_parser_options(self) -> None:
+        cache = ParseCache("unused")
+        paths = {
+            cache.path_for("digest", parser)
+            for parser in (Parser(compact=True), Parser(compact=True, jobs=2), Parser(defer_tables=True))
+        }
+        self.assertEqual(len(paths), 3)
+        self.assertEqual(cache.path_for("digest", Parser(jobs=2)), cache.path_for("digest", Parser(jobs=4)))
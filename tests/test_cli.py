@@ -1,6 +1,11 @@
+import argparse
+import json
+import sqlite3
 import tempfile
 import unittest
+from contextlib import closing
 from pathlib import Path
+from unittest import mock
 
 import cli
 import config_compiler
@@ -29,3 +34,291 @@ modifications:
         selector = config["modifications"][0]["scope"]["path"][1]
         self.assertEqual(selector["group"], "cell")
         self.assertEqual(selector["name"], "AND*")
+
+
+class TestCliParseCache(unittest.TestCase):
+    def test_second_format_run_loads_cached_parse(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "input.lib"
+            input_path.write_text("library(foo) {\n  cell(A) {\n    area : 1.50;\n  }\n}\n", encoding="utf-8")
+            args = argparse.Namespace(
+                input=str(input_path),
+                output=str(Path(tmpdir) / "first.lib"),
+                indent_size=2,
+                dump_parse=None,
+                jobs=1,
+                significant_digits=None,
+                parse_cache=str(Path(tmpdir) / "cache"),
+            )
+            cli._handle_format(args)
+            args.output = str(Path(tmpdir) / "second.lib")
+            with mock.patch.object(cli.Parser, "parse_file", side_effect=AssertionError("parsed again")):
+                cli._handle_format(args)
+            first = (Path(tmpdir) / "first.lib").read_text(encoding="utf-8")
+            self.assertEqual((Path(tmpdir) / "second.lib").read_text(encoding="utf-8"), first)
+
+    def test_warm_cache_does_not_change_patch_output(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            text = "library(foo) {\n  capacitive_load_unit (1,ff);\n" + "".join(
+                f"  cell(C{index}) {{\n    values ({index}, 2);\n  }}\n" for index in range(4)
+            ) + "}\n"
+            (root / "input.lib").write_text(text, encoding="utf-8")
+            config = {
+                "modifications": [
+                    {
+                        "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "C1"}]},
+                        "action": {"operation": "multiply", "mode": "broadcast", "value": 2},
+                    }
+                ]
+            }
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            parser = cli._build_parser()
+            common = ["patch", "--input", str(root / "input.lib"), "--config", str(root / "patch.json"), "--db", ""]
+            cached = [*common, "--parse-cache", str(root / "cache")]
+            cli._handle_patch(parser.parse_args([*common, "--no-parse-cache", "--output", str(root / "cold.lib")]))
+            cli._handle_patch(parser.parse_args([*cached, "--jobs", "2", "--output", str(root / "parallel.lib")]))
+            cli._handle_patch(parser.parse_args([*cached, "--jobs", "1", "--output", str(root / "serial.lib")]))
+            with mock.patch.object(cli.Parser, "parse_file", side_effect=AssertionError("parsed again")):
+                cli._handle_patch(parser.parse_args([*cached, "--jobs", "1", "--output", str(root / "warm.lib")]))
+            cold = (root / "cold.lib").read_text(encoding="utf-8")
+            self.assertIn("  capacitive_load_unit (1,ff);\n  cell(C0) {\n", cold)
+            for name in ("parallel.lib", "serial.lib", "warm.lib"):
+                self.assertEqual((root / name).read_text(encoding="utf-8"), cold, name)
+
+    def test_format_without_cache_does_not_hash_input(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            input_path = Path(tmpdir) / "input.lib"
+            input_path.write_text("library(foo) {\n  area : 1;\n}\n", encoding="utf-8")
+            args = ["format", "--input", str(input_path), "--output", str(Path(tmpdir) / "out.lib")]
+            with mock.patch.object(cli, "_hash_file", side_effect=AssertionError("hashed")):
+                cli._handle_format(cli._build_parser().parse_args([*args, "--no-parse-cache"]))
+            output = (Path(tmpdir) / "out.lib").read_text(encoding="utf-8")
+            self.assertEqual(output, "library (foo) {\n  area : 1;\n}\n")
+
+    def test_no_parse_cache_flag_disables_cache(self) -> None:
+        args = cli._build_parser().parse_args(["format", "--input", "a", "--output", "b", "--no-parse-cache"])
+        self.assertIsNone(args.parse_cache)
+
+
+class TestCliFloatFormat(unittest.TestCase):
+    def test_significant_digits_flag_sets_float_format(self) -> None:
+        parser = cli._build_parser()
+        args = parser.parse_args(["patch", "--input", "a", "--config", "c", "--output", "b", "--significant-digits", "9"])
+        self.assertEqual(cli._float_format(args), ".9g")
+        args = parser.parse_args(["format", "--input", "a", "--output", "b"])
+        self.assertEqual(cli._float_format(args), "g")
+
+    def test_significant_digits_below_one_are_rejected(self) -> None:
+        parser = cli._build_parser()
+        for digits in ("0", "-2", "six"):
+            with self.subTest(digits=digits), mock.patch("sys.stderr") as stderr:
+                with self.assertRaises(SystemExit):
+                    parser.parse_args(["format", "--input", "a", "--output", "b", "--significant-digits", digits])
+                message = "".join(call.args[0] for call in stderr.write.call_args_list)
+                self.assertIn("--significant-digits", message)
+
+
+class TestCliDiffOutput(unittest.TestCase):
+    def test_apply_diff_rebuilds_patched_library(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "input.lib").write_text(
+                'library (foo) {\n  cell (A) {\n    values (1, 2);\n  }\n  cell (B) {\n    area : 2;\n  }\n}\n',
+                encoding="utf-8",
+            )
+            config = {
+                "modifications": [
+                    {
+                        "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                        "action": {"operation": "multiply", "mode": "broadcast", "value": 2},
+                    }
+                ]
+            }
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            common = ["--input", str(root / "input.lib"), "--config", str(root / "patch.json"), "--db", ""]
+            common += ["--no-parse-cache"]
+            parser = cli._build_parser()
+            cli._handle_patch(parser.parse_args(["patch", *common, "--output", str(root / "full.lib")]))
+            cli._handle_patch(parser.parse_args(["patch", *common, "--output", str(root / "d.json"), "--emit", "diff"]))
+            diff = json.loads((root / "d.json").read_text(encoding="utf-8"))
+            self.assertEqual([edit["path"][-1] for edit in diff["edits"]], ["values"])
+            args = ["apply-diff", "--input", str(root / "input.lib"), "--diff", str(root / "d.json")]
+            cli._handle_apply_diff(parser.parse_args([*args, "--output", str(root / "rebuilt.lib")]))
+            full = (root / "full.lib").read_text(encoding="utf-8")
+            self.assertIn("values (2, 4);", full)
+            self.assertEqual((root / "rebuilt.lib").read_text(encoding="utf-8"), full)
+
+
+class TestCliOverwriteInput(unittest.TestCase):
+    def test_format_and_patch_can_write_over_their_input(self) -> None:
+        example = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            path = root / "x.lib"
+            path.write_bytes(example.read_bytes())
+            expected = root / "expected.lib"
+            parser = cli._build_parser()
+            common = ["--input", str(path), "--no-parse-cache"]
+            cli._handle_format(parser.parse_args(["format", *common, "--output", str(expected)]))
+            cli._handle_format(parser.parse_args(["format", *common, "--output", str(path)]))
+            self.assertEqual(path.read_bytes(), expected.read_bytes())
+
+            scope = {"path": [{"group": "library"}, {"group": "cell", "name": "AND2*"}]}
+            config = {"modifications": [{"scope": scope, "action": {"operation": "add", "value": 1}}]}
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            common += ["--config", str(root / "patch.json"), "--db", ""]
+            cli._handle_patch(parser.parse_args(["patch", *common, "--output", str(expected)]))
+            cli._handle_patch(parser.parse_args(["patch", *common, "--output", str(path)]))
+            self.assertEqual(path.read_bytes(), expected.read_bytes())
+            self.assertEqual(sorted(child.name for child in root.iterdir()), ["expected.lib", "patch.json", "x.lib"])
+
+
+class TestCliParallelJobs(unittest.TestCase):
+    def test_patch_output_is_the_same_for_any_job_count(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            config = {
+                "modifications": [
+                    {
+                        "scope": {
+                            "path": [
+                                {"group": "library"},
+                                {"group": "cell", "name": "AND2*"},
+                                {"group": "pin", "name": "*"},
+                                {"group": "timing"},
+                            ]
+                        },
+                        "action": {"operation": "multiply", "mode": "broadcast", "value": 1.1},
+                    }
+                ]
+            }
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            parser = cli._build_parser()
+            common = ["patch", "--input", "examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib"]
+            common += ["--config", str(root / "patch.json"), "--db", "", "--no-parse-cache"]
+            outputs = {}
+            for label, flags in (("serial", ["--jobs", "1"]), ("parallel", ["--jobs", "2"]), ("lazy", ["--lazy"])):
+                output = root / f"{label}.lib"
+                cli._handle_patch(parser.parse_args([*common, *flags, "--output", str(output)]))
+                outputs[label] = output.read_bytes()
+            self.assertEqual(outputs["parallel"], outputs["serial"])
+            self.assertEqual(outputs["lazy"], outputs["serial"])
+
+
+class TestCliBatchPatch(unittest.TestCase):
+    def test_inputs_glob_patches_every_corner_in_one_batch(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "corners").mkdir()
+            for corner, value in (("ss", 1), ("tt", 2), ("ff", 3)):
+                (root / "corners" / f"lib_{corner}.lib").write_text(
+                    f"library (lib_{corner}) {{\n  cell (A) {{\n    values ({value}, {value});\n  }}\n}}\n",
+                    encoding="utf-8",
+                )
+            config = {
+                "modifications": [
+                    {
+                        "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                        "action": {"operation": "multiply", "mode": "broadcast", "value": 2},
+                    }
+                ]
+            }
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            parser = cli._build_parser()
+            common = ["patch", "--inputs", str(root / "corners" / "*.lib"), "--config", str(root / "patch.json")]
+            common += ["--no-parse-cache", "--db", str(root / "prov.db")]
+            outputs = []
+            for jobs in ("1", "2"):
+                output_dir = root / f"out{jobs}"
+                args = parser.parse_args([*common, "--output-dir", str(output_dir), "--jobs", jobs])
+                with mock.patch("builtins.print") as printed:
+                    self.assertEqual(cli._handle_patch(args), 0)
+                self.assertIn("3 files", printed.call_args_list[-1].args[0])
+                outputs.append({path.name: path.read_text(encoding="utf-8") for path in output_dir.iterdir()})
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(sorted(outputs[0]), ["lib_ff.lib", "lib_ss.lib", "lib_tt.lib"])
+            self.assertIn("values (6, 6);", outputs[0]["lib_ff.lib"])
+            with sqlite3.connect(root / "prov.db") as conn:
+                batches = conn.execute("SELECT batch_id, COUNT(*) FROM artifacts GROUP BY batch_id").fetchall()
+            self.assertEqual([count for _, count in batches], [3, 3])
+
+    def test_output_dir_can_be_the_input_directory(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for corner, value in (("ss", 1), ("tt", 2), ("ff", 3)):
+                (root / f"lib_{corner}.lib").write_text(
+                    f"library (lib_{corner}) {{\n  cell (A) {{\n    values ({value}, {value});\n  }}\n}}\n",
+                    encoding="utf-8",
+                )
+            scope = {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]}
+            config = {"modifications": [{"scope": scope, "action": {"operation": "multiply", "value": 2}}]}
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            for jobs in ("1", "2"):
+                args = ["patch", "--inputs", str(root / "*.lib"), "--config", str(root / "patch.json")]
+                args += ["--no-parse-cache", "--db", "", "--output-dir", str(root), "--jobs", jobs]
+                with mock.patch("builtins.print"):
+                    self.assertEqual(cli._handle_patch(cli._build_parser().parse_args(args)), 0)
+            self.assertIn("values (12, 12);", (root / "lib_ff.lib").read_text(encoding="utf-8"))
+            self.assertIn("values (4, 4);", (root / "lib_ss.lib").read_text(encoding="utf-8"))
+            names = sorted(path.name for path in root.iterdir())
+            self.assertEqual(names, ["lib_ff.lib", "lib_ss.lib", "lib_tt.lib", "patch.json"])
+
+    def test_inputs_requires_output_dir(self) -> None:
+        argv = ["cli.py", "patch", "--inputs", "*.lib", "--config", "c", "--output", "b"]
+        with mock.patch("sys.argv", argv), mock.patch("sys.stderr"):
+            with self.assertRaises(SystemExit):
+                cli.main()
+
+
+class TestCliDryRun(unittest.TestCase):
+    def test_dry_run_reports_targets_and_estimates_from_recorded_runs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "input.lib").write_text(
+                'library (foo) {\n  cell (A) {\n    values (1, 2);\n  }\n}\n', encoding="utf-8"
+            )
+            config = {
+                "modifications": [
+                    {
+                        "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                        "action": {"operation": "multiply", "mode": "broadcast", "value": 2},
+                    }
+                ]
+            }
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            common = ["patch", "--input", str(root / "input.lib"), "--config", str(root / "patch.json")]
+            common += ["--db", str(root / "prov.db"), "--no-parse-cache"]
+            parser = cli._build_parser()
+            dry_run = parser.parse_args([*common, "--dry-run"])
+            with mock.patch("builtins.print") as printed:
+                cli._handle_patch(dry_run)
+            lines = [call.args[0] for call in printed.call_args_list]
+            self.assertIn("1 groups, 1 tables, 2 values", lines[1])
+            self.assertIn("unknown", lines[-1])
+            self.assertEqual(sorted(path.name for path in root.iterdir()), ["input.lib", "patch.json"])
+
+            cli._handle_patch(parser.parse_args([*common, "--output", str(root / "out.lib")]))
+            with mock.patch("builtins.print") as printed:
+                cli._handle_patch(dry_run)
+            self.assertRegex(printed.call_args_list[-1].args[0], r"estimated time: [0-9.]+s \(from 1 recorded runs\)")
+
+    def test_dry_run_does_not_alter_an_existing_db(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            (root / "input.lib").write_text(
+                'library (foo) {\n  cell (A) {\n    values (1, 2);\n  }\n}\n', encoding="utf-8"
+            )
+            scope = {"path": [{"group": "library"}, {"group": "cell"}]}
+            config = {"modifications": [{"scope": scope, "action": {"operation": "add", "value": 1}}]}
+            (root / "patch.json").write_text(json.dumps(config), encoding="utf-8")
+            db_path = root / "other.db"
+            with closing(sqlite3.connect(db_path)) as conn, conn:
+                conn.execute("CREATE TABLE notes (text TEXT)")
+            before = db_path.read_bytes()
+            args = ["patch", "--input", str(root / "input.lib"), "--config", str(root / "patch.json")]
+            args += ["--db", str(db_path), "--dry-run"]
+            with mock.patch("builtins.print") as printed:
+                cli._handle_patch(cli._build_parser().parse_args(args))
+            self.assertIn("unknown", printed.call_args_list[-1].args[0])
+            self.assertEqual(db_path.read_bytes(), before)
@@ -0,0 +1,44 @@
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from liberty_core import CompressionError, Formatter, Parser, compressed, open_binary, read_decompressed
+
+TEXT = "library(foo) {\n  cell(A) {\n    area : 1.50;\n  }\n}\n"
+
+
+class TestCompressedIO(unittest.TestCase):
+    def test_round_trip_by_suffix(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for suffix in (".lib", ".lib.gz", ".lib.bz2", ".lib.xz"):
+                with self.subTest(suffix=suffix):
+                    path = str(Path(tmpdir) / f"out{suffix}")
+                    with open_binary(path, "wb") as handle:
+                        handle.write(TEXT.encode("utf-8"))
+                    self.assertEqual(read_decompressed(path), TEXT.encode("utf-8"))
+                    self.assertEqual(Path(path).read_bytes() == TEXT.encode("utf-8"), suffix == ".lib")
+
+    def test_gzip_output_is_reproducible(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "out.lib.gz"
+            outputs = []
+            for _ in range(2):
+                with open_binary(str(path), "wb") as handle:
+                    handle.write(TEXT.encode("utf-8"))
+                outputs.append(path.read_bytes())
+            self.assertEqual(outputs[0], outputs[1])
+
+    def test_parse_file_reads_compressed_input(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "input.lib.gz"
+            path.write_bytes(gzip.compress(TEXT.encode("utf-8")))
+            for parser in (Parser(), Parser(compact=True), Parser(compact=True, lazy=True)):
+                root = parser.parse_file(str(path)).root
+                self.assertEqual(Formatter().dump(root), Formatter().dump(Parser().parse(TEXT).root))
+
+    def test_zst_without_stdlib_support(self) -> None:
+        with mock.patch.object(compressed, "zstd", None):
+            with self.assertRaises(CompressionError):
+                open_binary("library.lib.zst")
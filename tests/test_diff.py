@@ -0,0 +1,71 @@
+import io
+import unittest
+
+from liberty_core import DiffError, Formatter, Parser, SourceDiff, apply_diff, diff_modified
+from liberty_core.cst import Token, TokenType
+
+TEXT = (
+    "library (foo) {\n"
+    "  cell (A) {\n"
+    "    area : 1.5;\n"
+    "    pin (Y) {\n"
+    '      values ("1, 2", "3, 4");\n'
+    "    }\n"
+    "  }\n"
+    "  cell (B) {\n"
+    "    area : 2;\n"
+    "  }\n"
+    "}\n"
+)
+
+
+def _patched_root():
+    root = Parser(compact=True).parse(TEXT).root
+    cell_a = root.children[0].children[0]
+    values = cell_a.children[1].children[0]
+    values.raw_tokens = [
+        Token(TokenType.STRING, "5, 6", 0, 0),
+        Token(TokenType.ESCAPED_NEWLINE, "\\\n", 0, 0),
+        Token(TokenType.STRING, "7, 8", 0, 0),
+    ]
+    values.mark_dirty()
+    area = cell_a.children[0]
+    area.raw_tokens = [Token(TokenType.IDENTIFIER, "9", 0, 0)]
+    area.mark_dirty()
+    return root
+
+
+class TestSourceDiff(unittest.TestCase):
+    def test_diff_lists_only_modified_attributes(self) -> None:
+        diff = diff_modified(_patched_root(), Formatter(passthrough=True), "abc")
+        self.assertEqual([edit.path for edit in diff.edits], [
+            ["library(foo)", "cell(A)", "area"],
+            ["library(foo)", "cell(A)", "pin(Y)", "values"],
+        ])
+        self.assertEqual(diff.edits[0].old, "area : 1.5;")
+        self.assertEqual(diff.edits[0].new, "area : 9;")
+        self.assertEqual(diff.edits[1].new, 'values ( \\\n        "5, 6", \\\n        "7, 8" \\\n      );')
+
+    def test_apply_diff_reproduces_patched_output(self) -> None:
+        root = _patched_root()
+        formatter = Formatter(passthrough=True)
+        diff = SourceDiff.load(io.StringIO(_dump(diff_modified(root, formatter, "abc"))))
+        output = io.StringIO()
+        apply_diff(diff, TEXT, output)
+        self.assertEqual(output.getvalue(), formatter.dump(root))
+
+    def test_apply_diff_rejects_changed_input(self) -> None:
+        diff = diff_modified(_patched_root(), Formatter(passthrough=True), "abc")
+        with self.assertRaises(DiffError):
+            apply_diff(diff, TEXT.replace("1.5", "2.5"), io.StringIO())
+
+    def test_diff_needs_compact_parse(self) -> None:
+        root = Parser().parse(TEXT).root
+        with self.assertRaises(DiffError):
+            diff_modified(root, Formatter(passthrough=True), "abc")
+
+
+def _dump(diff: SourceDiff) -> str:
+    handle = io.StringIO()
+    diff.dump(handle)
+    return handle.getvalue()
@@ -4,7 +4,7 @@ import unittest
 from pathlib import Path
 from typing import Iterable, List, Optional
 
-from liberty_core import Formatter, Parser
+from liberty_core import Formatter, Parser, serialize_parse_result
 from liberty_core.cst import AttributeNode, GroupNode, RootNode
 from patch_engine import PatchRunner, find_nodes_by_scope, parse_array_tokens
 from provenance import ProvenanceDB
@@ -105,6 +105,96 @@ class TestPatchRunnerE2E(unittest.TestCase):
         self.assertIsNotNone(after_matrix)
         _assert_offset_matrix(self, before_matrix, after_matrix, 0.01)
 
+    def test_lazy_patch_matches_eager_patch(self) -> None:
+        input_path = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
+        config = {
+            "modifications": [
+                {
+                    "scope": {
+                        "path": [
+                            {"group": "library"},
+                            {"group": "cell", "name": "AND2x2_ASAP7_6t_SL"},
+                            {"group": "pin", "name": "*"},
+                            {"group": "timing"},
+                        ]
+                    },
+                    "action": {"operation": "multiply", "mode": "broadcast", "value": 1.1},
+                }
+            ]
+        }
+        eager = Parser().parse_file(str(input_path))
+        PatchRunner().run(eager, config)
+        lazy = Parser(lazy=True).parse_file(str(input_path))
+        PatchRunner().run(lazy, config)
+
+        untouched = _find_cell_group(lazy.root, "AND3x1_ASAP7_6t_SL")
+        self.assertFalse(untouched.is_loaded)
+        reparsed = Parser().parse(Formatter().dump(lazy.root))
+        self.assertEqual(
+            _extract_first_timing_matrix(reparsed.root, "AND2x2_ASAP7_6t_SL"),
+            _extract_first_timing_matrix(eager.root, "AND2x2_ASAP7_6t_SL"),
+        )
+
+    def test_deferred_tables_patch_matches_eager_patch(self) -> None:
+        input_path = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
+        config = {
+            "modifications": [
+                {
+                    "scope": {
+                        "path": [
+                            {"group": "library"},
+                            {"group": "cell", "name": "AND2x2_ASAP7_6t_SL"},
+                            {"group": "pin", "name": "*"},
+                            {"group": "timing"},
+                        ]
+                    },
+                    "action": {"operation": "add", "mode": "broadcast", "value": 0.5},
+                }
+            ]
+        }
+        eager = Parser().parse_file(str(input_path))
+        PatchRunner().run(eager, config)
+        deferred = Parser(defer_tables=True).parse_file(str(input_path))
+        PatchRunner().run(deferred, config)
+        self.assertEqual(serialize_parse_result(deferred), serialize_parse_result(eager))
+
+    def test_passthrough_patch_output_matches_across_parse_modes(self) -> None:
+        text = (
+            "library(foo) {\n"
+            "  capacitive_load_unit (1,ff);\n"
+            "  cell(A) {\n"
+            "    values ( \"1.50, 2.0\" );\n"
+            "  }\n"
+            "  cell(B) {\n"
+            "    area:2.00 ;\n"
+            "  }\n"
+            "}\n"
+        )
+        config = {
+            "modifications": [
+                {
+                    "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                    "action": {"operation": "multiply", "mode": "broadcast", "value": 2},
+                }
+            ]
+        }
+        outputs = {}
+        for label, parser in (
+            ("compact", Parser(compact=True)),
+            ("lazy", Parser(compact=True, lazy=True, defer_tables=True)),
+            ("streaming", Parser(compact=True, streaming=True)),
+            ("parallel", Parser(compact=True, jobs=2)),
+        ):
+            parse_result = parser.parse(text)
+            PatchRunner().run(parse_result, config)
+            outputs[label] = Formatter(passthrough=True).dump(parse_result.root)
+        self.assertIn("  capacitive_load_unit (1,ff);\n", outputs["compact"])
+        self.assertIn("  cell(B) {\n    area:2.00 ;\n  }\n", outputs["compact"])
+        self.assertIn('    values ("3,4");\n', outputs["compact"])
+        self.assertEqual(outputs["lazy"], outputs["compact"])
+        self.assertEqual(outputs["streaming"], outputs["compact"])
+        self.assertEqual(outputs["parallel"], outputs["compact"])
+
 
 def _find_cell_group(root: RootNode, cell_name: str) -> Optional[GroupNode]:
     for child in root.children:
@@ -1,6 +1,13 @@
+import io
 import unittest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest import mock
 
-from liberty_core import Formatter, Parser
+from liberty_core import Formatter, Parser, RootNode
+from liberty_core import formatter as formatter_module
+
+EXAMPLE_PATH = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
 
 
 class TestFormatter(unittest.TestCase):
@@ -87,6 +94,12 @@ class TestFormatter(unittest.TestCase):
         output = Formatter().dump(result.root)
         self.assertIn("rise_capacitance_range (0.276893, 0.440626);", output)
 
+    def test_formatter_renders_tables_with_float_format(self) -> None:
+        text = 'cell(A) { values ("0.123456, 1" \\\n "2, 3.98765"); area : 0.123456; }'
+        output = Formatter(float_format=".3g").dump(Parser().parse(text).root)
+        self.assertIn('    "0.123, 1", \\\n    "2, 3.99" \\\n', output)
+        self.assertIn("area : 0.123456;", output)
+
     def test_formatter_adds_space_before_group_paren(self) -> None:
         text = (
             "timing () {\n"
@@ -95,3 +108,119 @@ class TestFormatter(unittest.TestCase):
         result = Parser().parse(text)
         output = Formatter().dump(result.root)
         self.assertIn("timing () {", output)
+
+
+class TestFormatterDumpTo(unittest.TestCase):
+    def test_dump_to_matches_dump(self) -> None:
+        root = Parser().parse(EXAMPLE_PATH.read_text(encoding="utf-8")).root
+        expected = Formatter().dump(root)
+        for chunk_size in (1, 4096, 1 << 16):
+            with self.subTest(chunk_size=chunk_size):
+                output = io.StringIO()
+                Formatter().dump_to(root, output, chunk_size=chunk_size)
+                self.assertEqual(output.getvalue(), expected)
+
+    def test_dump_to_writes_bounded_chunks(self) -> None:
+        root = Parser().parse(EXAMPLE_PATH.read_text(encoding="utf-8")).root
+        writes = []
+
+        class Sink:
+            def write(self, text: str) -> int:
+                writes.append(len(text))
+                return len(text)
+
+        Formatter().dump_to(root, Sink(), chunk_size=4096)
+        self.assertGreater(len(writes), 1)
+        self.assertLess(max(writes), 4096 + 1024)
+
+    def test_dump_to_empty_root(self) -> None:
+        output = io.StringIO()
+        Formatter().dump_to(RootNode(), output)
+        self.assertEqual(output.getvalue(), Formatter().dump(RootNode()))
+
+
+class TestFormatterPassthrough(unittest.TestCase):
+    TEXT = (
+        "library(foo) {\n"
+        "  cell(A) {\n"
+        "    area:1.50 ;\n"
+        '    index_1 ("1.0,2.0");\n'
+        "  }\n"
+        "  cell(B) {\n"
+        "    area : 2.00;\n"
+        "  }\n"
+        "}\n"
+    )
+
+    def test_clean_compact_parse_is_copied(self) -> None:
+        root = Parser(compact=True).parse(self.TEXT).root
+        self.assertEqual(Formatter(passthrough=True).dump(root), self.TEXT)
+        self.assertNotEqual(Formatter().dump(root), self.TEXT)
+
+    def test_dirty_nodes_are_rendered_and_clean_siblings_copied(self) -> None:
+        root = Parser(compact=True).parse(self.TEXT).root
+        cell_a, cell_b = root.children[0].children
+        cell_a.children[0].mark_dirty()
+        self.assertTrue(cell_a.dirty and root.children[0].dirty)
+        self.assertFalse(cell_b.dirty)
+        output = Formatter(passthrough=True).dump(root)
+        self.assertIn("  cell (A) {\n    area : 1.50;\n    index_1 (\"1.0,2.0\");\n  }\n", output)
+        self.assertIn("  cell(B) {\n    area : 2.00;\n  }\n", output)
+
+    def test_nodes_without_spans_are_rendered(self) -> None:
+        root = Parser().parse(self.TEXT).root
+        self.assertEqual(Formatter(passthrough=True).dump(root), Formatter().dump(root))
+
+
+class TestParallelFormatter(unittest.TestCase):
+    def test_parallel_dump_matches_serial_dump(self) -> None:
+        root = Parser(compact=True).parse_file(str(EXAMPLE_PATH)).root
+        self.assertEqual(Formatter(jobs=2).dump(root), Formatter().dump(root))
+
+    def test_parallel_passthrough_renders_dirty_cells(self) -> None:
+        text = "library(foo) {\n" + "".join(f"  cell(C{i}) {{\n    area:{i}.50 ;\n  }}\n" for i in range(6)) + "}\n"
+        root = Parser(compact=True).parse(text).root
+        cells = root.children[0].children
+        for cell in cells[1::2]:
+            cell.children[0].mark_dirty()
+        expected = Formatter(passthrough=True).dump(root)
+        self.assertIn("    area : 1.50;", expected)
+        self.assertEqual(Formatter(passthrough=True, jobs=2).dump(root), expected)
+        self.assertEqual(list(Formatter(passthrough=True, jobs=2).iter_lines(root)), expected.splitlines())
+
+    def test_parallel_formatting_bounds_batches_in_flight(self) -> None:
+        text = "library(foo) {\n" + "".join(f"  cell(C{i}) {{\n    area : {i};\n  }}\n" for i in range(40)) + "}\n"
+        library = Parser().parse(text).root.children[0]
+        pool = _RecordingPool()
+        with mock.patch.object(formatter_module, "_worker_formatter", Formatter()):
+            lines = list(Formatter(jobs=2)._format_group_in_parallel(library, 0, pool, None))
+        self.assertEqual("\n".join(lines) + "\n", Formatter().dump(Parser().parse(text).root))
+        self.assertEqual(pool.submitted, 8)
+        self.assertEqual(pool.peak, 4)
+
+
+class _RecordingPool:
+    """Runs batches inline and records how many were submitted but not yet collected."""
+
+    def __init__(self) -> None:
+        self.submitted = 0
+        self.outstanding = 0
+        self.peak = 0
+
+    def submit(self, function, *args) -> Future:
+        self.submitted += 1
+        self.outstanding += 1
+        self.peak = max(self.peak, self.outstanding)
+        future = _CollectedFuture(self)
+        future.set_result(function(*args))
+        return future
+
+
+class _CollectedFuture(Future):
+    def __init__(self, pool: _RecordingPool) -> None:
+        super().__init__()
+        self._pool = pool
+
+    def result(self, timeout=None):
+        self._pool.outstanding -= 1
+        return super().result(timeout)
@@ -1,7 +1,10 @@
 import unittest
+from pathlib import Path
 
 from liberty_core import Lexer, LexerError, TokenType
 
+EXAMPLE_PATH = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
+
 
 class TestLexer(unittest.TestCase):
     def test_lexes_identifiers_and_numbers(self) -> None:
@@ -38,3 +41,89 @@ class TestLexer(unittest.TestCase):
     def test_unterminated_comment_raises(self) -> None:
         with self.assertRaises(LexerError):
             Lexer("/* comment").tokenize()
+
+
+class TestScannerEngine(unittest.TestCase):
+    def test_scanner_matches_reference_on_example(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        scanned = Lexer(text).tokenize()
+        reference = Lexer(text, engine="reference").tokenize()
+        self.assertEqual(scanned, reference)
+
+    def test_scanner_matches_reference_on_edge_cases(self) -> None:
+        samples = [
+            'when : "A \\"quoted\\" \\\\ B";',
+            'values ( "1,2" \\\n\t"3,4" ); // trailing\r\nnext : 1;',
+            "/* multi\nline */ cell(A) {\n  area : 5;\n}",
+            'text : "line\none";  pin(\\B) { }',
+        ]
+        for text in samples:
+            with self.subTest(text=text):
+                self.assertEqual(Lexer(text).tokenize(), Lexer(text, engine="reference").tokenize())
+
+    def test_scanner_tracks_line_and_column(self) -> None:
+        tokens = Lexer('cell(A) {\n  area : 5;\n  values ( \\\n "1" );\n}').tokenize()
+        area = next(token for token in tokens if token.value == "area")
+        self.assertEqual((area.line, area.column), (2, 3))
+        string_token = next(token for token in tokens if token.type == TokenType.STRING)
+        self.assertEqual((string_token.line, string_token.column), (4, 2))
+
+    def test_scanner_reports_errors_like_reference(self) -> None:
+        for text in ['time_unit : "1ns;', "/* comment", "a / b"]:
+            with self.subTest(text=text):
+                with self.assertRaises(LexerError) as scanned:
+                    Lexer(text).tokenize()
+                with self.assertRaises(LexerError) as reference:
+                    Lexer(text, engine="reference").tokenize()
+                self.assertEqual(str(scanned.exception), str(reference.exception))
+
+    def test_scanner_accepts_bytes(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        self.assertEqual(Lexer(text.encode("utf-8")).tokenize(), Lexer(text).tokenize())
+
+    def test_iter_tokens_is_lazy(self) -> None:
+        tokens = Lexer("area : 5; /* unterminated").iter_tokens()
+        self.assertEqual(next(tokens).value, "area")
+        self.assertEqual(next(tokens).type, TokenType.COLON)
+        with self.assertRaises(LexerError):
+            list(tokens)
+
+    def test_unknown_engine_raises(self) -> None:
+        with self.assertRaises(LexerError):
+            Lexer("a : 1;", engine="missing")
+
+
+class TestTokenBuffer(unittest.TestCase):
+    def test_buffer_matches_token_list(self) -> None:
+        samples = [
+            EXAMPLE_PATH.read_text(encoding="utf-8"),
+            'when : "A \\"quoted\\" \\\\ B";\nvalues ( "1,2" \\\n\t"3,4" ); // trailing',
+        ]
+        for text in samples:
+            with self.subTest(text=text[:20]):
+                buffer = Lexer(text).tokenize_to_buffer()
+                self.assertEqual(list(buffer.slice(0, len(buffer))), Lexer(text).tokenize())
+
+    def test_buffer_accepts_bytes(self) -> None:
+        text = 'cell(A) {\n  pin : "\u00b5m";\n}'
+        buffer = Lexer(text.encode("utf-8")).tokenize_to_buffer()
+        self.assertEqual(buffer.value_at(7), "\u00b5m")
+        self.assertEqual((buffer.lines[7], buffer.column_at(7)), (2, 9))
+
+    def test_token_slice_indexing(self) -> None:
+        buffer = Lexer("values ( 1, 2, 3 );").tokenize_to_buffer()
+        args = buffer.slice(2, 7)
+        self.assertEqual(len(args), 5)
+        self.assertEqual(args[-1].value, "3")
+        self.assertEqual([token.value for token in args[1:3]], [",", "2"])
+        with self.assertRaises(IndexError):
+            args[5]
+
+    def test_buffer_reports_errors_like_token_list(self) -> None:
+        for text in ['time_unit : "1ns;', "/* comment", "a / b"]:
+            with self.subTest(text=text):
+                with self.assertRaises(LexerError) as buffered:
+                    Lexer(text).tokenize_to_buffer()
+                with self.assertRaises(LexerError) as listed:
+                    Lexer(text).tokenize()
+                self.assertEqual(str(buffered.exception), str(listed.exception))
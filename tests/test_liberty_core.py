@@ -1,7 +1,7 @@
 import unittest
 
 from liberty_core import Lexer, Parser, QuoteStyle
-from liberty_core.cst import TokenType
+from liberty_core.cst import NO_CHILDREN, AttributeNode, CommentNode, TokenType
 
 
 class TestLibertyCore(unittest.TestCase):
@@ -19,3 +19,18 @@ class TestLibertyCore(unittest.TestCase):
         size = cell.children[1]
         self.assertEqual(area.quote_style, QuoteStyle.DOUBLE)
         self.assertEqual(size.quote_style, QuoteStyle.NONE)
+
+    def test_nodes_are_slotted_and_share_keys(self) -> None:
+        text = "cell(A) { pin(X) { when : A; } pin(Y) { when : B; } }"
+        cell = Parser().parse(text).root.children[0]
+        first, second = (pin.children[0] for pin in cell.children)
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertIs(first.key, second.key)
+        self.assertIs(cell.children[0].name, cell.children[1].name)
+        self.assertIs(first.children, NO_CHILDREN)
+
+    def test_leaf_node_gets_children_list_on_add(self) -> None:
+        node = AttributeNode(key="area")
+        node.add_child(CommentNode(text="// note"))
+        self.assertEqual([child.text for child in node.children], ["// note"])
+        self.assertIs(CommentNode().children, NO_CHILDREN)
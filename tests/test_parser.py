@@ -1,6 +1,21 @@
+import tempfile
 import unittest
+from pathlib import Path
 
-from liberty_core import Parser, ParserError
+from liberty_core import (
+    Formatter,
+    GroupNode,
+    LazyGroupNode,
+    LexerError,
+    Parser,
+    ParserError,
+    TableAttributeNode,
+    TokenSlice,
+    serialize_parse_result,
+)
+from patch_engine import find_nodes_by_scope
+
+EXAMPLE_PATH = Path("examples/asap7sc6t_SIMPLE_SLVT_TT_nldm_211010.lib")
 
 
 class TestParser(unittest.TestCase):
@@ -23,6 +38,12 @@ class TestParser(unittest.TestCase):
         with self.assertRaises(ParserError):
             Parser().parse(": 1;")
 
+    def test_unterminated_group_raises(self) -> None:
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                with self.assertRaises(ParserError):
+                    Parser(streaming=streaming).parse("library(foo) { cell(A) { area : 1; }")
+
     def test_parses_attribute_without_semicolon(self) -> None:
         text = "library(foo) {\n  default_max_transition : 253.300000\n  cell(A) { area : 5; }\n}"
         result = Parser().parse(text)
@@ -38,3 +59,232 @@ class TestParser(unittest.TestCase):
         attribute = library.children[0]
         self.assertEqual(attribute.key, "fanout_length")
         self.assertTrue(attribute.use_parens)
+
+    def test_parenthesized_arguments_keep_all_tokens(self) -> None:
+        text = 'library(foo) { cell(A) { values ( "1,2" \\\n "3,4" ); } }'
+        values = Parser().parse(text).root.children[0].children[0].children[0]
+        self.assertEqual([token.value for token in values.raw_tokens], ["1,2", "\\\n", "3,4"])
+
+    def test_nested_parentheses_match_streaming_behavior(self) -> None:
+        text = "library(foo) { cell(A) { foo ((1)); } }"
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                with self.assertRaises(ParserError):
+                    Parser(streaming=streaming).parse(text)
+
+
+class TestStreamingParser(unittest.TestCase):
+    def test_streaming_matches_buffered_on_example(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        buffered = serialize_parse_result(Parser().parse(text))
+        streamed = serialize_parse_result(Parser(streaming=True).parse(text))
+        self.assertEqual(buffered, streamed)
+
+    def test_streaming_disambiguates_groups_and_attributes(self) -> None:
+        text = (
+            "library(foo) {\n"
+            "  capacitive_load_unit (1,ff);\n"
+            "  fanout_length(1,0.0000)\n"
+            "  cell(A) { values ( \"1,2\" \\\n \"3,4\" ); }\n"
+            "}"
+        )
+        buffered = serialize_parse_result(Parser().parse(text))
+        streamed = serialize_parse_result(Parser(streaming=True).parse(text))
+        self.assertEqual(buffered, streamed)
+        library = Parser(streaming=True).parse(text).root.children[0]
+        self.assertEqual([child.key for child in library.children[:2]], ["capacitive_load_unit", "fanout_length"])
+        self.assertEqual(library.children[2].name, "cell")
+
+    def test_streaming_unexpected_token_raises(self) -> None:
+        with self.assertRaises(ParserError):
+            Parser(streaming=True).parse("library(foo) { : 1; }")
+
+
+class TestParseFile(unittest.TestCase):
+    def test_parse_file_matches_parse(self) -> None:
+        expected = serialize_parse_result(Parser().parse(EXAMPLE_PATH.read_text(encoding="utf-8")))
+        for streaming in (False, True):
+            with self.subTest(streaming=streaming):
+                result = Parser(streaming=streaming).parse_file(str(EXAMPLE_PATH))
+                self.assertEqual(serialize_parse_result(result), expected)
+
+    def test_parse_file_decodes_token_values(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "input.lib"
+            path.write_text('library(foo) { comment : "\u00b5m"; time_unit : 1ns; }', encoding="utf-8")
+            result = Parser().parse_file(str(path))
+        library = result.root.children[0]
+        self.assertEqual(library.children[0].raw_tokens[0].value, "\u00b5m")
+        self.assertEqual(result.context.time_unit, "1ns")
+
+    def test_parse_file_handles_empty_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "empty.lib"
+            path.write_bytes(b"")
+            result = Parser().parse_file(str(path))
+        self.assertEqual(result.root.children, [])
+
+
+class TestLazyParser(unittest.TestCase):
+    TEXT = (
+        "library(foo) {\n"
+        "  time_unit : 1ns;\n"
+        "  cell(A) {\n"
+        '    pin(Y) { function : "{A}"; /* } */ }\n'
+        "  }\n"
+        "  cell(B) {\n"
+        "    area : 2;\n"
+        "  }\n"
+        "}\n"
+    )
+
+    def test_lazy_cells_are_not_parsed_until_read(self) -> None:
+        result = Parser(lazy=True).parse(self.TEXT)
+        library = result.root.children[0]
+        cells = [child for child in library.children if isinstance(child, LazyGroupNode)]
+        self.assertEqual(len(cells), 2)
+        self.assertFalse(any(cell.is_loaded for cell in cells))
+        self.assertEqual(result.context.time_unit, "1ns")
+
+        matches = find_nodes_by_scope(
+            result.root,
+            {"path": [{"group": "library"}, {"group": "cell", "name": "A"}, {"group": "pin"}]},
+        )
+        self.assertEqual(len(matches), 1)
+        self.assertTrue(cells[0].is_loaded)
+        self.assertFalse(cells[1].is_loaded)
+        self.assertIs(matches[0].parent, cells[0])
+
+    def test_lazy_parse_matches_eager_once_loaded(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        eager = serialize_parse_result(Parser().parse(text))
+        self.assertEqual(serialize_parse_result(Parser(lazy=True).parse(text)), eager)
+        self.assertEqual(serialize_parse_result(Parser(lazy=True).parse_file(str(EXAMPLE_PATH))), eager)
+
+    def test_lazy_cells_keep_source_line_numbers(self) -> None:
+        result = Parser(lazy=True).parse(self.TEXT)
+        cell_b = result.root.children[0].children[2]
+        area = cell_b.children[0]
+        self.assertEqual((area.raw_tokens[0].line, area.raw_tokens[0].column), (7, 12))
+
+    def test_unloaded_cells_are_written_verbatim(self) -> None:
+        result = Parser(lazy=True).parse(self.TEXT)
+        output = Formatter().dump(result.root)
+        self.assertIn('  cell (A) {\n    pin(Y) { function : "{A}"; /* } */ }\n  }\n', output)
+        result.root.children[0].children[2].children
+        output = Formatter().dump(result.root)
+        self.assertIn("  cell (B) {\n    area : 2;\n  }\n", output)
+
+    def test_unloaded_cells_are_reindented(self) -> None:
+        text = "library(foo) {\ncell(A) {\n        pin(Y) {\n          area : 1;\n        }\n}\n}\n"
+        output = Formatter().dump(Parser(lazy=True).parse(text).root)
+        self.assertEqual(output, "library (foo) {\n  cell (A) {\n    pin(Y) {\n      area : 1;\n    }\n  }\n}\n")
+
+    def test_unloaded_cells_keep_source_spans(self) -> None:
+        result = Parser(lazy=True, compact=True).parse(self.TEXT)
+        cell_b = result.root.children[0].children[2]
+        self.assertEqual(self.TEXT[cell_b.span_start : cell_b.span_end], "cell(B) {\n    area : 2;\n  }")
+        self.assertEqual(Formatter(passthrough=True).dump(result.root), self.TEXT)
+        self.assertFalse(cell_b.is_loaded)
+
+    def test_lazy_parse_reports_unterminated_cell(self) -> None:
+        with self.assertRaises(LexerError):
+            Parser(lazy=True).parse("library(foo) { cell(A) { area : 1; ")
+
+
+class TestCompactParser(unittest.TestCase):
+    def test_compact_matches_buffered_on_example(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        eager = serialize_parse_result(Parser().parse(text))
+        self.assertEqual(serialize_parse_result(Parser(compact=True).parse(text)), eager)
+        self.assertEqual(serialize_parse_result(Parser(compact=True).parse_file(str(EXAMPLE_PATH))), eager)
+
+    def test_compact_nodes_hold_token_slices(self) -> None:
+        result = Parser(compact=True).parse("library(foo) {\n  area : 5;\n  values ( \"1, 2\" );\n}\n")
+        library = result.root.children[0]
+        self.assertIsInstance(library.args_tokens, TokenSlice)
+        area, values = library.children
+        self.assertIsInstance(area.raw_tokens, TokenSlice)
+        self.assertEqual([token.value for token in area.raw_tokens], ["5"])
+        self.assertEqual(values.raw_tokens[0].value, "1, 2")
+        self.assertEqual(Formatter().dump(result.root), Formatter().dump(Parser().parse(
+            "library(foo) {\n  area : 5;\n  values ( \"1, 2\" );\n}\n"
+        ).root))
+
+    def test_compact_lazy_cells_match_eager(self) -> None:
+        text = TestLazyParser.TEXT
+        eager = serialize_parse_result(Parser().parse(text))
+        self.assertEqual(serialize_parse_result(Parser(lazy=True, compact=True).parse(text)), eager)
+
+
+class TestDeferredTables(unittest.TestCase):
+    TEXT = (
+        "library(foo) {\n"
+        "  cell_rise(t) {\n"
+        '    index_1 ("1, 2");\n'
+        '    values ( \\\n      "1.50, 2.0", \\\n      "3.0, 4.0" \\\n    );\n'
+        "  }\n"
+        "}\n"
+    )
+
+    def test_values_are_deferred_until_read(self) -> None:
+        table = Parser(defer_tables=True).parse(self.TEXT).root.children[0].children[0]
+        index_1, values = table.children
+        self.assertNotIsInstance(index_1, TableAttributeNode)
+        self.assertIsInstance(values, TableAttributeNode)
+        self.assertFalse(values.is_loaded)
+        self.assertEqual(values.raw_tokens[1].value, "1.50, 2.0")
+        self.assertEqual((values.raw_tokens[1].line, values.raw_tokens[1].column), (5, 7))
+        self.assertTrue(values.is_loaded)
+
+    def test_deferred_parse_matches_eager(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        eager = serialize_parse_result(Parser().parse(text))
+        self.assertEqual(serialize_parse_result(Parser(defer_tables=True).parse(text)), eager)
+        self.assertEqual(serialize_parse_result(Parser(lazy=True, defer_tables=True).parse(text)), eager)
+
+    def test_untouched_tables_are_written_verbatim(self) -> None:
+        result = Parser(defer_tables=True).parse(self.TEXT)
+        output = Formatter().dump(result.root)
+        self.assertIn('    values ( \\\n      "1.50, 2.0", \\\n      "3.0, 4.0" \\\n    );\n', output)
+        result.root.children[0].children[0].children[1].raw_tokens
+        output = Formatter().dump(result.root)
+        self.assertIn('    values ( \\\n      "1.5, 2", \\\n      "3, 4" \\\n    );\n', output)
+
+
+class TestParallelParser(unittest.TestCase):
+    def test_parallel_parse_matches_serial_on_example(self) -> None:
+        text = EXAMPLE_PATH.read_text(encoding="utf-8")
+        serial = serialize_parse_result(Parser().parse(text))
+        self.assertEqual(serialize_parse_result(Parser(jobs=2).parse(text)), serial)
+        self.assertEqual(serialize_parse_result(Parser(jobs=2, compact=True).parse_file(str(EXAMPLE_PATH))), serial)
+
+    def test_parallel_cells_are_stitched_into_library(self) -> None:
+        result = Parser(jobs=2).parse(TestLazyParser.TEXT)
+        library = result.root.children[0]
+        cells = library.children[1:]
+        self.assertEqual([type(cell) for cell in cells], [GroupNode, GroupNode])
+        self.assertTrue(all(cell.parent is library for cell in cells))
+        area = cells[1].children[0]
+        self.assertIs(area.parent, cells[1])
+        self.assertEqual((area.raw_tokens[0].line, area.raw_tokens[0].column), (7, 12))
+
+    def test_parallel_cells_keep_spans_and_parser_options(self) -> None:
+        text = (
+            "library(foo) {\n"
+            '  cell(A) {\n    values ( \\\n      "1.50, 2.0" \\\n    );\n  }\n'
+            "  cell(B) { area : 1; }\n"
+            "}\n"
+        )
+        result = Parser(jobs=2, defer_tables=True).parse(text)
+        cell_a, cell_b = result.root.children[0].children
+        self.assertEqual(text[cell_b.span_start : cell_b.span_end], "cell(B) { area : 1; }")
+        values = cell_a.children[0]
+        self.assertIsInstance(values, TableAttributeNode)
+        self.assertFalse(values.is_loaded)
+        self.assertEqual(Formatter(passthrough=True).dump(result.root), text)
+
+    def test_parallel_parse_reports_errors_from_workers(self) -> None:
+        text = "library(foo) {\n  cell(A) { area : 1; }\n  cell(B) { area 1; }\n}\n"
+        with self.assertRaises(ParserError):
+            Parser(jobs=2).parse(text)
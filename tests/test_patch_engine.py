@@ -1,22 +1,34 @@
+import pickle
 import sqlite3
 import tempfile
 import unittest
+from unittest import mock
 
 from liberty_core import Lexer, Parser, TokenType
 from liberty_core.cst import AttributeNode
 from liberty_core.formatter import Formatter
 from patch_engine import (
+    DeltaGrid,
+    ExpressionError,
+    MatrixBackendError,
     MatrixShapeError,
+    PatchActionError,
+    PatchPlan,
     PatchRunner,
+    TableBatch,
     ScopeMatchError,
     UnitExpectations,
     UnitMismatchError,
     add_matrices,
+    add_scalar,
+    compile_operation,
     find_nodes_by_scope,
     multiply_matrix,
     parse_array_tokens,
     validate_units,
 )
+from patch_engine import matrix as matrix_module
+from patch_engine import runner as runner_module
 from provenance import ArtifactRecord, BatchOp, ProvenanceDB
 
 
@@ -69,6 +81,22 @@ class TestPatchEngine(unittest.TestCase):
         token_types = [token.type for token in foo_node.raw_tokens]
         self.assertIn(TokenType.IDENTIFIER, token_types)
 
+    def test_patch_runner_renders_with_float_format(self) -> None:
+        text = 'library(test) { cell(A) { foo ("1.23456789, 2" "3, 4"); bar (1, 2); } }'
+        parse_result = Parser().parse(text)
+        scope = {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]}
+        action = {"operation": "add", "mode": "broadcast", "value": 0.000000001}
+        config = {
+            "modifications": [
+                {"scope": scope, "action": dict(action, attribute="foo")},
+                {"scope": scope, "action": dict(action, attribute="bar")},
+            ]
+        }
+        PatchRunner(float_format=".10g").run(parse_result, config)
+        foo_node, bar_node = parse_result.root.children[0].children[0].children
+        self.assertEqual([token.value for token in foo_node.raw_tokens][0], "1.234567891,2.000000001")
+        self.assertEqual([token.value for token in bar_node.raw_tokens], ["1.000000001", ",", "2.000000001"])
+
     def test_patch_runner_preserves_1d_layout_tokens(self) -> None:
         text = 'library(test) { cell(A) { foo ("1,2" "3,4"); } }'
         parse_result = Parser().parse(text)
@@ -123,6 +151,26 @@ class TestPatchEngine(unittest.TestCase):
         self.assertIn('      "1, 2" \\', output)
         self.assertIn("    );", output)
 
+    def test_patch_runner_marks_edited_nodes_dirty(self) -> None:
+        text = "library(test) {\n  cell(A) {\n    values (\"1, 2\");\n  }\n  cell(B) {\n    values (\"3, 4\");\n  }\n}\n"
+        parse_result = Parser(compact=True).parse(text)
+        config = {
+            "modifications": [
+                {
+                    "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                    "action": {"attribute": "values", "operation": "multiply", "mode": "broadcast", "value": 2},
+                }
+            ]
+        }
+        PatchRunner().run(parse_result, config)
+        library = parse_result.root.children[0]
+        cell_a, cell_b = library.children
+        self.assertTrue(cell_a.children[0].dirty and cell_a.dirty and library.dirty)
+        self.assertFalse(cell_b.dirty)
+        output = Formatter(passthrough=True).dump(parse_result.root)
+        self.assertIn('values ("2,4");', output)
+        self.assertIn('values ("3, 4");', output)
+
     def test_patch_runner_preserves_commas_for_unquoted_arrays(self) -> None:
         text = "library(test) { cell(A) { foo (1, 2); } }"
         parse_result = Parser().parse(text)
@@ -195,3 +243,332 @@ class TestProvenance(unittest.TestCase):
                 artifact_rows = conn.execute("SELECT COUNT(*) FROM artifacts").fetchone()[0]
             self.assertEqual(batch_rows, 1)
             self.assertEqual(artifact_rows, 1)
+
+
+class TestMatrixBackends(unittest.TestCase):
+    TABLE = Lexer('"1, 2" \\\n "3, 4"').tokenize()
+
+    def test_unknown_or_unavailable_backend(self) -> None:
+        with self.assertRaises(MatrixBackendError):
+            PatchRunner(matrix_backend="cuda")
+        with mock.patch.object(matrix_module, "np", None):
+            self.assertEqual(matrix_module.default_matrix_backend(), "list")
+            with self.assertRaises(MatrixBackendError):
+                parse_array_tokens(self.TABLE, backend="numpy")
+
+    def test_list_add_scalar(self) -> None:
+        self.assertEqual(add_scalar([[1.0, 2.0], [3.0]], 0.5), [[1.5, 2.5], [3.5]])
+
+
+class TestTableBatch(unittest.TestCase):
+    def test_gather_apply_scatter(self) -> None:
+        tables = [
+            Lexer('"1, 2" \\\n "3, 4"').tokenize(),
+            Parser(compact=True).parse("foo (5, 6);").root.children[0].raw_tokens,
+        ]
+        batch = TableBatch(tables)
+        self.assertEqual(batch.values, [1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+        self.assertEqual(batch.offsets, [0, 4, 6])
+        self.assertEqual(batch.quoted, [True, False])
+        self.assertEqual(batch.formats[0].layout, [[2], [2]])
+        batch.multiply(2.0)
+        self.assertEqual(list(batch.tables()), [[[2.0, 4.0], [6.0, 8.0]], [[10.0, 12.0]]])
+        with self.assertRaises(MatrixShapeError):
+            batch.add_matrix([[1.0, 1.0]])
+
+    def test_batched_runner_matches_per_table_runner(self) -> None:
+        text = 'library(test) { cell(A) { pin(Y) { values ("1,2" \\\n "3,4"); } } cell(B) { values (1, 2); } }'
+        cells = {"path": [{"group": "library"}, {"group": "cell", "name": "*"}]}
+        pins = {"path": [{"group": "library"}, {"group": "cell", "name": "*"}, {"group": "pin", "name": "*"}]}
+        config = {
+            "modifications": [
+                {"scope": cells, "action": {"operation": "multiply", "mode": "broadcast", "value": 3}},
+                {"scope": pins, "action": {"operation": "add", "value": 0.25}},
+                {"scope": pins, "action": {"operation": "add", "mode": "matrix", "value": [[1, 2], [3, 4]]}},
+            ]
+        }
+        outputs = []
+        for batched in (False, True):
+            parse_result = Parser(compact=True).parse(text)
+            summary = PatchRunner(batched=batched).run(parse_result, config)
+            outputs.append((summary.modified_groups, Formatter(passthrough=True).dump(parse_result.root)))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('"4.25, 8.25"', outputs[1][1])
+
+    def test_batched_runner_repeats_tables_reached_twice(self) -> None:
+        text = 'library(test) { cell(A) { pin(Y) { values ("1,2"); } } }'
+        operation = compile_operation({"operation": "multiply", "mode": "broadcast", "value": 2})
+        outputs = []
+        for batched in (False, True):
+            root = Parser(compact=True).parse(text).root
+            cell = root.children[0].children[0]
+            runner = PatchRunner(batched=batched)
+            if batched:
+                runner._apply_batched([cell, cell.children[0]], "values", operation)
+            else:
+                for group in (cell, cell.children[0]):
+                    runner._apply_action(group, "values", operation)
+            outputs.append(Formatter(passthrough=True).dump(root))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('values ("4,8");', outputs[1])
+
+
+class TestPatchPlan(unittest.TestCase):
+    CONFIG = {
+        "modifications": [
+            {
+                "scope": {
+                    "path": [
+                        {"group": "library"},
+                        {"group": "cell", "name": "A*"},
+                        {"group": "pin", "attributes": {"direction": ["^out"]}},
+                    ]
+                },
+                "action": {"operation": "add", "mode": "matrix", "value": [[1, 2]]},
+            }
+        ]
+    }
+    TEXT = (
+        'library(test) { cell(AND2) { pin(A) { direction : input; values ("1,2"); } '
+        'pin(Y) { direction : output; values ("1,2"); } } cell(OR2) { pin(Y) { direction : output; } } }'
+    )
+
+    def test_plan_is_picklable_and_reusable(self) -> None:
+        plan = pickle.loads(pickle.dumps(PatchPlan.compile(self.CONFIG)))
+        self.assertEqual(plan.modifications[0].operation.operand, [[1.0, 2.0]])
+        for _ in range(2):
+            parse_result = Parser(compact=True).parse(self.TEXT)
+            summary = PatchRunner().run(parse_result, plan)
+            self.assertEqual(summary.modified_groups, 1)
+            output = Formatter(passthrough=True).dump(parse_result.root)
+            self.assertIn('direction : input; values ("1,2");', output)
+            self.assertIn('values ("2,4");', output)
+
+    def test_invalid_actions_fail_at_compile_time(self) -> None:
+        bad = {"modifications": [{"scope": {"path": [{"group": "library"}]}, "action": {"operation": "divide", "value": 2}}]}
+        with self.assertRaises(PatchActionError):
+            PatchPlan.compile(bad)
+        with self.assertRaises(ScopeMatchError):
+            PatchPlan.compile({"modifications": [{"scope": {}, "action": {"operation": "multiply", "value": 2}}]})
+
+    def test_stacked_modifications_fuse_into_one_pass_per_table(self) -> None:
+        cells = {"path": [{"group": "library"}, {"group": "cell"}]}
+        pins = {"path": [{"group": "library"}, {"group": "cell"}, {"group": "pin"}]}
+        config = {
+            "modifications": [
+                {"scope": cells, "action": {"operation": "add", "value": 0.5}},
+                {"scope": pins, "action": {"operation": "multiply", "value": 1.1}},
+                {"scope": pins, "action": {"operation": "add", "mode": "matrix", "value": [[1, 2]]}},
+            ]
+        }
+        plan = PatchPlan.compile(config)
+        self.assertEqual([len(stage) for stage in plan.stages], [3])
+        outputs = []
+        for fuse in (False, True):
+            for batched in (False, True):
+                parse_result = Parser(compact=True).parse(self.TEXT)
+                encode = mock.patch.object(runner_module, "_matrix_to_tokens", wraps=runner_module._matrix_to_tokens)
+                with encode as encode:
+                    summary = PatchRunner(fuse=fuse, batched=batched).run(parse_result, plan)
+                self.assertEqual(summary.modified_groups, 8)
+                if fuse:
+                    self.assertEqual(encode.call_count, 2)
+                values = [parse_array_tokens(node.raw_tokens)[0] for node in _values_nodes(parse_result.root)]
+                outputs.append(values)
+        for values in outputs[1:]:
+            for row, expected_row in zip(values, outputs[0]):
+                for value, expected in zip(row, expected_row):
+                    self.assertAlmostEqual(value, expected, places=5)
+        self.assertAlmostEqual(outputs[-1][1][0], (1 + 0.5) * 1.1 + 1, places=5)
+
+    def test_scope_reading_a_modified_attribute_starts_a_new_stage(self) -> None:
+        modifications = [
+            {"scope": {"path": [{"group": "library"}]}, "action": {"attribute": "area", "operation": "add", "value": 1}},
+            {
+                "scope": {"path": [{"group": "library"}, {"group": "cell", "attributes": {"area": "2*"}}]},
+                "action": {"operation": "multiply", "value": 2},
+            },
+        ]
+        plan = PatchPlan.compile({"modifications": modifications})
+        self.assertEqual([len(stage) for stage in plan.stages], [1, 1])
+
+
+class TestInterpolatedPatch(unittest.TestCase):
+    GRID = {"index_1": [0, 10], "index_2": [0, 100], "values": [[0, 1], [10, 11]]}
+    TEXT = (
+        "library(test) {\n"
+        '  lu_table_template(delay_2x2) { index_1 ("0, 10"); index_2 ("50, 200"); }\n'
+        "  cell(A) {\n"
+        '    pin(Y) { cell_rise(delay_2x2) { values ("0, 0", \\\n"0, 0"); } }\n'
+        '    pin(Z) { cell_rise(delay_2x2) { index_1 ("5, 20"); values ("0, 0", \\\n"0, 0"); } }\n'
+        '    pin(W) { rise_power(power_1d) { index_1 ("-5, 5, 15"); values ("0, 0, 0"); } }\n'
+        "  }\n"
+        "}\n"
+    )
+
+    def test_delta_grid_resamples_bilinearly_and_clamps(self) -> None:
+        grid = DeltaGrid((0.0, 10.0), (0.0, 100.0), ((0.0, 1.0), (10.0, 11.0)))
+        self.assertEqual(grid.resample([0, 5, 20], [0, 50, 500]), [[0, 0.5, 1], [5, 5.5, 6], [10, 10.5, 11]])
+        line = DeltaGrid((0.0, 10.0), None, ((0.0, 10.0),))
+        self.assertEqual(line.resample([-1, 2.5, 10]), [[0, 2.5, 10]])
+        with self.assertRaises(MatrixShapeError):
+            line.resample([1], [1])
+        with self.assertRaises(MatrixShapeError):
+            DeltaGrid((1.0, 1.0), None, ((0.0, 0.0),))
+
+    def test_interpolate_mode_uses_table_or_template_indices(self) -> None:
+        cell = {"group": "cell", "name": "A"}
+        config = {
+            "modifications": [
+                {
+                    "scope": {"path": [{"group": "library"}, cell, {"group": "pin"}, {"group": "cell_rise"}]},
+                    "action": {"operation": "add", "mode": "interpolate", "value": self.GRID},
+                },
+                {
+                    "scope": {"path": [{"group": "library"}, cell, {"group": "pin"}, {"group": "rise_power"}]},
+                    "action": {"operation": "add", "mode": "interpolate", "value": {"index_1": [0, 10], "values": [0, 1]}},
+                },
+            ]
+        }
+        for batched in (False, True):
+            parse_result = Parser(compact=True).parse(self.TEXT)
+            PatchRunner(batched=batched).run(parse_result, config)
+            tables = [parse_array_tokens(node.raw_tokens) for node in _values_nodes(parse_result.root)]
+            self.assertEqual(tables, [[[0.5, 1], [10.5, 11]], [[5.5, 6], [10.5, 11]], [[0, 0.5, 1]]])
+
+    def test_interpolate_mode_rejects_bad_grids(self) -> None:
+        scope = {"path": [{"group": "library"}]}
+        for value in ({"index_1": [0, 1]}, {"index_1": [1, 0], "values": [0, 1]}, {"index_1": [0], "values": [0, 1]}):
+            with self.subTest(value=value), self.assertRaises(PatchActionError):
+                action = {"operation": "add", "mode": "interpolate", "value": value}
+                PatchPlan.compile({"modifications": [{"scope": scope, "action": action}]})
+
+
+class TestExpressionPatch(unittest.TestCase):
+    TEXT = (
+        "library(test) {\n"
+        '  lu_table_template(delay_2x2) { index_1 ("1, 2"); index_2 ("10, 20"); }\n'
+        '  cell(A) { pin(Y) { cell_rise(delay_2x2) { values ("1, 8", \\\n"3, 4"); } } }\n'
+        "}\n"
+    )
+    SCOPE = {"path": [{"group": "library"}, {"group": "cell"}, {"group": "pin"}, {"group": "cell_rise"}]}
+
+    def _run(self, source: str, **runner_options) -> list:
+        config = {"modifications": [{"scope": self.SCOPE, "action": {"operation": "expression", "value": source}}]}
+        plan = pickle.loads(pickle.dumps(PatchPlan.compile(config)))
+        parse_result = Parser(compact=True).parse(self.TEXT)
+        PatchRunner(**runner_options).run(parse_result, plan)
+        return [parse_array_tokens(node.raw_tokens) for node in _values_nodes(parse_result.root)]
+
+    def test_expressions_see_values_and_indices(self) -> None:
+        backends = ["list"] + (["numpy"] if matrix_module.np is not None else [])
+        for backend in backends:
+            for batched in (False, True):
+                with self.subTest(backend=backend, batched=batched):
+                    options = {"matrix_backend": backend, "batched": batched}
+                    self.assertEqual(self._run("max(x, 2) * 2", **options), [[[4, 16], [6, 8]]])
+                    self.assertEqual(self._run("x + index_1 / 2 + index_2", **options), [[[11.5, 28.5], [14, 25]]])
+
+    def test_expressions_are_whitelisted(self) -> None:
+        for source in ('__import__("os")', "x.real", "(lambda: 1)()", "x if x else 1", "max(x)", "y", "x +"):
+            action = {"operation": "expression", "value": source}
+            with self.subTest(source=source), self.assertRaises(PatchActionError):
+                PatchPlan.compile({"modifications": [{"scope": self.SCOPE, "action": action}]})
+
+    def test_non_finite_results_are_rejected(self) -> None:
+        with self.assertRaises(ExpressionError):
+            self._run("x / (x - x)")
+
+
+class TestDryRun(unittest.TestCase):
+    def test_dry_run_counts_targets_without_touching_tables(self) -> None:
+        text = (
+            'library(test) { cell(A) { pin(Y) { values ("1, 2", \\\n"3, 4"); } pin(Z) { values ("1, 2, 3"); } } '
+            "cell(B) { area : 1; } }"
+        )
+        cells = {"path": [{"group": "library"}, {"group": "cell"}]}
+        pin_y = {"path": [{"group": "library"}, {"group": "cell", "name": "A"}, {"group": "pin", "name": "Y"}]}
+        missing = {"path": [{"group": "library"}, {"group": "cell", "name": "C"}]}
+        config = {
+            "modifications": [
+                {"scope": cells, "action": {"operation": "multiply", "value": 2}},
+                {"scope": pin_y, "action": {"operation": "add", "value": 1}},
+                {"scope": missing, "action": {"operation": "add", "value": 1}},
+            ]
+        }
+        parse_result = Parser(compact=True).parse(text)
+        with mock.patch.object(runner_module, "TableBatch", side_effect=AssertionError("decoded")):
+            counts = PatchRunner().dry_run(parse_result, config)
+        targets = [(count.groups, count.tables, count.values) for count in counts]
+        self.assertEqual(targets, [(2, 2, 7), (1, 1, 4), (0, 0, 0)])
+        self.assertEqual(counts[1].overlaps, {0: 1})
+        self.assertEqual(counts[0].scope, "library -> cell")
+        self.assertEqual(Formatter(passthrough=True).dump(parse_result.root), text + "\n")
+        summary = PatchRunner().run(parse_result, {"modifications": config["modifications"][:2]})
+        # Both modifications fuse into one stage, so each table is updated once.
+        self.assertEqual((summary.tables, summary.values), (2, 7))
+
+    def test_dry_run_leaves_deferred_tables_unread(self) -> None:
+        text = (
+            'library(test) { cell(A) { pin(Y) { values ( \\\n"1, 2", \\\n"3, 4" \\\n); } '
+            'pin(Z) { values ("1, 2, 3"); } } cell(B) { area : 1; } }'
+        )
+        cells = {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]}
+        config = {"modifications": [{"scope": cells, "action": {"operation": "multiply", "value": 2}}]}
+        parse_result = Parser(lazy=True, defer_tables=True).parse(text)
+        counts = PatchRunner().dry_run(parse_result, config)
+        self.assertEqual((counts[0].tables, counts[0].values), (2, 7))
+        tables = list(_values_nodes(parse_result.root))
+        self.assertEqual(len(tables), 2)
+        self.assertTrue(all(not node.is_loaded for node in tables))
+
+
+def _values_nodes(root):
+    stack = [root]
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, AttributeNode):
+            if node.key == "values":
+                yield node
+            continue
+        stack.extend(node.children)
+
+
+@unittest.skipIf(matrix_module.np is None, "NumPy is required for the numpy backend tests.")
+class TestNumpyMatrixBackend(unittest.TestCase):
+    TABLE = Lexer('"1, 2" \\\n "3, 4"').tokenize()
+
+    def test_parse_returns_2d_array(self) -> None:
+        matrix = parse_array_tokens(self.TABLE, backend="numpy")
+        self.assertEqual(matrix.shape, (2, 2))
+        self.assertEqual(matrix.tolist(), parse_array_tokens(self.TABLE))
+
+    def test_vectorized_operations_and_shape_checks(self) -> None:
+        matrix = parse_array_tokens(self.TABLE, backend="numpy")
+        self.assertEqual(multiply_matrix(matrix, 2.0).tolist(), [[2.0, 4.0], [6.0, 8.0]])
+        self.assertEqual(add_scalar(matrix, 1.0).tolist(), [[2.0, 3.0], [4.0, 5.0]])
+        self.assertEqual(add_matrices(matrix, [[1, 1], [1, 1]]).tolist(), [[2.0, 3.0], [4.0, 5.0]])
+        for other in ([[1.0, 2.0]], [[1.0], [2.0]], [[1.0, 2.0], [3.0]]):
+            with self.subTest(other=other), self.assertRaises(MatrixShapeError):
+                add_matrices(matrix, other)
+        with self.assertRaises(MatrixShapeError):
+            parse_array_tokens(Lexer('"1, 2" \\\n "3"').tokenize(), backend="numpy")
+
+    def test_runner_output_matches_list_backend(self) -> None:
+        text = 'library(test) { cell(A) { foo ("1,2" \\\n "3,4"); bar ("1,2" \\\n "3"); } }'
+        config = {
+            "modifications": [
+                {
+                    "scope": {"path": [{"group": "library"}, {"group": "cell", "name": "A"}]},
+                    "action": {"attribute": key, "operation": "multiply", "mode": "broadcast", "value": 1.1},
+                }
+                for key in ("foo", "bar")
+            ]
+        }
+        outputs = []
+        for backend in ("list", "numpy"):
+            parse_result = Parser().parse(text)
+            PatchRunner(matrix_backend=backend).run(parse_result, config)
+            outputs.append(Formatter().dump(parse_result.root))
+        self.assertEqual(outputs[0], outputs[1])
+        self.assertIn('"1.1, 2.2"', outputs[1])
@@ -0,0 +1,56 @@
+import unittest
+
+from liberty_core import AttributeKind, FloatRenderer, Lexer, Parser, decode_tokens
+from liberty_core.cst import AttributeNode
+
+
+def _attribute(text: str) -> AttributeNode:
+    return Parser().parse(f"cell(A) {{ {text} }}").root.children[0].children[0]
+
+
+class TestDecodeTokens(unittest.TestCase):
+    def test_classifies_attribute_values(self) -> None:
+        cases = {
+            'values ("1, 2", "3, 4");': AttributeKind.NUMERIC_ARRAY,
+            "index_1 (0.1, 0.2);": AttributeKind.NUMERIC_ARRAY,
+            "capacitive_load_unit (1, ff);": AttributeKind.MIXED,
+            'function : "A & B";': AttributeKind.STRING,
+            "area : 1.5;": AttributeKind.SCALAR,
+        }
+        for text, kind in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(_attribute(text).decoded().kind, kind)
+
+    def test_numeric_rows_follow_escaped_newlines(self) -> None:
+        decoded = decode_tokens(Lexer('"1, 2" \\\n "3.5, 4" /* c */').tokenize())
+        self.assertEqual([row.values for row in decoded.rows], [[1.0, 2.0], [3.5, 4.0]])
+        self.assertTrue(all(row.quoted for row in decoded.rows))
+        self.assertTrue(decoded.has_escaped_newline)
+
+    def test_decoded_is_cached_until_tokens_are_replaced(self) -> None:
+        node = _attribute('values ("1, 2", "3, 4");')
+        first = node.decoded()
+        self.assertIs(node.decoded(), first)
+        node.raw_tokens = Lexer('"5, 6"').tokenize()
+        self.assertIsNot(node.decoded(), first)
+        self.assertEqual(node.decoded().kind, AttributeKind.STRING)
+
+
+class TestFloatRenderer(unittest.TestCase):
+    VALUES = [0.1, 1e-7, 123456789.0, -2.5, 0.0, float("inf")]
+
+    def test_join_matches_format_per_value(self) -> None:
+        for spec in ("g", ".3g", ".12g", ".2e", "f", ",.2f"):
+            with self.subTest(spec=spec):
+                renderer = FloatRenderer(spec)
+                expected = [format(value, spec) for value in self.VALUES]
+                self.assertEqual(renderer.join(self.VALUES), ", ".join(expected))
+                self.assertEqual(renderer.split(self.VALUES), expected)
+        self.assertEqual(FloatRenderer().split([]), [])
+
+    def test_significant_digits(self) -> None:
+        self.assertEqual(FloatRenderer.significant_digits(3).join([3.14159, 2.71828], ","), "3.14,2.72")
+        with self.assertRaises(ValueError):
+            FloatRenderer.significant_digits(0)
+        with self.assertRaises(ValueError):
+            FloatRenderer("q")